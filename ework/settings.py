@@ -156,14 +156,40 @@ Q_CLUSTER = {
     'label': 'Django-Q',
     'redis': None,
     'schedule': {
-        'collect_daily_stats': {
-            'func': 'ework_stats.tasks.collect_daily_stats',
-            'schedule_type': 'D',  
-            'hour': 1,  
-            'minute': 0
+        'collect_stats_rollups': {
+            'func': 'ework_stats.tasks.collect_stats_rollups',
+            'schedule_type': 'I',
+            'minutes': 5
         },
-    }
-}  
+        'drain_outbox': {
+            'func': 'ework_core.tasks.drain_outbox_task',
+            'schedule_type': 'I',
+            'minutes': 1,
+            'cluster': 'outbox'
+        },
+    },
+    # Отдельный кластер для модерации постов с ограниченным числом воркеров:
+    # Q_CLUSTER_NAME=moderation python manage.py qcluster
+    'ALT_CLUSTERS': {
+        'moderation': {
+            'workers': 2,
+            'timeout': 60,
+            'retry': 120,
+            'queue_limit': 20,
+        },
+        # Очередь сообщений Telegram: один воркер, чтобы лимиты Bot API
+        # соблюдались одним процессом
+        # Q_CLUSTER_NAME=outbox python manage.py qcluster
+        'outbox': {
+            'workers': 1,
+            'timeout': 60,
+            'retry': 90,
+        },
+    },
+}
+
+# Классификатор автомодерации: 'mistral' или локальный 'fake' для работы без API
+MODERATION_BACKEND = os.getenv('MODERATION_BACKEND', 'mistral')
 
 JAZZMIN_SETTINGS = {
     "site_title": "Help Work Admin",
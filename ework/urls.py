@@ -13,6 +13,7 @@ urlpatterns = [
     path('jobs/', include('ework_job.urls', namespace='jobs')),
     path('services/', include('ework_services.urls')),
     path('payments/', include('ework_payment.urls')),
+    path('bot/', include('ework_bot_tg.urls', namespace='bot')),
     path("", include('ework_core.urls', namespace='core')),
 
 ]
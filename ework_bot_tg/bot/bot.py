@@ -19,7 +19,10 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ework.settings')
 django.setup()
 
 # Получаем конфигурацию бота
-from ework_config.bot_config import get_bot_config
+from ework_config.bot_config import get_bot_config, aget_bot_config
+from ework_core.outbox import enqueue_message
+from ework_payment.services import PaymentService, parse_payment_payload
+# Токен нужен при создании Bot; остальные настройки читаются в обработчиках
 cfg = get_bot_config()
 
 # Настройка логирования
@@ -65,20 +68,38 @@ text_button = _('Открыть')
 
 dp = Dispatcher()
 
-# Асинхронный HTTP-клиент (singleton)
+# Асинхронный HTTP-клиент: один на процесс и живет вместе с ботом. Пул соединений
+# привязан к event loop, поэтому клиентом пользуются только в цикле бота: в main()
+# при long polling или в потоке webhook.runner в процессе Django. Закрывается
+# close_http_client() при остановке бота.
 _http_client: httpx.AsyncClient | None = None
+_http_client_loop: asyncio.AbstractEventLoop | None = None
 
 def get_http_client() -> httpx.AsyncClient:
-    global _http_client
+    global _http_client, _http_client_loop
+    loop = asyncio.get_running_loop()
+    if _http_client is not None and _http_client_loop is not loop:
+        if not _http_client_loop.is_closed():
+            raise RuntimeError("HTTP клиент бота используется вне цикла бота, вызывайте через webhook.runner")
+        _http_client = None
     if _http_client is None:
         _http_client = httpx.AsyncClient(timeout=30.0)
+        _http_client_loop = loop
     return _http_client
 
+async def close_http_client():
+    """Закрыть HTTP клиент бота; вызывать в цикле, где он создан"""
+    global _http_client, _http_client_loop
+    client, _http_client, _http_client_loop = _http_client, None, None
+    if client is not None:
+        await client.aclose()
+
 # Этап 6: Генерация ссылки на оплату
 async def create_invoice_link( user_id: int, payment_id: int, payload: str, amount: float, order_id: int, addons_data: dict | None = None) -> str | None:
     """
     Создать инвойс через HTTP API Telegram и вернуть ссылку
     """
+    cfg = await aget_bot_config()
     description = f"Публикация объявления #{order_id}"
     if addons_data:
         addons = []
@@ -125,6 +146,7 @@ async def create_invoice_link( user_id: int, payment_id: int, payload: str, amou
 # Команда /start
 @dp.message(Command(commands=["start"]))
 async def cmd_start(message: types.Message):
+    cfg = await aget_bot_config()
     webapp_button = InlineKeyboardButton(
         text=text_button,
         web_app=WebAppInfo(url=cfg['miniapp_url'])
@@ -209,28 +231,32 @@ async def pre_checkout_query(pre_checkout: types.PreCheckoutQuery):
 
 @dp.message(lambda msg: msg.successful_payment)
 async def successful_payment(message: types.Message):
-    payload = message.successful_payment.invoice_payload
+    """
+    Оплата засчитывается PaymentService.complete_payment; публикация поста и ответ
+    пользователю выполняются задачей один раз, повторная доставка ничего не делает
+    """
+    payment = message.successful_payment
     try:
-        user_id_str, payment_id_str = payload.split('&&&')
-        user_id, payment_id = int(user_id_str), int(payment_id_str)
-        
-        from ework_core.views import publish_post_after_payment
-        success = await sync_to_async(publish_post_after_payment)(user_id, payment_id)
-        
-        if success:
-            await message.answer(_("✅ Оплата прошла успешно! Ваше объявление опубликовано и отправлено на модерацию."))
-        else:
-            await message.answer(_("⚠️ Оплата получена, но при публикации произошла ошибка. Обратитесь в поддержку."))
+        _user_id, payment_id = parse_payment_payload(payment.invoice_payload)
+        await sync_to_async(PaymentService.complete_payment)(
+            payment_id,
+            payment.telegram_payment_charge_id,
+            payment.provider_payment_charge_id,
+        )
     except Exception:
-        logger.exception("Error handling successful payment payload=%s", payload)
-        await message.answer(_("⚠️ Оплата получена, но произошла ошибка. Обратитесь в поддержку."))
+        logger.exception("Error handling successful payment payload=%s", payment.invoice_payload)
+        await sync_to_async(enqueue_message)(message.chat.id, _("⚠️ Оплата получена, но произошла ошибка. Обратитесь в поддержку."))
 
 
 
 
 async def main():
-    await bot.delete_webhook(drop_pending_updates=True)
-    await dp.start_polling(bot)
+    """Long polling; накопившиеся обновления не сбрасываются при перезапуске"""
+    await bot.delete_webhook(drop_pending_updates=False)
+    try:
+        await dp.start_polling(bot)
+    finally:
+        await close_http_client()
 
 
 
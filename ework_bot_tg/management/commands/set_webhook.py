@@ -0,0 +1,56 @@
+"""
+Django management команда для регистрации webhook Telegram бота.
+"""
+import asyncio
+import secrets
+
+from aiogram import Bot
+from django.core.management.base import BaseCommand, CommandError
+
+from ework_config.models import SiteConfig
+from ework_bot_tg.webhook import WEBHOOK_MAX_CONCURRENCY
+
+
+class Command(BaseCommand):
+    """
+    Регистрирует https://<домен>/bot/webhook/ в Telegram.
+    Накопившиеся обновления не сбрасываются. С --delete возвращает бота к long polling.
+    """
+    help = 'Регистрирует webhook Telegram бота'
+
+    def add_arguments(self, parser):
+        parser.add_argument('url', nargs='?', help='Полный URL webhook, например https://example.com/bot/webhook/')
+        parser.add_argument('--delete', action='store_true', help='Удалить webhook')
+        parser.add_argument('--new-secret', action='store_true', help='Сгенерировать новый секретный токен')
+
+    def handle(self, *args, **options):
+        config = SiteConfig.get_config()
+        if not config.bot_token:
+            raise CommandError('В настройках сайта не указан токен бота')
+
+        if options['delete']:
+            asyncio.run(self._call(config.bot_token, lambda bot: bot.delete_webhook(drop_pending_updates=False)))
+            self.stdout.write(self.style.SUCCESS('Webhook удален'))
+            return
+
+        if not options['url']:
+            raise CommandError('Укажите URL webhook')
+
+        if options['new_secret'] or not config.webhook_secret:
+            config.webhook_secret = secrets.token_urlsafe(32)
+            config.save(update_fields=['webhook_secret'])
+
+        asyncio.run(self._call(config.bot_token, lambda bot: bot.set_webhook(
+            url=options['url'],
+            secret_token=config.webhook_secret,
+            max_connections=WEBHOOK_MAX_CONCURRENCY,
+            drop_pending_updates=False,
+        )))
+        self.stdout.write(self.style.SUCCESS(f"Webhook установлен: {options['url']}"))
+
+    async def _call(self, token, method):
+        bot = Bot(token=token)
+        try:
+            return await method(bot)
+        finally:
+            await bot.session.close()
@@ -0,0 +1,8 @@
+from django.urls import path
+from .webhook import telegram_webhook
+
+app_name = 'bot'
+
+urlpatterns = [
+    path('webhook/', telegram_webhook, name='webhook'),
+]
@@ -0,0 +1,166 @@
+"""
+Прием обновлений Telegram через webhook в процессе Django.
+
+Telegram присылает обновления POST запросом на /bot/webhook/ с заголовком
+X-Telegram-Bot-Api-Secret-Token. Обновление передается в тот же Dispatcher dp,
+что и при long polling. Обработчики выполняются в WebhookRunner - одном на
+процесс потоке с постоянным event loop и одним Bot, поэтому сессия aiohttp
+переиспользуется между запросами независимо от того, в каком цикле работает
+сам view (под WSGI у каждого запроса свой). В том же потоке работает HTTP
+клиент бота (runner.call). Одновременно обрабатывается не
+больше WEBHOOK_MAX_CONCURRENCY обновлений на процесс - семафор общий для всех
+потоков; при перегрузке отвечаем 503, и Telegram повторит доставку позже.
+Webhook регистрируется командой set_webhook.
+"""
+import os
+import json
+import atexit
+import asyncio
+import hmac
+import logging
+import threading
+
+from django.http import HttpResponse, HttpResponseForbidden
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+
+logger = logging.getLogger(__name__)
+
+WEBHOOK_MAX_CONCURRENCY = 8
+ACQUIRE_TIMEOUT = 10  # секунд ожидания свободного слота до ответа 503
+ACQUIRE_POLL_INTERVAL = 0.05
+SECRET_HEADER = 'X-Telegram-Bot-Api-Secret-Token'
+
+_semaphore = threading.BoundedSemaphore(WEBHOOK_MAX_CONCURRENCY)
+
+
+class WebhookRunner:
+    """Поток с event loop, единственным Bot и HTTP клиентом бота"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._loop = None
+        self._thread = None
+        self._bot = None
+
+    def _ensure_loop(self):
+        with self._lock:
+            if self._pid != os.getpid():
+                # Процесс был форкнут: поток родителя здесь не работает
+                self._reset()
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(
+                    target=self._loop.run_forever, name='telegram-webhook', daemon=True
+                )
+                self._thread.start()
+            return self._loop
+
+    async def _get_bot(self, token):
+        """Bot текущего токена; при смене токена сессия старого закрывается"""
+        from aiogram import Bot
+        from ework_bot_tg.bot.bot import default_props
+
+        if self._bot is not None and self._bot.token != token:
+            await self._bot.session.close()
+            self._bot = None
+        if self._bot is None:
+            self._bot = Bot(token=token, default=default_props)
+        return self._bot
+
+    async def _feed(self, token, data):
+        from aiogram import types
+        from ework_bot_tg.bot.bot import dp
+
+        bot = await self._get_bot(token)
+        update = types.Update.model_validate(data, context={'bot': bot})
+        await dp.feed_update(bot, update)
+
+    async def call(self, func, *args, **kwargs):
+        """Выполнить корутину func(...) в потоке webhook и дождаться результата"""
+        loop = self._ensure_loop()
+        future = asyncio.run_coroutine_threadsafe(func(*args, **kwargs), loop)
+        return await asyncio.wrap_future(future)
+
+    async def feed_update(self, token, data):
+        """Обработать обновление в потоке webhook и дождаться результата"""
+        return await self.call(self._feed, token, data)
+
+    def close(self):
+        """Закрыть сессии Bot и HTTP клиента бота и остановить поток"""
+        loop = self._loop
+        if loop is None or self._pid != os.getpid():
+            return
+
+        async def close_sessions():
+            from ework_bot_tg.bot.bot import close_http_client
+
+            if self._bot is not None:
+                await self._bot.session.close()
+            await close_http_client()
+
+        try:
+            asyncio.run_coroutine_threadsafe(close_sessions(), loop).result(5)
+        except Exception as e:
+            logger.error(f"Ошибка при закрытии сессий webhook: {e}")
+        loop.call_soon_threadsafe(loop.stop)
+        self._reset()
+
+
+runner = WebhookRunner()
+atexit.register(runner.close)
+
+
+async def _acquire_slot():
+    """
+    Занять слот обработки, ожидая не дольше ACQUIRE_TIMEOUT.
+    Семафор потоковый, поэтому ждем опросом, не блокируя event loop запроса.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + ACQUIRE_TIMEOUT
+    while not _semaphore.acquire(blocking=False):
+        if loop.time() >= deadline:
+            return False
+        await asyncio.sleep(ACQUIRE_POLL_INTERVAL)
+    return True
+
+
+def is_valid_secret(request, secret):
+    received = request.headers.get(SECRET_HEADER, '')
+    return bool(secret) and hmac.compare_digest(received.encode(), secret.encode())
+
+
+@csrf_exempt
+@require_POST
+async def telegram_webhook(request):
+    """Принять обновление Telegram и передать его в Dispatcher"""
+    from ework_config.bot_config import aget_bot_config
+
+    cfg = await aget_bot_config()
+    if not is_valid_secret(request, cfg.get('webhook_secret', '')):
+        logger.warning("Webhook: неверный секретный токен")
+        return HttpResponseForbidden()
+
+    try:
+        data = json.loads(request.body)
+    except ValueError:
+        return HttpResponse(status=400)
+    if not isinstance(data, dict):
+        return HttpResponse(status=400)
+
+    if not await _acquire_slot():
+        logger.warning("Webhook: все обработчики заняты, обновление будет доставлено повторно")
+        return HttpResponse(status=503)
+
+    try:
+        await runner.feed_update(cfg['bot_token'], data)
+    except Exception:
+        # Ошибку обработчика не возвращаем Telegram, иначе он будет повторять обновление
+        logger.exception("Webhook: ошибка обработки обновления %s", data.get('update_id'))
+    finally:
+        _semaphore.release()
+    return HttpResponse(status=200)
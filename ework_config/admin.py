@@ -12,7 +12,7 @@ class SiteConfigAdmin(admin.ModelAdmin):
             'fields': ('site_name', 'site_url')
         }),
         ('Telegram Bot', {
-            'fields': ('bot_token', 'bot_username'),
+            'fields': ('bot_token', 'bot_username', 'webhook_secret'),
             'classes': ('collapse',)
         }),
         ('Уведомления', {
@@ -24,7 +24,8 @@ class SiteConfigAdmin(admin.ModelAdmin):
             'classes': ('collapse',)
         }),
         ('AI и модерация', {
-            'fields': ('mistral_api_key', 'auto_moderation_enabled', 'manual_approval_required'),
+            'fields': ('mistral_api_key', 'auto_moderation_enabled', 'manual_approval_required',
+                       'moderation_threshold', 'moderation_cache_ttl_hours'),
             'classes': ('collapse',)
         }),
     )
@@ -1,21 +1,29 @@
+from .utils import get_config, aget_config
 
-from .utils import get_config
+_bot_config = None  # (SiteConfig, словарь настроек бота)
 
-_bot_config = None
 
-def get_bot_config():
-    """Получить конфигурацию бота с кэшированием"""
+def _build_bot_config(config):
     global _bot_config
-    if _bot_config is None:
-        config = get_config()
-        _bot_config = {
+    state = _bot_config
+    if state is None or state[0] is not config:
+        state = _bot_config = (config, {
             'bot_token': config.bot_token,
             'miniapp_url': config.site_url + '/users/index/',
             'payment_provider_token': config.payment_provider_token,
             'notification_bot_token': config.bot_token,
             'admin_chat_id': config.admin_chat_id,
-        }
-    return _bot_config
+            'webhook_secret': config.webhook_secret,
+        })
+    return state[1]
+
+def get_bot_config():
+    """Получить конфигурацию бота; пересобирается, когда меняется SiteConfig"""
+    return _build_bot_config(get_config())
+
+async def aget_bot_config():
+    """get_bot_config для обработчиков бота"""
+    return _build_bot_config(await aget_config())
 
 def clear_bot_config_cache():
     """Очистить кэш конфигурации бота"""
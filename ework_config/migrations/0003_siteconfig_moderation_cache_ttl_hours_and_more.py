@@ -0,0 +1,24 @@
+# Generated by Django 5.2 on 2026-10-18 08:43
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ework_config', '0002_alter_siteconfig_site_name'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='siteconfig',
+            name='moderation_cache_ttl_hours',
+            field=models.PositiveIntegerField(default=168, help_text='Одинаковые тексты в течение этого срока не отправляются на повторную проверку', verbose_name='Срок хранения вердиктов (часов)'),
+        ),
+        migrations.AddField(
+            model_name='siteconfig',
+            name='moderation_threshold',
+            field=models.FloatField(default=0.5, help_text='Пост отклоняется, если оценка любой категории выше порога', validators=[django.core.validators.MinValueValidator(0), django.core.validators.MaxValueValidator(1)], verbose_name='Порог нарушения'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-18 08:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ework_config', '0003_siteconfig_moderation_cache_ttl_hours_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='siteconfig',
+            name='webhook_secret',
+            field=models.CharField(blank=True, help_text='Секрет для проверки запросов Telegram к /bot/webhook/, создается командой set_webhook', max_length=256, verbose_name='Webhook Secret Token'),
+        ),
+    ]
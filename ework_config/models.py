@@ -1,5 +1,6 @@
 from django.db import models
 from django.core.exceptions import ValidationError
+from django.core.validators import MinValueValidator, MaxValueValidator
 from django.utils.translation import gettext_lazy as _ 
 
 
@@ -16,6 +17,7 @@ class SiteConfig(models.Model):
     # Telegram Bot настройки
     bot_token = models.CharField(max_length=200, verbose_name='Bot Token', blank=True)
     bot_username = models.CharField(max_length=100, verbose_name='Bot Username', blank=True)
+    webhook_secret = models.CharField(max_length=256, verbose_name='Webhook Secret Token', blank=True, help_text='Секрет для проверки запросов Telegram к /bot/webhook/, создается командой set_webhook')
     
     # Telegram Notification Bot (для уведомлений админам)
     admin_chat_id = models.CharField(max_length=20, verbose_name='Admin Chat ID', blank=True)
@@ -30,6 +32,8 @@ class SiteConfig(models.Model):
     # Настройки модерации
     auto_moderation_enabled = models.BooleanField(default=True, verbose_name=_('Автоматическая модерация включена'),help_text='Использовать ИИ для автоматической проверки постов')
     manual_approval_required = models.BooleanField(default=False, verbose_name=_('Требуется ручное одобрение'),help_text='Даже после ИИ модерации требуется ручное одобрение админом')
+    moderation_threshold = models.FloatField(default=0.5, validators=[MinValueValidator(0), MaxValueValidator(1)], verbose_name=_('Порог нарушения'), help_text='Пост отклоняется, если оценка любой категории выше порога')
+    moderation_cache_ttl_hours = models.PositiveIntegerField(default=168, verbose_name=_('Срок хранения вердиктов (часов)'), help_text='Одинаковые тексты в течение этого срока не отправляются на повторную проверку')
     
     # Настройки постов
     max_free_posts_per_user = models.PositiveIntegerField(default=1, verbose_name=_('Максимум бесплатных постов на пользователя'))
@@ -38,6 +42,8 @@ class SiteConfig(models.Model):
     # Timestamps
     created_at = models.DateTimeField(auto_now_add=True, verbose_name=_('Создано'))
     updated_at = models.DateTimeField(auto_now=True, verbose_name=_('Обновлено'))
+    # Растет при каждом save(), в том числе с update_fields: по ней процессы сверяют свои копии
+    version = models.PositiveIntegerField(default=0, editable=False, verbose_name=_('Версия'))
     
     class Meta:
         app_label = "ework_config"
@@ -47,7 +53,15 @@ class SiteConfig(models.Model):
     def save(self, *args, **kwargs):
         if not self.pk and SiteConfig.objects.exists():
             raise ValidationError('Может существовать только одна конфигурация сайта')
-        return super().save(*args, **kwargs)
+        if self._state.adding:
+            return super().save(*args, **kwargs)
+        self.version = models.F('version') + 1
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = {*update_fields, 'version'}
+        result = super().save(*args, **kwargs)
+        self.refresh_from_db(fields=['version'])
+        return result
     
     def __str__(self):
         return f'Конфигурация {self.site_name}'
@@ -1,22 +1,70 @@
-from .models import SiteConfig
-from django.core.cache import cache
+"""
+Кэш SiteConfig в памяти процесса.
+
+Каждый процесс (web, бот, django_q) держит свою копию конфигурации. Раз в
+VERSION_CHECK_INTERVAL секунд копия сверяется с полем version записи в БД -
+это один запрос по первичному ключу, он же общий для всех процессов счетчик
+версий: любой SiteConfig.save() (в том числе с update_fields, как в
+set_webhook) увеличивает version, и остальные процессы перечитывают
+конфигурацию не позже чем через секунду.
+"""
+import time
 import logging
+import threading
+
+from asgiref.sync import sync_to_async
 from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 
+from .models import SiteConfig
+
 logger = logging.getLogger(__name__)
 
+VERSION_CHECK_INTERVAL = 1.0  # секунд
+
+_state = None  # (версия, время проверки, SiteConfig)
+_lock = threading.Lock()
+
+
+def _is_fresh(state):
+    return state is not None and time.monotonic() - state[1] < VERSION_CHECK_INTERVAL
+
+
+def _current_version():
+    return SiteConfig.objects.filter(pk=1).values_list('version', flat=True).first()
+
+
 def get_config():
     """Получить конфигурацию с кэшированием"""
-    config = cache.get('site_config')
-    if config is None:
-        config = SiteConfig.get_config()
-        cache.set('site_config', config, 300) 
-    return config
+    global _state
+    state = _state
+    if _is_fresh(state):
+        return state[2]
+    with _lock:
+        state = _state
+        if not _is_fresh(state):
+            version = _current_version()
+            if state is not None and version is not None and state[0] == version:
+                state = (version, time.monotonic(), state[2])
+            else:
+                config = SiteConfig.get_config()
+                state = (config.version, time.monotonic(), config)
+            _state = state
+    return state[2]
+
+
+async def aget_config():
+    """get_config для async кода: проверка версии в потоке, если копия устарела"""
+    state = _state
+    if _is_fresh(state):
+        return state[2]
+    return await sync_to_async(get_config)()
+
 
 def clear_config_cache():
     """Очистить кэш конфигурации"""
-    cache.delete('site_config')
+    global _state
+    _state = None
 
 @receiver(post_save, sender=SiteConfig)
 def clear_cache_on_config_save(sender, **kwargs):
@@ -6,6 +6,7 @@ class EworkCoreConfig(AppConfig):
     name = 'ework_core'
 
     def ready(self):
+        import ework_core.refdata  # сброс справочников при изменении в админке
         try:
             import ework_core.signals
         except ImportError:
@@ -0,0 +1,28 @@
+# Generated by Django 5.2 on 2026-10-18 08:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ModerationVerdict',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('content_hash', models.CharField(max_length=64, unique=True, verbose_name='Хэш текста')),
+                ('category_scores', models.JSONField(default=dict, verbose_name='Оценки категорий')),
+                ('hits', models.PositiveIntegerField(default=0, verbose_name='Попаданий')),
+                ('created_at', models.DateTimeField(db_index=True, verbose_name='Дата проверки')),
+            ],
+            options={
+                'verbose_name': 'Вердикт модерации',
+                'verbose_name_plural': 'Вердикты модерации',
+            },
+        ),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 5.2 on 2026-10-18 08:46
+
+import django.utils.timezone
+from django.db import migrations, models
+
+SCHEDULE_NAME = 'drain_outbox'
+
+
+def create_schedule(apps, schema_editor):
+    Schedule = apps.get_model('django_q', 'Schedule')
+    Schedule.objects.update_or_create(
+        name=SCHEDULE_NAME,
+        defaults={
+            'func': 'ework_core.tasks.drain_outbox_task',
+            'schedule_type': 'I',
+            'minutes': 1,
+            'repeats': -1,
+            'cluster': 'outbox',
+        },
+    )
+
+
+def delete_schedule(apps, schema_editor):
+    Schedule = apps.get_model('django_q', 'Schedule')
+    Schedule.objects.filter(name=SCHEDULE_NAME).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_q', '0019_alter_task_options_alter_ormq_key_alter_ormq_lock_and_more'),
+        ('ework_core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OutboxMessage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('chat_id', models.CharField(max_length=32, verbose_name='Чат')),
+                ('text', models.TextField(verbose_name='Текст')),
+                ('parse_mode', models.CharField(blank=True, max_length=16, verbose_name='Режим разметки')),
+                ('reply_markup', models.JSONField(blank=True, null=True, verbose_name='Клавиатура')),
+                ('status', models.CharField(choices=[('pending', 'Ожидает'), ('sent', 'Отправлено'), ('failed', 'Ошибка')], default='pending', max_length=10, verbose_name='Статус')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='Попыток')),
+                ('next_attempt_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Следующая попытка')),
+                ('last_error', models.TextField(blank=True, verbose_name='Последняя ошибка')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Создано')),
+                ('sent_at', models.DateTimeField(blank=True, null=True, verbose_name='Отправлено')),
+            ],
+            options={
+                'verbose_name': 'Сообщение Telegram',
+                'verbose_name_plural': 'Очередь сообщений Telegram',
+                'ordering': ['pk'],
+                'indexes': [models.Index(fields=['status', 'next_attempt_at'], name='ework_core__status_03aeaa_idx')],
+            },
+        ),
+        migrations.RunPython(create_schedule, delete_schedule),
+    ]
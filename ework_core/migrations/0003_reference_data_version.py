@@ -0,0 +1,24 @@
+# Generated by Django 5.2 on 2026-10-18 09:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ework_core', '0002_outbox_message'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReferenceDataVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveIntegerField(default=0, verbose_name='Версия')),
+            ],
+            options={
+                'verbose_name': 'Версия справочников',
+                'verbose_name_plural': 'Версия справочников',
+            },
+        ),
+    ]
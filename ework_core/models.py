@@ -0,0 +1,70 @@
+from django.db import models
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+
+
+class ModerationVerdict(models.Model):
+    """
+    Кэш результатов автомодерации по хэшу нормализованного текста.
+    Хранятся оценки категорий, поэтому смена порога не требует повторных запросов.
+    """
+    content_hash = models.CharField(max_length=64, unique=True, verbose_name=_("Хэш текста"))
+    category_scores = models.JSONField(default=dict, verbose_name=_("Оценки категорий"))
+    hits = models.PositiveIntegerField(default=0, verbose_name=_("Попаданий"))
+    created_at = models.DateTimeField(db_index=True, verbose_name=_("Дата проверки"))
+
+    class Meta:
+        verbose_name = _("Вердикт модерации")
+        verbose_name_plural = _("Вердикты модерации")
+
+    def __str__(self) -> str:
+        return self.content_hash
+
+
+class OutboxMessage(models.Model):
+    """Исходящее сообщение Telegram, ожидающее отправки очередью outbox"""
+    STATUS_PENDING = 'pending'
+    STATUS_SENT = 'sent'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = (
+        (STATUS_PENDING, _("Ожидает")),
+        (STATUS_SENT, _("Отправлено")),
+        (STATUS_FAILED, _("Ошибка")),
+    )
+
+    chat_id = models.CharField(max_length=32, verbose_name=_("Чат"))
+    text = models.TextField(verbose_name=_("Текст"))
+    parse_mode = models.CharField(max_length=16, blank=True, verbose_name=_("Режим разметки"))
+    reply_markup = models.JSONField(null=True, blank=True, verbose_name=_("Клавиатура"))
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING, verbose_name=_("Статус"))
+    attempts = models.PositiveSmallIntegerField(default=0, verbose_name=_("Попыток"))
+    next_attempt_at = models.DateTimeField(default=timezone.now, verbose_name=_("Следующая попытка"))
+    last_error = models.TextField(blank=True, verbose_name=_("Последняя ошибка"))
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name=_("Создано"))
+    sent_at = models.DateTimeField(null=True, blank=True, verbose_name=_("Отправлено"))
+
+    class Meta:
+        verbose_name = _("Сообщение Telegram")
+        verbose_name_plural = _("Очередь сообщений Telegram")
+        ordering = ['pk']
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at']),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.chat_id}: {self.text[:50]}"
+
+
+class ReferenceDataVersion(models.Model):
+    """
+    Версия справочников (рубрики, города, валюты), общая для всех процессов.
+    Единственная строка pk=1; изменение справочника увеличивает version (ework_core.refdata)
+    """
+    version = models.PositiveIntegerField(default=0, verbose_name=_("Версия"))
+
+    class Meta:
+        verbose_name = _("Версия справочников")
+        verbose_name_plural = _("Версия справочников")
+
+    def __str__(self) -> str:
+        return str(self.version)
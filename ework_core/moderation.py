@@ -0,0 +1,195 @@
+"""
+Очередь модерации постов.
+
+Пост, отправленный на модерацию, получает новый ключ moderation_key и задачу
+в отдельном кластере django_q "moderation" (число воркеров ограничено в
+Q_CLUSTER['ALT_CLUSTERS']). Кластер запускается командой
+    Q_CLUSTER_NAME=moderation python manage.py qcluster
+
+Ключ - идемпотентность: задача применяет вердикт, только если атомарно
+забрала свой ключ у поста. Повторная доставка той же задачи или задача
+для устаревшей версии поста ничего не меняют и не шлют уведомлений.
+Ошибки внешних сервисов повторяются с экспоненциальной задержкой.
+
+Автомодерация идет пачками: задача забирает вместе со своим постом другие
+ожидающие посты и проверяет их одним запросом к Mistral. Пачка собирается из
+того, что уже ждет в очереди, без ожидания. Перед проверкой задача атомарно
+забирает посты пачки: ключ каждого поста условным UPDATE меняется на маркер
+задачи claim_token(key), поэтому пост проверяет только одна задача, а задачи
+забранных постов находят свой ключ замененным и ничего не делают. Повторы и
+повторная доставка задачи продолжают работу с той же пачкой по маркеру.
+"""
+import uuid
+import logging
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from ework_config.utils import get_config
+from ework_post.facets import update_status
+from ework_post.models import AbsPost
+from .utils import MODERATION_BATCH_SIZE, moderate_posts
+
+logger = logging.getLogger(__name__)
+
+MODERATION_CLUSTER = 'moderation'
+MODERATION_TASK = 'ework_core.tasks.moderate_post_task'
+MAX_ATTEMPTS = 4
+RETRY_BASE_DELAY = 30  # секунд, удваивается с каждой попыткой
+CLAIM_PREFIX = '~'  # ключи enqueue_moderation - uuid hex, маркер задачи с ними не совпадает
+
+STATUS_MODERATION = 1
+STATUS_REJECTED = 2
+STATUS_PUBLISHED = 3
+
+
+def enqueue_moderation(post):
+    """Перевести пост в статус "На модерации" и поставить задачу в очередь"""
+    from django_q.tasks import async_task
+
+    key = uuid.uuid4().hex
+    with transaction.atomic():
+        AbsPost.objects.non_polymorphic().filter(pk=post.pk).update(moderation_key=key)
+        update_status(type(post).objects.filter(pk=post.pk), STATUS_MODERATION)
+
+    transaction.on_commit(lambda: async_task(
+        MODERATION_TASK, post.pk, key,
+        cluster=MODERATION_CLUSTER,
+        task_name=f'moderation-{post.pk}-{key[:8]}',
+    ))
+    return key
+
+
+def schedule_retry(post_id, key, attempt):
+    """Повторить модерацию позже с экспоненциальной задержкой"""
+    from django_q.models import Schedule
+    from django_q.tasks import schedule
+
+    delay = RETRY_BASE_DELAY * 2 ** attempt
+    schedule(
+        MODERATION_TASK, post_id, key, attempt + 1,
+        schedule_type=Schedule.ONCE,
+        next_run=timezone.now() + timedelta(seconds=delay),
+        cluster=MODERATION_CLUSTER,
+    )
+    logger.warning(f"Модерация поста {post_id} будет повторена через {delay} с (попытка {attempt + 2})")
+
+
+def get_pending_posts():
+    """Посты, ожидающие вердикта автомодерации"""
+    return AbsPost.objects.filter(status=STATUS_MODERATION, is_deleted=False).exclude(
+        moderation_key=''
+    ).select_related('user', 'city', 'currency', 'sub_rubric__super_rubric').order_by('pk')
+
+
+def claim_token(key):
+    """Маркер задачи с ключом key: той же длины, что и ключ, и не совпадает ни с одним ключом очереди"""
+    return key if key.startswith(CLAIM_PREFIX) else CLAIM_PREFIX + key[1:]
+
+
+def claim_batch(post_id, key, batch_size):
+    """
+    Забрать пост задачи и до batch_size - 1 других ожидающих постов под маркер задачи.
+    Посты, уже забранные другой задачей, пропускаются. Пустой список - пост задачи
+    уже обработан или ключ устарел.
+    """
+    token = claim_token(key)
+    posts = AbsPost.objects.non_polymorphic()
+    posts.filter(
+        pk=post_id, status=STATUS_MODERATION, is_deleted=False, moderation_key=key
+    ).update(moderation_key=token)
+    # Забранные этой задачей раньше: повторная попытка или повторная доставка
+    claimed = set(posts.filter(moderation_key=token).values_list('pk', flat=True))
+    if post_id not in claimed:
+        return []
+
+    free = batch_size - len(claimed)
+    if free > 0:
+        candidates = get_pending_posts().non_polymorphic().exclude(
+            moderation_key__startswith=CLAIM_PREFIX
+        ).values_list('pk', 'moderation_key')[:free]
+        for pk, item_key in candidates:
+            if posts.filter(pk=pk, moderation_key=item_key).update(moderation_key=token):
+                claimed.add(pk)
+    return list(get_pending_posts().filter(pk__in=claimed, moderation_key=token))
+
+
+def get_verdicts(posts):
+    """
+    Определить новые статусы постов по настройкам модерации.
+    Автомодерация выполняется одним запросом на всю пачку.
+    Возвращает {post.pk: (статус, уведомление или None)}
+    """
+    from .signals import send_admin_approval_notification, send_telegram_notification
+
+    config = get_config()
+    if not config.auto_moderation_enabled:
+        if config.manual_approval_required:
+            # Только ручная модерация
+            return {post.pk: (STATUS_MODERATION, send_admin_approval_notification) for post in posts}
+        # Нет модерации - сразу публикуем
+        return {post.pk: (STATUS_PUBLISHED, send_telegram_notification) for post in posts}
+
+    approved = moderate_posts([f"{post.title}\n{post.description}" for post in posts])
+    verdicts = {}
+    for post, is_approved in zip(posts, approved):
+        if not is_approved:
+            verdicts[post.pk] = (STATUS_REJECTED, None)
+        elif config.manual_approval_required:
+            # Авто + ручная модерация: ждем ручного одобрения
+            verdicts[post.pk] = (STATUS_MODERATION, send_admin_approval_notification)
+        else:
+            verdicts[post.pk] = (STATUS_PUBLISHED, send_telegram_notification)
+    return verdicts
+
+
+def apply_verdict(post, key, status):
+    """Атомарно забрать ключ модерации и сменить статус. False - вердикт уже применен"""
+    with transaction.atomic():
+        claimed = AbsPost.objects.non_polymorphic().filter(
+            pk=post.pk, moderation_key=key
+        ).update(moderation_key='')
+        if not claimed:
+            return False
+        update_status(type(post).objects.filter(pk=post.pk), status)
+    return True
+
+
+def run_moderation(post_id, key, attempt=0):
+    """
+    Выполнить модерацию поста; вызывается воркером кластера moderation.
+    Вместе с постом задачи модерируются остальные ожидающие посты:
+    их собственные задачи затем найдут ключ уже забранным.
+    """
+    batch_size = MODERATION_BATCH_SIZE if get_config().auto_moderation_enabled else 1
+    batch = claim_batch(post_id, key, batch_size)
+    if not batch:
+        logger.info(f"Модерация поста {post_id} пропущена: ключ {key} устарел или уже обработан")
+        return None
+
+    token = claim_token(key)
+    try:
+        verdicts = get_verdicts(batch)
+    except Exception as e:
+        logger.error(f"❌ Ошибка при модерации поста {post_id}: {e}")
+        if attempt + 1 < MAX_ATTEMPTS:
+            # Пачка остается за маркером и будет проверена повторной попыткой
+            schedule_retry(post_id, token, attempt)
+            return None
+        # Попытки исчерпаны - вся пачка уходит на ручную модерацию с уведомлением админам
+        from .signals import send_admin_approval_notification
+
+        logger.error(
+            f"❌ Автомодерация не удалась после {MAX_ATTEMPTS} попыток, на ручную модерацию: "
+            f"{', '.join(str(item.pk) for item in batch)}"
+        )
+        verdicts = {item.pk: (STATUS_MODERATION, send_admin_approval_notification) for item in batch}
+
+    for item in batch:
+        status, notify = verdicts[item.pk]
+        if apply_verdict(item, token, status) and notify:
+            notify(item)
+    if len(batch) > 1:
+        logger.info(f"Модерация: обработано {len(batch)} постов одним запросом")
+    return verdicts.get(post_id, (None,))[0]
@@ -0,0 +1,217 @@
+"""
+Очередь исходящих сообщений Telegram (outbox).
+
+Сообщения сохраняются в OutboxMessage и отправляются задачей drain_outbox
+в отдельном кластере django_q "outbox" с одним воркером, поэтому ограничения
+скорости соблюдаются одним процессом:
+- общий token bucket ~25 сообщений в секунду (лимит Bot API ~30/с);
+- на чат не чаще 1 сообщения в секунду, для групп 20 в минуту;
+- при 429 чат ставится на паузу на retry_after, сообщения не теряются;
+- несколько ожидающих сообщений одному чату без клавиатуры склеиваются в одно.
+
+Кластер запускается командой
+    Q_CLUSTER_NAME=outbox python manage.py qcluster
+"""
+import time
+import logging
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.utils import timezone
+
+from ework_config.utils import get_config
+from .models import OutboxMessage
+from .telegram_bot import notifier
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_CLUSTER = 'outbox'
+DRAIN_TASK = 'ework_core.tasks.drain_outbox_task'
+KICK_KEY = 'telegram_outbox:kick'
+KICK_INTERVAL = 2  # секунд между постановками задачи отправки
+
+GLOBAL_RATE = 25  # сообщений в секунду на бота
+PRIVATE_CHAT_RATE = 1  # сообщений в секунду в личный чат
+GROUP_CHAT_RATE = 20 / 60  # сообщений в секунду в группу
+DRAIN_BUDGET = 45  # секунд работы одной задачи
+FETCH_SIZE = 200
+MAX_MESSAGE_LENGTH = 4096
+MAX_ATTEMPTS = 5
+RETRY_BASE_DELAY = 30  # секунд, удваивается с каждой попыткой
+SENT_RETENTION = timedelta(days=7)
+
+
+class TokenBucket:
+    """Token bucket: rate токенов в секунду, не больше capacity в запасе"""
+
+    def __init__(self, rate, capacity=1):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self):
+        """Сколько секунд ждать до появления токена"""
+        self._refill()
+        return 0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def consume(self):
+        self._refill()
+        self.tokens -= 1
+
+
+def enqueue_message(chat_id, text, parse_mode='HTML', reply_markup=None):
+    """Поставить сообщение в очередь отправки"""
+    message = OutboxMessage.objects.create(
+        chat_id=str(chat_id),
+        text=text,
+        parse_mode=parse_mode or '',
+        reply_markup=reply_markup.model_dump(exclude_none=True) if reply_markup else None,
+    )
+    kick_drain()
+    return message
+
+
+def kick_drain():
+    """Запустить отправку, не чаще раза в KICK_INTERVAL секунд"""
+    from django_q.tasks import async_task
+
+    if cache.add(KICK_KEY, 1, KICK_INTERVAL):
+        try:
+            async_task(DRAIN_TASK, cluster=OUTBOX_CLUSTER)
+        except Exception as e:
+            # Сообщение уже сохранено, его заберет отправка по расписанию
+            logger.error(f"Не удалось поставить задачу отправки outbox: {e}")
+
+
+def coalesce(messages):
+    """
+    Сгруппировать сообщения в отправки: подряд идущие сообщения одному чату
+    без клавиатуры и с одинаковой разметкой объединяются в один текст.
+    Возвращает [(первое сообщение, [сообщения], текст)]
+    """
+    groups = []
+    open_groups = {}
+    for message in messages:
+        key = (message.chat_id, message.parse_mode)
+        group = open_groups.get(key)
+        if (
+            group is not None
+            and message.reply_markup is None
+            and len(group[2]) + len(message.text) + 2 <= MAX_MESSAGE_LENGTH
+        ):
+            group[1].append(message)
+            group[2] = f'{group[2]}\n\n{message.text}'
+            continue
+        group = [message, [message], message.text]
+        groups.append(group)
+        if message.reply_markup is None:
+            open_groups[key] = group
+        else:
+            open_groups.pop(key, None)
+    return [tuple(group) for group in groups]
+
+
+def _send(token, first, text):
+    from aiogram.types import InlineKeyboardMarkup
+
+    kwargs = {}
+    if first.parse_mode:
+        kwargs['parse_mode'] = first.parse_mode
+    if first.reply_markup:
+        kwargs['reply_markup'] = InlineKeyboardMarkup.model_validate(first.reply_markup)
+    notifier.send_message(token, first.chat_id, text, **kwargs)
+
+
+def _mark_failed(messages, error, permanent=False):
+    now = timezone.now()
+    for message in messages:
+        message.attempts += 1
+        message.last_error = str(error)[:1000]
+        if permanent or message.attempts >= MAX_ATTEMPTS:
+            message.status = OutboxMessage.STATUS_FAILED
+        else:
+            message.next_attempt_at = now + timedelta(seconds=RETRY_BASE_DELAY * 2 ** (message.attempts - 1))
+    OutboxMessage.objects.bulk_update(messages, ['attempts', 'last_error', 'status', 'next_attempt_at'])
+
+
+def drain_outbox(budget=DRAIN_BUDGET):
+    """Отправить готовые сообщения с учетом лимитов. Возвращает число отправленных"""
+    from aiogram.exceptions import (
+        TelegramBadRequest, TelegramForbiddenError, TelegramNotFound, TelegramRetryAfter
+    )
+
+    config = get_config()
+    if not config.bot_token:
+        logger.error("❌ Нет токена бота для отправки outbox")
+        return 0
+
+    OutboxMessage.objects.filter(
+        status=OutboxMessage.STATUS_SENT, sent_at__lt=timezone.now() - SENT_RETENTION
+    ).delete()
+
+    deadline = time.monotonic() + budget
+    global_bucket = TokenBucket(GLOBAL_RATE, capacity=GLOBAL_RATE)
+    chat_buckets = {}
+    paused_chats = set()
+    sent = 0
+
+    while time.monotonic() < deadline:
+        messages = list(OutboxMessage.objects.filter(
+            status=OutboxMessage.STATUS_PENDING, next_attempt_at__lte=timezone.now()
+        ).exclude(chat_id__in=paused_chats)[:FETCH_SIZE])
+        if not messages:
+            break
+
+        progressed = False
+        for first, group, text in coalesce(messages):
+            if time.monotonic() >= deadline:
+                break
+            if first.chat_id in paused_chats:
+                continue
+            chat_bucket = chat_buckets.setdefault(first.chat_id, TokenBucket(
+                GROUP_CHAT_RATE if first.chat_id.startswith('-') else PRIVATE_CHAT_RATE
+            ))
+            if chat_bucket.wait_time() > 0:
+                continue
+            time.sleep(global_bucket.wait_time())
+
+            global_bucket.consume()
+            chat_bucket.consume()
+            progressed = True
+            try:
+                _send(config.bot_token, first, text)
+            except TelegramRetryAfter as e:
+                # Flood control: чат ждет retry_after, сообщения остаются в очереди
+                logger.warning(f"Telegram 429 для чата {first.chat_id}, повтор через {e.retry_after} с")
+                paused_chats.add(first.chat_id)
+                OutboxMessage.objects.filter(pk__in=[m.pk for m in group]).update(
+                    next_attempt_at=timezone.now() + timedelta(seconds=e.retry_after)
+                )
+                continue
+            except (TelegramBadRequest, TelegramForbiddenError, TelegramNotFound) as e:
+                logger.error(f"❌ Сообщение в чат {first.chat_id} отклонено Telegram: {e}")
+                _mark_failed(group, e, permanent=True)
+                continue
+            except Exception as e:
+                logger.error(f"❌ Ошибка при отправке в чат {first.chat_id}: {e}")
+                _mark_failed(group, e)
+                continue
+
+            OutboxMessage.objects.filter(pk__in=[m.pk for m in group]).update(
+                status=OutboxMessage.STATUS_SENT, sent_at=timezone.now(), attempts=first.attempts + 1
+            )
+            sent += 1
+
+        if not progressed:
+            # Все готовые чаты ждут своего лимита
+            time.sleep(min(1 / PRIVATE_CHAT_RATE, max(0, deadline - time.monotonic())))
+
+    if sent:
+        logger.info(f"Outbox: отправлено {sent} сообщений")
+    return sent
@@ -0,0 +1,151 @@
+"""
+Справочники (категории, рубрики, города, валюты) в памяти процесса.
+
+Данные загружаются одним набором запросов и хранятся неизменяемыми кортежами
+namedtuple. Актуальность проверяется по номеру версии в БД
+(ReferenceDataVersion): сохранение или удаление справочника увеличивает версию,
+а каждый процесс (web, бот, django_q) раз в VERSION_CHECK_INTERVAL секунд
+сверяет с ней свою копию одним запросом по первичному ключу и перечитывает
+данные после изменения.
+"""
+import time
+import threading
+from collections import namedtuple
+from types import MappingProxyType
+
+from django.db.models import F
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from ework_currency.models import Currency
+from ework_locations.models import City
+from ework_rubric.models import SuperRubric, SubRubric
+from .models import ReferenceDataVersion
+
+VERSION_CHECK_INTERVAL = 1.0  # секунд
+
+SuperRubricRef = namedtuple('SuperRubricRef', 'id name slug order')
+SubRubricRef = namedtuple('SubRubricRef', 'id name slug order icon_url super_rubric_id')
+CityRef = namedtuple('CityRef', 'id name order')
+CurrencyRef = namedtuple('CurrencyRef', 'id name code symbol order')
+
+
+class ReferenceData(namedtuple('ReferenceData', 'super_rubrics sub_rubrics cities currencies')):
+    """Снимок справочников; поиск по id через неизменяемые словари"""
+
+    def __new__(cls, *args, **kwargs):
+        self = super().__new__(cls, *args, **kwargs)
+        self._super_by_id = MappingProxyType({r.id: r for r in self.super_rubrics})
+        self._sub_by_id = MappingProxyType({r.id: r for r in self.sub_rubrics})
+        self._city_by_id = MappingProxyType({c.id: c for c in self.cities})
+        self._currency_by_id = MappingProxyType({c.id: c for c in self.currencies})
+        return self
+
+    def super_rubric(self, pk):
+        return self._super_by_id.get(pk)
+
+    def super_rubric_by_slug(self, slug):
+        return next((r for r in self.super_rubrics if r.slug == slug), None)
+
+    def sub_rubric(self, pk):
+        return self._sub_by_id.get(pk)
+
+    def sub_rubrics_of(self, super_rubric_id):
+        return tuple(r for r in self.sub_rubrics if r.super_rubric_id == super_rubric_id)
+
+    def city(self, pk):
+        return self._city_by_id.get(pk)
+
+    def currency(self, pk):
+        return self._currency_by_id.get(pk)
+
+    @property
+    def default_currency(self):
+        return self.currencies[0] if self.currencies else None
+
+
+_state = None  # (версия, время проверки, ReferenceData)
+_lock = threading.Lock()
+
+
+def _is_fresh(state):
+    return state is not None and time.monotonic() - state[1] < VERSION_CHECK_INTERVAL
+
+
+def _current_version():
+    return ReferenceDataVersion.objects.filter(pk=1).values_list('version', flat=True).first() or 0
+
+
+def _load():
+    icon_storage = SubRubric._meta.get_field('icon').storage
+    super_rubrics = tuple(
+        SuperRubricRef(*row)
+        for row in SuperRubric.objects.order_by('order', 'pk').values_list('id', 'name', 'slug', 'order')
+    )
+    super_order = {r.id: index for index, r in enumerate(super_rubrics)}
+    sub_rubrics = sorted(
+        (
+            SubRubricRef(pk, name, slug, order, icon_storage.url(icon) if icon else '', super_rubric_id)
+            for pk, name, slug, order, icon, super_rubric_id in SubRubric.objects.values_list(
+                'id', 'name', 'slug', 'order', 'icon', 'super_rubric_id'
+            )
+        ),
+        key=lambda r: (super_order.get(r.super_rubric_id, 0), r.order, r.id),
+    )
+    cities = tuple(CityRef(*row) for row in City.objects.order_by('order', 'name').values_list('id', 'name', 'order'))
+    currencies = tuple(
+        CurrencyRef(*row)
+        for row in Currency.objects.order_by('order', 'pk').values_list('id', 'name', 'code', 'symbol', 'order')
+    )
+    return ReferenceData(super_rubrics, tuple(sub_rubrics), cities, currencies)
+
+
+def get_refdata():
+    """Текущий снимок справочников; запросы к БД только после изменения"""
+    global _state
+    state = _state
+    if _is_fresh(state):
+        return state[2]
+    with _lock:
+        state = _state
+        if not _is_fresh(state):
+            version = _current_version()
+            if state is not None and state[0] == version:
+                state = (version, time.monotonic(), state[2])
+            else:
+                state = (version, time.monotonic(), _load())
+            _state = state
+    return state[2]
+
+
+def set_choices(field, refs):
+    """
+    Варианты ModelChoiceField из справочника вместо запроса при рендере.
+    Queryset поля остается для проверки выбранного значения.
+    """
+    choices = [(ref.id, ref.name) for ref in refs]
+    if field.empty_label is not None:
+        choices.insert(0, ('', field.empty_label))
+    field.choices = choices
+
+
+def invalidate():
+    """Сбросить справочники во всех процессах"""
+    global _state
+    if not ReferenceDataVersion.objects.filter(pk=1).update(version=F('version') + 1):
+        _, created = ReferenceDataVersion.objects.get_or_create(pk=1, defaults={'version': 1})
+        if not created:
+            ReferenceDataVersion.objects.filter(pk=1).update(version=F('version') + 1)
+    _state = None
+
+
+@receiver(post_save, sender=SuperRubric)
+@receiver(post_save, sender=SubRubric)
+@receiver(post_save, sender=City)
+@receiver(post_save, sender=Currency)
+@receiver(post_delete, sender=SuperRubric)
+@receiver(post_delete, sender=SubRubric)
+@receiver(post_delete, sender=City)
+@receiver(post_delete, sender=Currency)
+def invalidate_on_change(sender, **kwargs):
+    invalidate()
@@ -4,6 +4,7 @@ from django.utils import timezone
 from django.db.models import Q
 
 from ework_post.models import AbsPost
+from ework_post.facets import update_status
 from ework_config.models import SiteConfig
 
 logger = logging.getLogger(__name__)
@@ -34,7 +35,7 @@ def archive_expired_posts():
         
         if expired_count > 0:
             # Обновляем статус на "архив" (статус 4)
-            updated_count = expired_posts.update(status=4)
+            updated_count = update_status(expired_posts, 4)
             logger.info(f"Успешно архивировано {updated_count} постов")
             
             # Логируем детали архивированных постов
@@ -56,4 +57,21 @@ def archive_expired_posts():
             'success': False,
             'error': str(e),
             'message': 'Ошибка при архивации постов'
-        }
\ No newline at end of file
+        }
+
+def moderate_post_task(post_id, key, attempt=0):
+    """
+    Модерация поста
+    Выполняется в кластере moderation, ставится в очередь при отправке поста на модерацию
+    """
+    from .moderation import run_moderation
+    return run_moderation(post_id, key, attempt)
+
+
+def drain_outbox_task():
+    """
+    Отправка очереди сообщений Telegram
+    Выполняется в кластере outbox по расписанию раз в минуту и при постановке сообщений
+    """
+    from .outbox import drain_outbox
+    return drain_outbox()
@@ -1,35 +1,111 @@
-from aiogram import Bot
-import html
+"""
+Отправка уведомлений в Telegram из Django (сайт, воркеры django_q).
 
+TelegramNotifier - один на процесс: фоновый поток с постоянным event loop
+и по одному Bot на токен. Сессия aiohttp бота живет все время работы процесса,
+поэтому соединение с Bot API переиспользуется (keep-alive) вместо нового
+TLS рукопожатия, event loop и потока на каждое сообщение.
+"""
+import os
+import html
+import atexit
+import asyncio
 import logging
+import threading
+
+from aiogram import Bot
 
 logging.basicConfig(level=logging.ERROR)
+logger = logging.getLogger(__name__)
+
+SEND_TIMEOUT = 30  # секунд ожидания отправки вызывающим кодом
+
+
+class TelegramNotifier:
+    """Постоянные сессии ботов в отдельном потоке с event loop"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._loop = None
+        self._thread = None
+        self._bots = {}
+
+    def _ensure_loop(self):
+        with self._lock:
+            if self._pid != os.getpid():
+                # Процесс был форкнут (воркеры django_q): поток родителя здесь не работает
+                self._reset()
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(
+                    target=self._loop.run_forever, name='telegram-notifier', daemon=True
+                )
+                self._thread.start()
+            return self._loop
 
+    def _get_bot(self, token):
+        bot = self._bots.get(token)
+        if bot is None:
+            bot = self._bots[token] = Bot(token=token)
+        return bot
 
-async def send_telegram_message(token, chat_id, message, parse_mode='HTML'):
-    bot = Bot(token=token)
+    def run(self, func, token, *args, timeout=SEND_TIMEOUT, **kwargs):
+        """Выполнить корутину func(bot, ...) в потоке уведомлений и дождаться результата"""
+        loop = self._ensure_loop()
+
+        async def call():
+            return await func(self._get_bot(token), *args, **kwargs)
+
+        return asyncio.run_coroutine_threadsafe(call(), loop).result(timeout)
+
+    def send_message(self, token, chat_id, text, **kwargs):
+        """Отправить сообщение; исключения Bot API пробрасываются вызывающему"""
+        async def send(bot):
+            return await bot.send_message(chat_id=chat_id, text=text, **kwargs)
+        return self.run(send, token)
+
+    def close(self):
+        """Закрыть сессии ботов и остановить поток"""
+        loop = self._loop
+        if loop is None or self._pid != os.getpid():
+            return
+
+        async def close_sessions():
+            for bot in self._bots.values():
+                await bot.session.close()
+
+        try:
+            asyncio.run_coroutine_threadsafe(close_sessions(), loop).result(5)
+        except Exception as e:
+            logger.error(f"Ошибка при закрытии сессий Telegram: {e}")
+        loop.call_soon_threadsafe(loop.stop)
+        self._reset()
+
+
+notifier = TelegramNotifier()
+atexit.register(notifier.close)
+
+
+def send_telegram_message(token, chat_id, message, parse_mode='HTML'):
     try:
         if parse_mode == 'HTML':
             message = html.escape(message)
-        await bot.send_message(chat_id=chat_id, text=message, parse_mode=parse_mode)
+        notifier.send_message(token, chat_id, message, parse_mode=parse_mode)
+        return True
     except Exception as e:
-        logging.error(f"Ошибка при отправке сообщения: {e}")
-    finally:
-        await bot.session.close()
-
+        logger.error(f"Ошибка при отправке сообщения: {e}")
+        return False
 
 
-async def send_telegram_message_with_keyboard(token, chat_id, message, keyboard, parse_mode='HTML'):
+def send_telegram_message_with_keyboard(token, chat_id, message, keyboard, parse_mode='HTML'):
     """Отправляет сообщение в Telegram с inline клавиатурой"""
-    bot = Bot(token=token)
     try:
-        await bot.send_message(
-            chat_id=chat_id, 
-            text=message, 
-            parse_mode=parse_mode,
-            reply_markup=keyboard
-        )
+        notifier.send_message(token, chat_id, message, parse_mode=parse_mode, reply_markup=keyboard)
+        return True
     except Exception as e:
-        logging.error(f"Ошибка при отправке сообщения: {e}")
-    finally:
-        await bot.session.close()
+        logger.error(f"Ошибка при отправке сообщения: {e}")
+        return False
@@ -2,7 +2,7 @@
 from django.urls import path
 
 from . import views
-from ework_post.views import PricingCalculatorView, PostPaymentSuccessView
+from ework_post.views import PricingCalculatorView, PostPaymentSuccessView, image_variant
 
 app_name = 'core'
 
@@ -18,6 +18,9 @@ urlpatterns = [
 
     path('premium/', views.premium, name='premium'),
 
+    # Размерные варианты изображений, создаются при первом запросе
+    path('img/<str:variant>/<path:name>', image_variant, name='image_variant'),
+
     path('post/<int:pk>/status/<int:status>/', views.change_post_status, name='change_post_status'),
     path('post/<int:pk>/edit/', views.post_edit, name='post_edit'),
     path('post/<int:pk>/delete/', views.post_delete_confirm, name='post_delete_confirm'),
@@ -1,22 +1,135 @@
+import hashlib
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
 from mistralai import Mistral
 
-def moderate_post(text):
+MODERATION_MODEL = "mistral-moderation-latest"
+# Сколько текстов отправляется в Mistral одним запросом
+MODERATION_BATCH_SIZE = 16
+
+_clients = {}
+
+
+def get_mistral_client(api_key):
+    """Клиент Mistral переиспользуется между вызовами (одно HTTP соединение)"""
+    client = _clients.get(api_key)
+    if client is None:
+        _clients.clear()
+        client = _clients[api_key] = Mistral(api_key=api_key)
+    return client
+
+
+class FakeModerationClassifier:
+    """
+    Локальный классификатор для разработки и тестов без доступа к API.
+    Включается настройкой MODERATION_BACKEND = 'fake'.
+    Возвращает оценку 1.0 для категории, если в тексте есть одно из ее стоп-слов.
+    """
+    STOP_WORDS = {
+        'dangerous_and_criminal_content': ('наркотик', 'закладк', 'оружи'),
+        'financial': ('казино', 'ставки', 'крипто-пирамид'),
+        'sexual': ('интим', 'эскорт'),
+        'pii': ('паспортные данные',),
+    }
+
+    def classify(self, texts):
+        results = []
+        for text in texts:
+            text = text.lower()
+            results.append({
+                category: 1.0 if any(word in text for word in words) else 0.0
+                for category, words in self.STOP_WORDS.items()
+            })
+        return results
+
+
+def classify_texts(texts, api_key):
+    """Оценки категорий нарушений для каждого текста, один запрос на пачку"""
+    if getattr(settings, 'MODERATION_BACKEND', 'mistral') == 'fake':
+        return FakeModerationClassifier().classify(texts)
+
+    scores = []
+    client = get_mistral_client(api_key)
+    for start in range(0, len(texts), MODERATION_BATCH_SIZE):
+        chunk = texts[start:start + MODERATION_BATCH_SIZE]
+        response = client.classifiers.moderate_chat(
+            model=MODERATION_MODEL,
+            inputs=[[{"role": "user", "content": text}] for text in chunk]
+        )
+        if len(response.results) != len(chunk):
+            raise ValueError(f"Mistral вернул {len(response.results)} результатов на {len(chunk)} текстов")
+        scores.extend(result.category_scores for result in response.results)
+    return scores
+
+
+def normalize_text(text):
+    """Нормализация текста для кэша: регистр, ё и пробелы не влияют на вердикт"""
+    return ' '.join(text.lower().replace('ё', 'е').split())
+
+
+def content_hash(text):
+    return hashlib.sha256(normalize_text(text).encode()).hexdigest()
+
+
+def get_category_scores(texts, config):
+    """
+    Оценки категорий для текстов с кэшем по хэшу содержимого.
+    В классификатор уходят только тексты без свежего вердикта, каждый один раз.
+    """
+    from ework_core.models import ModerationVerdict
+    from ework_stats.models import DailyStats
+
+    hashes = [content_hash(text) for text in texts]
+    fresh_since = timezone.now() - timedelta(hours=config.moderation_cache_ttl_hours)
+    cached = dict(ModerationVerdict.objects.filter(
+        content_hash__in=set(hashes), created_at__gte=fresh_since
+    ).values_list('content_hash', 'category_scores'))
+
+    missing = {}
+    for text, text_hash in zip(texts, hashes):
+        if text_hash not in cached:
+            missing.setdefault(text_hash, text)
+
+    if missing:
+        scores = classify_texts(list(missing.values()), config.mistral_api_key)
+        now = timezone.now()
+        fetched = {text_hash: dict(category_scores) for text_hash, category_scores in zip(missing, scores)}
+        ModerationVerdict.objects.bulk_create(
+            [
+                ModerationVerdict(content_hash=text_hash, category_scores=category_scores, created_at=now)
+                for text_hash, category_scores in fetched.items()
+            ],
+            update_conflicts=True,
+            unique_fields=['content_hash'],
+            update_fields=['category_scores', 'created_at'],
+        )
+        cached.update(fetched)
+
+    hit_hashes = [text_hash for text_hash in hashes if text_hash not in missing]
+    if hit_hashes:
+        ModerationVerdict.objects.filter(content_hash__in=set(hit_hashes)).update(hits=F('hits') + 1)
+    DailyStats.add_moderation_cache_stats(hits=len(hit_hashes), misses=len(texts) - len(hit_hashes))
+    return [cached[text_hash] for text_hash in hashes]
+
+
+def moderate_posts(texts):
+    """Проверить пачку текстов; для каждого True, если нарушений нет"""
     from ework_config.utils import get_config
     config = get_config()
-    
-    if not config.mistral_api_key:
-        return True 
-    client = Mistral(api_key=config.mistral_api_key)
-    response = client.classifiers.moderate_chat(
-        model="mistral-moderation-latest",
-        inputs=[{"role": "user", "content": text}]
-    )
-    
-    category_scores = response.results[0].category_scores
-    
-    has_violations = any(
-        category_score > 0.5 
-        for category_score in category_scores.values()
-    )
-
-    return not has_violations
+
+    if not texts:
+        return []
+    if not config.mistral_api_key and getattr(settings, 'MODERATION_BACKEND', 'mistral') != 'fake':
+        return [True] * len(texts)
+
+    return [
+        not any(score > config.moderation_threshold for score in category_scores.values())
+        for category_scores in get_category_scores(texts, config)
+    ]
+
+
+def moderate_post(text):
+    return moderate_posts([text])[0]
@@ -1,23 +1,26 @@
 from django.contrib import messages 
+from django.core.cache import cache
 from django.contrib.auth.decorators import login_required
 from django.http import HttpResponse, JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
-from django.contrib.contenttypes.models import ContentType
 from django.utils.translation import gettext_lazy as _ 
 from django.urls import reverse
-from django.utils import timezone
 from django.views.decorators.http import require_POST
 from django.views.generic import ListView, DetailView, View
-from django.db.models import Count
 import json
+import hashlib
 from django.utils.decorators import method_decorator
-import asyncio
 import logging
-from ework_rubric.models import SuperRubric, SubRubric
-from ework_post.models import AbsPost, Favorite, BannerPost, PostView
+from ework_core.refdata import get_refdata
+from ework_post.models import AbsPost, Favorite, BannerPost
 from ework_post.views import BasePostListView
-from ework_locations.models import City
+from ework_post.pagination import KeysetPaginationMixin
+from ework_post.view_buffer import record_view
+from ework_post.counters import change_favorites
+from ework_stats.uniques import post_unique_viewers
+from ework_post.facets import get_facets
 from ework_job.choices import EXPERIENCE_CHOICES, WORK_FORMAT_CHOICES, WORK_SCHEDULE_CHOICES
+from ework_job.models import PostJob
 from ework_premium.models import Package
 
 logger = logging.getLogger(__name__)
@@ -26,7 +29,7 @@ logger = logging.getLogger(__name__)
 def home(request):
     """Главная страница с категориями и баннерами"""
     context = {
-        "categories": SuperRubric.objects.order_by('order'),
+        "categories": get_refdata().super_rubrics,
         "banners": BannerPost.objects.filter(is_active=True).order_by('order')[:5],
     }
     return render(request, "pages/index.html", context)
@@ -38,8 +41,8 @@ def modal_select_post(request):
     return render(request, 'includes/modal_select_post.html')
 
 
-class PostListByRubricView(BasePostListView):
-    """Оптимизированный список постов по рубрике"""
+class PostListByRubricView(KeysetPaginationMixin, BasePostListView):
+    """Оптимизированный список постов по рубрике с курсорной пагинацией"""
     template_name = 'components/card.html'
     paginate_by = 20
 
@@ -47,30 +50,36 @@ class PostListByRubricView(BasePostListView):
         self.super_rubric = None
         rubric_pk = self.kwargs.get('rubric_pk')
         if rubric_pk:
-            self.super_rubric = SuperRubric.objects.select_related().filter(pk=rubric_pk).first()
+            self.super_rubric = get_refdata().super_rubric(rubric_pk)
         self.is_job_category = bool(self.super_rubric and self.super_rubric.slug == 'rabota')
         return super().dispatch(request, *args, **kwargs)
 
+    def get_post_model(self):
+        """Для рубрики вакансий выборка идет напрямую по таблице PostJob"""
+        if self.is_job_category:
+            return PostJob
+        return super().get_post_model()
+
     def get_queryset(self):
         """Получить оптимизированный queryset с фильтрами"""
         qs = super().get_queryset()
         if self.super_rubric:
-            qs = qs.filter(sub_rubric__super_rubric=self.super_rubric)
+            qs = qs.filter(sub_rubric__super_rubric_id=self.super_rubric.id)
         if self.is_job_category:
             qs = self._apply_job_filters(qs)
         
         return qs
 
     def _apply_job_filters(self, qs):
-        """Применить фильтры специфичные для вакансий"""
-        from ework_job.models import PostJob
-        job_ids = PostJob.objects.values_list('id', flat=True)
-        qs = qs.filter(id__in=job_ids)
-
+        """
+        Применить фильтры специфичные для вакансий.
+        qs уже построен по PostJob: фильтры идут по колонкам дочерней таблицы
+        (составной индекс experience/work_format/work_schedule) с одним JOIN к AbsPost.
+        """
         params = {
-            'postjob__experience': self.request.GET.get('experience'),
-            'postjob__work_format': self.request.GET.get('work_format'),
-            'postjob__work_schedule': self.request.GET.get('work_schedule'),
+            'experience': self.request.GET.get('experience'),
+            'work_format': self.request.GET.get('work_format'),
+            'work_schedule': self.request.GET.get('work_schedule'),
         }
         
         for field, value in params.items():
@@ -79,18 +88,43 @@ class PostListByRubricView(BasePostListView):
         
         return qs
 
+    def _get_selected_facets(self):
+        """Выбранные в запросе значения фильтров для подсчета фасетов"""
+        fields = ('sub_rubric', 'city')
+        if self.is_job_category:
+            fields += ('experience', 'work_format', 'work_schedule')
+        selected = {}
+        for field in fields:
+            value = self.request.GET.get(field, '')
+            if value.isdigit():
+                selected[field] = int(value)
+        return selected
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
+        if self.is_cursor_request():
+            return context
+
+        refdata = get_refdata()
+        facets = {}
         if self.super_rubric:
-            context['categories'] = SubRubric.objects.filter(
-                super_rubric=self.super_rubric
-            ).order_by('order')
+            facets = get_facets(self.super_rubric.id, self._get_selected_facets())
+            context['categories'] = [
+                {**category._asdict(), 'post_count': facets['sub_rubric'][category.id]}
+                for category in refdata.sub_rubrics_of(self.super_rubric.id)
+            ]
         else:
             context['categories'] = []
-        
+
+        cities = [
+            {**city._asdict(), 'post_count': facets['city'][city.id] if facets else None}
+            for city in refdata.cities
+        ]
+
         context.update({
-            'cities': City.objects.order_by('order'),
-            'rubric_pk': getattr(self.super_rubric, 'pk', None),
+            'cities': cities,
+            'facet_total': facets.get('total'),
+            'rubric_pk': getattr(self.super_rubric, 'id', None),
             'category_slug': getattr(self.super_rubric, 'slug', ''),
             'is_job_category': self.is_job_category,
             'is_service_category': bool(self.super_rubric and self.super_rubric.slug == 'uslugi'),
@@ -98,15 +132,23 @@ class PostListByRubricView(BasePostListView):
         
         if self.is_job_category:
             context.update({
-                'experience_choices': EXPERIENCE_CHOICES,
-                'work_format_choices': WORK_FORMAT_CHOICES,
-                'work_schedule_choices': WORK_SCHEDULE_CHOICES,
+                'experience_choices': self._with_counts(EXPERIENCE_CHOICES, facets.get('experience')),
+                'work_format_choices': self._with_counts(WORK_FORMAT_CHOICES, facets.get('work_format')),
+                'work_schedule_choices': self._with_counts(WORK_SCHEDULE_CHOICES, facets.get('work_schedule')),
                 'experience': self.request.GET.get('experience', ''),
                 'work_format': self.request.GET.get('work_format', ''),
                 'work_schedule': self.request.GET.get('work_schedule', ''),
             })
         return context
 
+    @staticmethod
+    def _with_counts(choices, counts):
+        """Добавить к вариантам выбора число подходящих постов"""
+        return [
+            (value, label, counts[value] if counts is not None else None)
+            for value, label in choices
+        ]
+
 @method_decorator(login_required(login_url='users:telegram_auth'), name='dispatch')
 class PostDetailView(DetailView):
     """детальный просмотр поста"""
@@ -121,30 +163,15 @@ class PostDetailView(DetailView):
 
     def get_object(self, queryset=None):
         obj = super().get_object(queryset)
-        if (self.request.user.is_authenticated and 
-            obj.user_id != self.request.user.id):
-            ct = ContentType.objects.get_for_model(obj)
-            PostView.objects.get_or_create(
-                user=self.request.user,
-                content_type=ct,
-                object_id=obj.pk,
-                defaults={'created_at': timezone.now()}
-            )
+        record_view(self.request.user, obj)
         return obj
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        stats = PostView.objects.filter(
-            content_type=ContentType.objects.get_for_model(self.object),
-            object_id=self.object.pk
-        ).aggregate(
-            total_views=Count('id'),
-            unique_viewers=Count('user', distinct=True)
-        )
         
         context.update({
-            'view_count': stats['total_views'],
-            'unique_viewers': stats['unique_viewers'],
+            'view_count': self.object.view_count,
+            'unique_viewers': self.object.unique_viewer_count,
             'is_favorite': False,
             'favorite_post_ids': []
         })
@@ -156,12 +183,15 @@ class PostDetailView(DetailView):
             ).exists()
             context['is_favorite'] = is_favorite
             context['favorite_post_ids'] = [self.object.pk] if is_favorite else []
+            if self.request.user.pk == self.object.user_id:
+                # Автору - уникальные зрители за 30 дней по скетчам (счетчик поста - за все время)
+                context['recent_unique_viewers'] = post_unique_viewers(self.object.pk)
         
         return context
 
 @method_decorator(login_required(login_url='users:telegram_auth'), name='dispatch')
-class FavoriteListView(ListView):
-    """Список избранных постов"""
+class FavoriteListView(KeysetPaginationMixin, ListView):
+    """Список избранных постов с курсорной пагинацией"""
     model = AbsPost
     template_name = 'pages/favorites.html'
     context_object_name = 'posts'
@@ -176,10 +206,9 @@ class FavoriteListView(ListView):
 
     def get_context_data(self, **kwargs):
         ctx = super().get_context_data(**kwargs)
-        total = self.get_queryset().count()
         ctx.update({
             'title': 'Избранное',
-            'has_more': total > len(ctx['posts']),
+            'favorite_post_ids': [post.pk for post in ctx['posts']],
         })
         return ctx
     
@@ -194,6 +223,7 @@ def toggle_favorite(request, post_pk):
         is_favorite = False
     else:
         is_favorite = True
+    change_favorites(post.pk, 1 if is_favorite else -1)
     if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
         return JsonResponse({
             'success': True,
@@ -221,10 +251,24 @@ def premium(request):
 
 #перенесены в  Payment 
 # Этап 5: Создание инвойса
-@method_decorator(login_required(login_url='users:telegram_auth'), name='dispatch')
+INVOICE_LINK_TTL = 60 * 60 * 24  # ссылка на инвойс переиспользуется сутки
+
+
+def invoice_cache_key(payment):
+    """Ключ кэша ссылки: платеж, сумма и состав аддонов"""
+    addons = json.dumps(payment.addons_data or {}, sort_keys=True)
+    digest = hashlib.sha256(f'{payment.id}:{payment.amount}:{addons}'.encode()).hexdigest()
+    return f'invoice_link:{digest}'
+
+
+@method_decorator(login_required(login_url='users:telegram_auth'), name='post')
 class CreateInvoiceView(View):
-    """API для создания инвойса через Telegram Bot"""
-    def post(self, request, *args, **kwargs):
+    """
+    API для создания инвойса через Telegram Bot.
+    Асинхронный: запрос к Telegram не занимает поток воркера (ASGI).
+    Повторные запросы Mini App по тому же платежу получают уже выданную ссылку.
+    """
+    async def post(self, request, *args, **kwargs):
         try:
             data = json.loads(request.body)
             payment_id = data.get('payment_id')
@@ -232,75 +276,47 @@ class CreateInvoiceView(View):
                 return JsonResponse({'success': False, 'error': 'payment_id обязателен'}, status=400)
 
             from ework_premium.models import Payment
+            user = await request.auser()
             try:
-                payment = Payment.objects.get(
+                payment = await Payment.objects.select_related('user').aget(
                     id=payment_id,
-                    user=request.user,
+                    user=user,
                     status='pending'
                 )
             except Payment.DoesNotExist:
                 return JsonResponse({'success': False, 'error': 'Платеж не найден'}, status=404)
 
-            if not request.user.telegram_id:
+            if not user.telegram_id:
                 return JsonResponse({'success': False, 'error': 'У пользователя не задан telegram_id'}, status=400)
 
+            cache_key = invoice_cache_key(payment)
+            invoice_link = await cache.aget(cache_key)
+            if invoice_link:
+                return JsonResponse({'success': True, 'invoice_link': invoice_link})
+
             from ework_bot_tg.bot.bot import create_invoice_link
-            
-            try:
-                loop = asyncio.get_event_loop()
-            except RuntimeError:
-                loop = asyncio.new_event_loop()
-                asyncio.set_event_loop(loop)
-            
-            invoice_link = loop.run_until_complete(
-                create_invoice_link(
-                    user_id=request.user.telegram_id,
-                    payment_id=payment.id,
-                    payload=payment.get_payload(),
-                    amount=payment.amount,
-                    order_id=payment.order_id,
-                    addons_data=payment.addons_data
-                )
+            from ework_bot_tg.webhook import runner
+            # HTTP клиент бота живет в цикле webhook.runner, а не в цикле запроса
+            invoice_link = await runner.call(
+                create_invoice_link,
+                user_id=user.telegram_id,
+                payment_id=payment.id,
+                payload=payment.get_payload(),
+                amount=payment.amount,
+                order_id=payment.order_id,
+                addons_data=payment.addons_data
             )
 
             if not invoice_link:
                 return JsonResponse({'success': False, 'error': 'Ошибка создания инвойса'}, status=500)
 
+            await cache.aset(cache_key, invoice_link, INVOICE_LINK_TTL)
             return JsonResponse({'success': True, 'invoice_link': invoice_link})
 
         except Exception as e:
-            import traceback
-            traceback.print_exc()
+            logger.exception("Ошибка создания инвойса")
             return JsonResponse({'success': False, 'error': f'Внутренняя ошибка: {e}'}, status=500)
 
-# перенести в  Payment 
-# Этап 8: Обработка успешной оплаты
-def publish_post_after_payment(user_id, payment_id):
-    """Функция для публикации поста после успешной оплаты"""
-    try:
-        from ework_premium.models import Payment
-        payment = Payment.objects.select_related('user', 'post').get(
-            id=payment_id,
-            user__telegram_id=user_id,
-            status='pending'
-        )
-    
-        if not payment.post:
-            payment.status = 'paid'
-            payment.save(update_fields=['status'])
-            return False
-        payment.status = 'paid'
-        payment.save(update_fields=['status'])
-        
-        return True
-        
-    except Exception as e:
-        logger.error(f"❌ Ошибка публикации поста после оплаты: {e}")
-        import traceback
-        logger.error(f"❌ Traceback: {traceback.format_exc()}")
-        return False
-
-
 @login_required
 @require_POST
 def change_post_status(request, pk, status):
@@ -1,6 +1,8 @@
 from django.contrib import admin
 from django.utils.html import format_html
 from django.utils.safestring import mark_safe
+from ework_post.facets import update_status
+from ework_post.image_variants import variant_url
 from .models import PostJob
 
 
@@ -57,24 +59,25 @@ class PostJobAdmin(admin.ModelAdmin):
     
     def approve_posts(self, request, queryset):
         """Одобрить посты (ручная модерация)"""
-        updated = queryset.filter(status=1).update(status=3)  # На модерации → Опубликовано
+        updated = update_status(queryset.filter(status=1), 3)  # На модерации → Опубликовано
         self.message_user(request, f"Одобрено: {updated} объявлений")
     approve_posts.short_description = "Одобрить посты"
     
     def reject_posts(self, request, queryset):
         """Отклонить посты (ручная модерация)"""
-        updated = queryset.exclude(status=2).update(status=2)  # → Отклонено
+        updated = update_status(queryset.exclude(status=2), 2)  # → Отклонено
         self.message_user(request, f"Отклонено: {updated} объявлений")
     reject_posts.short_description = "Отклонить посты"
     
     def archive_posts(self, request, queryset):
         """Архивировать посты"""
-        updated = queryset.update(status=4)  # → Архив
+        updated = update_status(queryset, 4)  # → Архив
         self.message_user(request, f"Архивировано: {updated} объявлений")
     archive_posts.short_description = "Архивировать"
 
     def image_preview(self, obj):
         if obj.image:
-            return mark_safe(f'<img src="{obj.image.url}" style="max-height: 50px; max-width: 50px;">')
+            url = variant_url(obj.image, 'thumb')
+            return mark_safe(f'<img src="{url}" style="max-height: 50px; max-width: 50px;">')
         return "Нет изображения"
     image_preview.short_description = 'Превью'
@@ -1,7 +1,8 @@
 from django import forms
 from ework_post.forms import BasePostForm
 from ework_job.models import PostJob
-from ework_rubric.models import SubRubric, SuperRubric
+from ework_rubric.models import SubRubric
+from ework_core.refdata import get_refdata, set_choices
 
 class JobPostForm(BasePostForm):
     class Meta(BasePostForm.Meta):
@@ -10,15 +11,14 @@ class JobPostForm(BasePostForm):
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        try:
-            job_rubric = SuperRubric.objects.get(slug='rabota')
-            qs = SubRubric.objects.filter(super_rubric=job_rubric).order_by('order')
-        except SuperRubric.DoesNotExist:
-            qs = SubRubric.objects.none()
+        refdata = get_refdata()
+        job_rubric = refdata.super_rubric_by_slug('rabota')
+        sub_rubrics = refdata.sub_rubrics_of(job_rubric.id) if job_rubric else ()
 
-        self.fields['sub_rubric'].queryset = qs
-        self.fields['sub_rubric'].empty_label = None
+        field = self.fields['sub_rubric']
+        field.queryset = SubRubric.objects.filter(pk__in=[r.id for r in sub_rubrics])
+        field.empty_label = None
+        set_choices(field, sub_rubrics)
 
-        first = qs.first()
-        if first:
-            self.fields['sub_rubric'].initial = first.pk
\ No newline at end of file
+        if sub_rubrics:
+            field.initial = sub_rubrics[0].id
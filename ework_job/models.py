@@ -13,6 +13,9 @@ class PostJob(AbsPost):
         app_label = "ework_post"
         verbose_name = _("Вакансия")
         verbose_name_plural = _("Вакансии")
+        indexes = [
+            models.Index(fields=['experience', 'work_format', 'work_schedule']),
+        ]
 
 
     
@@ -4,12 +4,28 @@
 import logging
 from decimal import Decimal
 from django.conf import settings
+from django.db import IntegrityError, transaction
 from django.utils import timezone
 from ework_premium.models import Payment, Package, FreePostRecord
 from ework_post.models import AbsPost
 
 logger = logging.getLogger(__name__)
 
+# Допустимые переходы статуса платежа. Переход выполняется одним условным
+# UPDATE ... WHERE status=<текущий>, поэтому из двух одновременных запросов
+# применяется ровно один, без select_for_update.
+PAYMENT_TRANSITIONS = {
+    'pending': ('paid', 'failed', 'cancelled'),
+    'paid': ('refunded',),
+}
+PAID_PAYMENT_TASK = 'ework_payment.tasks.process_paid_payment'
+
+
+def parse_payment_payload(payload):
+    """Payload инвойса "<telegram_id>&&&<payment_id>" -> (telegram_id, payment_id)"""
+    user_id, payment_id = payload.split('&&&')
+    return int(user_id), int(payment_id)
+
 
 class PaymentService:
     """Сервис для обработки платежей"""
@@ -42,47 +58,68 @@ class PaymentService:
             raise
     
     @staticmethod
-    def process_successful_payment(payment, telegram_charge_id=None, provider_charge_id=None):
-        """Обработать успешный платеж"""
+    def transition(payment_id, from_status, to_status, **fields):
+        """
+        Перевести платеж из from_status в to_status.
+        Возвращает False, если платеж уже не в from_status (повтор или гонка).
+        """
+        if to_status not in PAYMENT_TRANSITIONS.get(from_status, ()):
+            raise ValueError(f"Недопустимый переход платежа {from_status} -> {to_status}")
+        return Payment.objects.filter(pk=payment_id, status=from_status).update(status=to_status, **fields) == 1
+
+    @staticmethod
+    def complete_payment(payment_id, telegram_charge_id=None, provider_charge_id=None):
+        """
+        Единственная точка перевода платежа в "paid" для бота и webhook.
+        Повторная доставка того же платежа стоит одного UPDATE по первичному ключу;
+        charge id Telegram уникален, второй платеж с ним не будет засчитан.
+        Побочные эффекты (пост на модерацию, уведомление) выполняются задачей
+        process_paid_payment один раз после коммита.
+        """
+        from django_q.tasks import async_task
+
         try:
-            # Отмечаем платеж как оплаченный
-            payment.mark_as_paid(telegram_charge_id, provider_charge_id)
-            
-            logger.info(f"Платеж {payment.order_id} успешно обработан")
-            return True
-            
-        except Exception as e:
-            logger.error(f"Ошибка обработки платежа {payment.order_id}: {e}")
+            with transaction.atomic():
+                completed = PaymentService.transition(
+                    payment_id, 'pending', 'paid',
+                    paid_at=timezone.now(),
+                    telegram_payment_charge_id=telegram_charge_id or None,
+                    telegram_provider_payment_charge_id=provider_charge_id or None,
+                )
+        except IntegrityError:
+            logger.warning(f"Charge id {telegram_charge_id} уже засчитан другому платежу, платеж {payment_id} пропущен")
             return False
+
+        if not completed:
+            logger.info(f"Платеж {payment_id} уже обработан или не найден")
+            return False
+
+        transaction.on_commit(lambda: async_task(PAID_PAYMENT_TASK, payment_id))
+        logger.info(f"Платеж {payment_id} оплачен")
+        return True
+
+    @staticmethod
+    def process_successful_payment(payment, telegram_charge_id=None, provider_charge_id=None):
+        """Обработать успешный платеж"""
+        return PaymentService.complete_payment(payment.pk, telegram_charge_id, provider_charge_id)
     
     @staticmethod
     def process_failed_payment(payment, reason=None):
         """Обработать неудачный платеж"""
-        try:
-            payment.mark_as_failed()
-            
+        if PaymentService.transition(payment.pk, 'pending', 'failed'):
             logger.warning(f"Платеж {payment.order_id} отмечен как неудачный: {reason}")
             return True
-            
-        except Exception as e:
-            logger.error(f"Ошибка обработки неудачного платежа {payment.order_id}: {e}")
-            return False
+        return False
     
     @staticmethod
     def refund_payment(payment, reason=None):
         """Возврат средств (логическая операция)"""
-        try:
-            # В реальном приложении здесь был бы API вызов к платежной системе
-            # Пока просто логируем
-            payment.status = 'refunded'
-            payment.save(update_fields=['status'])
-            
+        # В реальном приложении здесь был бы API вызов к платежной системе
+        # Пока просто логируем
+        if PaymentService.transition(payment.pk, 'paid', 'refunded', refunded_at=timezone.now()):
             logger.info(f"Возврат средств по платежу {payment.order_id}: {reason}")
             return True
-            
-        except Exception as e:
-            logger.error(f"Ошибка возврата средств по платежу {payment.order_id}: {e}")
-            return False
+        return False
 
 
 class PostPublicationService:
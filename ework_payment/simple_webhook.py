@@ -7,8 +7,7 @@ from django.http import HttpResponse, JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_POST
 from ework_premium.models import Payment
-from ework_payment.services import PaymentService, PostPublicationService
-from ework_post.models import AbsPost
+from ework_payment.services import PaymentService
 
 logger = logging.getLogger(__name__)
 
@@ -44,16 +43,9 @@ def simple_payment_webhook(request):
             return JsonResponse({'error': 'Payment not found'}, status=404)
         
         if status == 'paid':
-            # Обрабатываем успешный платеж
-            if PaymentService.process_successful_payment(payment, telegram_charge_id, provider_charge_id):
-                # Находим и публикуем пост
-                publish_post_after_payment(payment)
-                
-                logger.info(f"Платеж {payment.order_id} успешно обработан")
-                return JsonResponse({'success': True, 'message': 'Payment processed successfully'})
-            else:
-                logger.error(f"Не удалось обработать платеж {payment.order_id}")
-                return JsonResponse({'error': 'Failed to process payment'}, status=500)
+            # Пост публикуется задачей после перехода; повтор ничего не меняет
+            PaymentService.complete_payment(payment.pk, telegram_charge_id, provider_charge_id)
+            return JsonResponse({'success': True, 'message': 'Payment processed successfully'})
                 
         elif status == 'failed':
             # Обрабатываем неудачный платеж
@@ -71,33 +63,6 @@ def simple_payment_webhook(request):
         return JsonResponse({'error': 'Internal server error'}, status=500)
 
 
-def publish_post_after_payment(payment):
-    """Найти и опубликовать пост после успешной оплаты"""
-    try:
-        # Ищем последний пост пользователя в черновиках/на модерации
-        post = AbsPost.objects.filter(
-            user=payment.user,
-            status=0,  # На модерации
-            is_deleted=False
-        ).order_by('-created_at').first()
-        
-        if post:
-            # Публикуем пост с оплаченным тарифом
-            if PostPublicationService.publish_post(post, payment.package, payment):
-                logger.info(f"Пост {post.id} отправлен на модерацию после оплаты {payment.order_id}")
-                return True
-            else:
-                logger.error(f"Не удалось опубликовать пост {post.id} после оплаты")
-                return False
-        else:
-            logger.warning(f"Не найден пост для публикации после платежа {payment.order_id}")
-            return False
-            
-    except Exception as e:
-        logger.error(f"Ошибка публикации поста после оплаты {payment.order_id}: {e}")
-        return False
-
-
 @csrf_exempt  
 @require_POST
 def test_payment_webhook(request):
@@ -0,0 +1,56 @@
+import logging
+
+from django.db import transaction
+from django.utils import timezone
+from django.utils.translation import gettext as _
+
+from ework_premium.models import Payment
+from ework_core.moderation import enqueue_moderation
+from ework_core.outbox import enqueue_message
+
+logger = logging.getLogger(__name__)
+
+DRAFT_STATUS = -1
+
+
+def process_paid_payment(payment_id):
+    """
+    Побочные эффекты оплаты: аддоны, пост-черновик на модерацию, уведомление.
+    Ставится PaymentService.complete_payment один раз на платеж. Идемпотентность -
+    по платежу: задача атомарно ставит addons_applied_at, повторное выполнение
+    находит его заполненным и ничего не меняет. Статус поста на это не влияет:
+    PostPaymentSuccessView статус больше не меняет.
+    """
+    payment = Payment.objects.select_related('user', 'post').get(pk=payment_id)
+    post = payment.post
+    if post is None:
+        logger.warning(f"⏸️ У платежа {payment.order_id} нет поста для публикации")
+
+    with transaction.atomic():
+        claimed = Payment.objects.filter(
+            pk=payment_id, addons_applied_at__isnull=True
+        ).update(addons_applied_at=timezone.now())
+        if not claimed:
+            logger.info(f"Аддоны платежа {payment.order_id} уже применены")
+            return False
+
+        if post is not None:
+            post.set_addons(
+                photo=payment.has_photo_addon(),
+                highlight=payment.has_highlight_addon(),
+                auto_bump=payment.has_auto_bump_addon()
+            )
+            post.save(update_fields=[
+                'has_photo_addon', 'has_highlight_addon', 'has_auto_bump_addon',
+                'highlight_expires_at', 'auto_bump_expires_at', 'is_premium'
+            ])
+            if post.status == DRAFT_STATUS:
+                enqueue_moderation(post)
+
+    if payment.user.telegram_id:
+        if post is not None:
+            text = _("✅ Оплата прошла успешно! Ваше объявление опубликовано и отправлено на модерацию.")
+        else:
+            text = _("⚠️ Оплата получена, но при публикации произошла ошибка. Обратитесь в поддержку.")
+        enqueue_message(payment.user.telegram_id, text)
+    return post is not None
@@ -9,8 +9,7 @@ from django.views.decorators.http import require_POST
 from django.utils.decorators import method_decorator
 from django.views import View
 from ework_premium.models import Payment
-from ework_payment.services import PaymentService, PostPublicationService
-from ework_post.models import AbsPost
+from ework_payment.services import PaymentService, parse_payment_payload
 
 logger = logging.getLogger(__name__)
 
@@ -38,50 +37,26 @@ class TelegramPaymentWebhook(View):
     
     def handle_successful_payment(self, data):
         """Обработка успешного платежа"""
+        successful_payment = data.get('message', {}).get('successful_payment', {})
+        payload = successful_payment.get('invoice_payload')
+
+        if not payload:
+            logger.error("Нет payload в successful_payment")
+            return HttpResponse(status=400)
+
         try:
-            message = data.get('message', {})
-            successful_payment = message.get('successful_payment', {})
-            
-            # Извлекаем данные платежа
-            payload = successful_payment.get('invoice_payload')
-            telegram_payment_charge_id = successful_payment.get('telegram_payment_charge_id')
-            provider_payment_charge_id = successful_payment.get('provider_payment_charge_id')
-            
-            if not payload:
-                logger.error("Нет payload в successful_payment")
-                return HttpResponse(status=400)
-            
-            # Парсим payload
-            try:
-                user_id, payment_id = payload.split('&&&')
-                payment = Payment.objects.get(id=payment_id, user_id=user_id)
-            except (ValueError, Payment.DoesNotExist):
-                logger.error(f"Неверный payload или платеж не найден: {payload}")
-                return HttpResponse(status=400)
-            
-            # Проверяем, что платеж еще не обработан
-            if payment.status != 'pending':
-                logger.warning(f"Платеж {payment.order_id} уже обработан")
-                return HttpResponse(status=200)
-            
-            # Обрабатываем успешный платеж
-            if PaymentService.process_successful_payment(
-                payment, 
-                telegram_payment_charge_id, 
-                provider_payment_charge_id
-            ):
-                # Ищем пост, связанный с этим платежом, и публикуем его
-                self.publish_paid_post(payment)
-                
-                logger.info(f"Успешно обработан платеж {payment.order_id}")
-                return HttpResponse(status=200)
-            else:
-                logger.error(f"Не удалось обработать платеж {payment.order_id}")
-                return HttpResponse(status=500)
-                
-        except Exception as e:
-            logger.error(f"Ошибка в handle_successful_payment: {e}")
-            return HttpResponse(status=500)
+            _user_id, payment_id = parse_payment_payload(payload)
+        except ValueError:
+            logger.error(f"Неверный payload: {payload}")
+            return HttpResponse(status=400)
+
+        # Переход pending -> paid и публикация поста выполняются один раз
+        PaymentService.complete_payment(
+            payment_id,
+            successful_payment.get('telegram_payment_charge_id'),
+            successful_payment.get('provider_payment_charge_id'),
+        )
+        return HttpResponse(status=200)
     
     def handle_pre_checkout_query(self, data):
         """Обработка pre-checkout запроса"""
@@ -108,28 +83,6 @@ class TelegramPaymentWebhook(View):
         except Exception as e:
             logger.error(f"Ошибка в handle_pre_checkout_query: {e}")
             return HttpResponse(status=500)
-    
-    def publish_paid_post(self, payment):
-        """Найти и опубликовать пост после оплаты"""
-        try:
-            # Ищем последний пост пользователя в черновиках
-            post = AbsPost.objects.filter(
-                user=payment.user,
-                status=0,  # На модерации/черновик
-                is_deleted=False
-            ).order_by('-created_at').first()
-            
-            if post:
-                # Публикуем пост с оплаченным тарифом
-                if PostPublicationService.publish_post(post, payment.package, payment):
-                    logger.info(f"Пост {post.id} опубликован после оплаты {payment.order_id}")
-                else:
-                    logger.error(f"Не удалось опубликовать пост {post.id} после оплаты")
-            else:
-                logger.warning(f"Не найден пост для публикации после платежа {payment.order_id}")
-                
-        except Exception as e:
-            logger.error(f"Ошибка публикации поста после оплаты {payment.order_id}: {e}")
 
 
 # Функция-view для совместимости
@@ -7,6 +7,9 @@ import json
 import logging
 
 from ework_premium.models import Payment
+from ework_config.utils import get_config
+from ework_bot_tg.webhook import is_valid_secret
+from .services import PaymentService, parse_payment_payload
 
 logger = logging.getLogger(__name__)
 
@@ -15,6 +18,11 @@ class TelegramPaymentWebhookView(View):
     """Webhook для обработки платежей от Telegram"""
     
     def post(self, request):
+        # Webhook, зарегистрированный без секрета (до set_webhook), продолжает работать
+        secret = get_config().webhook_secret
+        if secret and not is_valid_secret(request, secret):
+            logger.warning("Payment webhook: неверный секретный токен")
+            return HttpResponse(status=403)
         try:
             # Получаем данные от Telegram
             data = json.loads(request.body)
@@ -83,41 +91,20 @@ class TelegramPaymentWebhookView(View):
     
     def handle_successful_payment(self, successful_payment):
         """Обработка успешного платежа"""
+        payload = successful_payment.get('invoice_payload', '')
         try:
-            payload = successful_payment.get('invoice_payload', '')
-            telegram_charge_id = successful_payment.get('telegram_payment_charge_id')
-            provider_charge_id = successful_payment.get('provider_payment_charge_id')
-            
-            # Извлекаем user_id и payment_id из payload
-            if '&&&' in payload:
-                user_id, payment_id = payload.split('&&&')
-                
-                try:
-                    payment = Payment.objects.get(id=payment_id, user_id=user_id)
-                    
-                    # Отмечаем платеж как оплаченный
-                    payment.mark_as_paid(
-                        telegram_charge_id=telegram_charge_id,
-                        provider_charge_id=provider_charge_id
-                    )
-                    
-                    logger.info(f"Payment {payment_id} marked as paid")
-                    
-                    # Здесь можно добавить дополнительную логику:
-                    # - отправка уведомления пользователю
-                    # - создание поста автоматически
-                    # - отправка email
-                    
-                    return HttpResponse(status=200)
-                    
-                except Payment.DoesNotExist:
-                    logger.error(f"Payment not found for successful payment: {payment_id}")
-                    
+            _user_id, payment_id = parse_payment_payload(payload)
+        except ValueError:
+            logger.error(f"Invalid payload format: {payload}")
             return HttpResponse(status=200)
-            
-        except Exception as e:
-            logger.error(f"Error in successful_payment: {e}")
-            return HttpResponse(status=500)
+
+        # Повторная доставка не меняет платеж и не запускает побочные эффекты
+        PaymentService.complete_payment(
+            payment_id,
+            successful_payment.get('telegram_payment_charge_id'),
+            successful_payment.get('provider_payment_charge_id'),
+        )
+        return HttpResponse(status=200)
 
 
 @csrf_exempt
@@ -1,6 +1,7 @@
 from django.contrib import admin
 from django.utils.html import format_html
 from django.utils.safestring import mark_safe
+from .image_variants import variant_url
 from .models import BannerPost
 
 
@@ -32,7 +33,8 @@ class BannerPostAdmin(admin.ModelAdmin):
     
     def image_preview(self, obj):
         if obj.image:
-            return mark_safe(f'<img src="{obj.image.url}" style="max-height: 50px; max-width: 50px;">')
+            url = variant_url(obj.image, 'thumb')
+            return mark_safe(f'<img src="{url}" style="max-height: 50px; max-width: 50px;">')
         return "Нет изображения"
     image_preview.short_description = 'Превью'
     
@@ -5,3 +5,6 @@ class EworkPostConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'ework_post'
     verbose_name = 'Посты'
+
+    def ready(self):
+        import ework_post.signals
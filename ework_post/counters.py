@@ -0,0 +1,105 @@
+"""
+Денормализованные счетчики поста: view_count, unique_viewer_count, favorite_count.
+
+Счетчики меняются точечными UPDATE ... SET x = x + n при записи просмотров
+из буфера и при переключении избранного, поэтому карточки и детальная
+страница не агрегируют PostView и Favorite. Вместе с ними пополняется
+дневная активность для рейтингов (leaderboard) и скетчи уникальных
+зрителей (ework_stats.uniques).
+"""
+from collections import Counter, defaultdict
+
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+from ework_stats.uniques import add_viewers
+from .leaderboard import add_activity
+from .models import AbsPost, Favorite, PostView
+
+
+def add_views(views, unique_viewers, date=None):
+    """
+    Увеличить счетчики просмотров и активность за день date (по умолчанию сегодня).
+    views, unique_viewers - {post_id: прирост}
+    """
+    for post_id in set(views) | set(unique_viewers):
+        AbsPost.objects.non_polymorphic().filter(pk=post_id).update(
+            view_count=F('view_count') + views.get(post_id, 0),
+            unique_viewer_count=F('unique_viewer_count') + unique_viewers.get(post_id, 0),
+        )
+    add_activity(views=views, date=date)
+
+
+def change_favorites(post_id, delta):
+    """Изменить счетчик избранного на delta"""
+    queryset = AbsPost.objects.non_polymorphic().filter(pk=post_id)
+    if delta < 0:
+        queryset = queryset.filter(favorite_count__gte=-delta)
+    queryset.update(favorite_count=F('favorite_count') + delta)
+    if delta > 0:
+        add_activity(favorites={post_id: delta})
+
+
+def record_views(events):
+    """
+    Сохранить события просмотра (user_id, content_type_id, object_id, время просмотра)
+    и обновить счетчики. PostView получает время первого просмотра, активность
+    и скетчи зрителей пополняются за день просмотра.
+    Возвращает число новых уникальных просмотров.
+    """
+    first_seen = {}
+    for user_id, content_type_id, object_id, viewed_at in events:
+        key = (user_id, content_type_id, object_id)
+        if key not in first_seen or viewed_at < first_seen[key]:
+            first_seen[key] = viewed_at
+    if not first_seen:
+        return 0
+    existing = set(PostView.objects.filter(
+        object_id__in={key[2] for key in first_seen},
+        user_id__in={key[0] for key in first_seen},
+    ).values_list('user_id', 'content_type_id', 'object_id'))
+    new_keys = first_seen.keys() - existing
+
+    by_date = defaultdict(list)
+    for event in events:
+        by_date[timezone.localdate(event[3])].append(event)
+    new_by_date = defaultdict(Counter)
+    for key in new_keys:
+        new_by_date[timezone.localdate(first_seen[key])][key[2]] += 1
+
+    with transaction.atomic():
+        PostView.objects.bulk_create(
+            [
+                PostView(user_id=user_id, content_type_id=content_type_id, object_id=object_id,
+                         created_at=first_seen[(user_id, content_type_id, object_id)])
+                for user_id, content_type_id, object_id in new_keys
+            ],
+            ignore_conflicts=True,
+        )
+        for date, day_events in sorted(by_date.items()):
+            add_views(Counter(event[2] for event in day_events), new_by_date[date], date)
+            add_viewers(day_events, date)
+    return len(new_keys)
+
+
+def rebuild_counters():
+    """
+    Пересчитать счетчики всех постов по PostView и Favorite.
+    view_count учитывает и повторные просмотры, поэтому только
+    поднимается до числа уникальных зрителей.
+    """
+    viewers = PostView.objects.filter(object_id=OuterRef('pk')).order_by().values(
+        'object_id'
+    ).annotate(total=Count('pk')).values('total')
+    favorites = Favorite.objects.filter(post=OuterRef('pk')).order_by().values(
+        'post'
+    ).annotate(total=Count('pk')).values('total')
+
+    unique_viewer_count = Coalesce(Subquery(viewers), Value(0))
+    return AbsPost.objects.non_polymorphic().update(
+        unique_viewer_count=unique_viewer_count,
+        view_count=Greatest(F('view_count'), unique_viewer_count),
+        favorite_count=Coalesce(Subquery(favorites), Value(0)),
+    )
@@ -0,0 +1,201 @@
+"""
+Счетчики опубликованных постов для панели фильтров (фасеты).
+
+Счетчики хранятся в PostFacetCount по ключу
+(sub_rubric, city, experience, work_format, work_schedule) и меняются
+инкрементально при переходах поста в статус "Опубликовано" и из него.
+Панель фильтров получает все фасеты рубрики одним закэшированным запросом.
+"""
+import logging
+from collections import Counter
+
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+
+from .models import AbsPost, PostFacetCount
+
+logger = logging.getLogger(__name__)
+
+PUBLISHED_STATUS = 3
+NOT_APPLICABLE = PostFacetCount.NOT_APPLICABLE
+CACHE_KEY = 'post_facets:{}'
+CACHE_TIMEOUT = 60
+
+FACET_FIELDS = ('sub_rubric', 'city', 'experience', 'work_format', 'work_schedule')
+_STATE_FIELDS = ('status', 'is_deleted', 'sub_rubric_id', 'city_id')
+_JOB_FIELDS = ('experience', 'work_format', 'work_schedule')
+
+
+def get_state(post):
+    """
+    Снимок полей поста, влияющих на счетчики (без обращений к БД).
+    None - снимок по экземпляру не получить: поля отложены (defer/only) или это
+    не экземпляр конкретной модели (non_polymorphic), где нет полей вакансии
+    """
+    values = post.__dict__
+    if any(field not in values for field in _STATE_FIELDS + ('polymorphic_ctype_id',)):
+        return None
+    # Тип еще не задан только у нового экземпляра - он создан конкретной моделью
+    if values['polymorphic_ctype_id'] is not None and post.get_real_instance_class() is not type(post):
+        return None
+    job_values = tuple(values.get(field, NOT_APPLICABLE) for field in _JOB_FIELDS)
+    return tuple(values[field] for field in _STATE_FIELDS) + job_values
+
+
+def load_state(post_id):
+    """Снимок поста по строке в БД, с полями вакансии из таблицы конкретной модели"""
+    row = AbsPost.objects.non_polymorphic().filter(pk=post_id).values_list(
+        *_STATE_FIELDS, *(f'postjob__{field}' for field in _JOB_FIELDS)
+    ).first()
+    if row is None:
+        return None
+    job_values = tuple(NOT_APPLICABLE if value is None else value for value in row[len(_STATE_FIELDS):])
+    return tuple(row[:len(_STATE_FIELDS)]) + job_values
+
+
+def state_key(state):
+    """Ключ счетчика для снимка или None, если пост не учитывается"""
+    if state is None:
+        return None
+    status, is_deleted, sub_rubric_id, city_id = state[:4]
+    if status != PUBLISHED_STATUS or is_deleted:
+        return None
+    return (sub_rubric_id, city_id) + tuple(state[4:])
+
+
+def apply_deltas(deltas, super_rubrics=None):
+    """
+    Применить изменения счетчиков: deltas = {key: +n/-n}.
+    super_rubrics - известное соответствие sub_rubric_id -> super_rubric_id.
+    """
+    from ework_rubric.models import SubRubric
+
+    deltas = {key: delta for key, delta in deltas.items() if key and delta}
+    if not deltas:
+        return
+    super_rubrics = dict(super_rubrics or {})
+    missing = {key[0] for key in deltas} - set(super_rubrics)
+    if missing:
+        super_rubrics.update(
+            SubRubric.objects.filter(pk__in=missing).values_list('pk', 'super_rubric_id')
+        )
+
+    for key, delta in deltas.items():
+        lookup = dict(zip(('sub_rubric_id', 'city_id') + _JOB_FIELDS, key))
+        updated = PostFacetCount.objects.filter(**lookup).update(count=F('count') + delta)
+        if not updated and delta > 0:
+            try:
+                with transaction.atomic():
+                    PostFacetCount.objects.create(
+                        super_rubric_id=super_rubrics[key[0]], count=delta, **lookup
+                    )
+            except IntegrityError:
+                PostFacetCount.objects.filter(**lookup).update(count=F('count') + delta)
+
+    for super_rubric_id in {super_rubrics.get(key[0]) for key in deltas}:
+        cache.delete(CACHE_KEY.format(super_rubric_id))
+
+
+def track_transition(old_state, new_state):
+    """Учесть изменение одного поста"""
+    old_key, new_key = state_key(old_state), state_key(new_state)
+    if old_key == new_key:
+        return
+    deltas = Counter()
+    if old_key:
+        deltas[old_key] -= 1
+    if new_key:
+        deltas[new_key] += 1
+    apply_deltas(deltas)
+
+
+def _grouped_keys(queryset):
+    rows = queryset.values(
+        'sub_rubric_id', 'city_id', 'sub_rubric__super_rubric_id',
+        'postjob__experience', 'postjob__work_format', 'postjob__work_schedule',
+    ).annotate(total=Count('pk')).order_by()
+    keys, super_rubrics = Counter(), {}
+    for row in rows:
+        key = (row['sub_rubric_id'], row['city_id']) + tuple(
+            NOT_APPLICABLE if row[f'postjob__{field}'] is None else row[f'postjob__{field}']
+            for field in _JOB_FIELDS
+        )
+        keys[key] += row['total']
+        super_rubrics[row['sub_rubric_id']] = row['sub_rubric__super_rubric_id']
+    return keys, super_rubrics
+
+
+def update_status(queryset, status):
+    """
+    Массово сменить статус постов (аналог queryset.update(status=...))
+    с корректировкой счетчиков фильтров. Возвращает число обновленных строк.
+    """
+    with transaction.atomic():
+        posts = AbsPost.objects.non_polymorphic().filter(
+            pk__in=list(queryset.values_list('pk', flat=True)), is_deleted=False
+        )
+        if status == PUBLISHED_STATUS:
+            keys, super_rubrics = _grouped_keys(posts.exclude(status=PUBLISHED_STATUS))
+            sign = 1
+        else:
+            keys, super_rubrics = _grouped_keys(posts.filter(status=PUBLISHED_STATUS))
+            sign = -1
+        updated = queryset.update(status=status)
+        apply_deltas({key: sign * total for key, total in keys.items()}, super_rubrics)
+    return updated
+
+
+def rebuild_facet_counts():
+    """Полностью пересчитать счетчики по текущим данным"""
+    keys, super_rubrics = _grouped_keys(
+        AbsPost.objects.non_polymorphic().filter(status=PUBLISHED_STATUS, is_deleted=False)
+    )
+    with transaction.atomic():
+        PostFacetCount.objects.all().delete()
+        PostFacetCount.objects.bulk_create([
+            PostFacetCount(
+                super_rubric_id=super_rubrics[key[0]],
+                count=total,
+                **dict(zip(('sub_rubric_id', 'city_id') + _JOB_FIELDS, key))
+            )
+            for key, total in keys.items()
+        ])
+    for super_rubric_id in set(super_rubrics.values()):
+        cache.delete(CACHE_KEY.format(super_rubric_id))
+    return len(keys)
+
+
+def get_facet_rows(super_rubric_id):
+    """Все ненулевые счетчики рубрики: один запрос, результат в кэше"""
+    key = CACHE_KEY.format(super_rubric_id)
+    rows = cache.get(key)
+    if rows is None:
+        rows = tuple(
+            PostFacetCount.objects.filter(super_rubric_id=super_rubric_id, count__gt=0).values_list(
+                'sub_rubric_id', 'city_id', 'experience', 'work_format', 'work_schedule', 'count'
+            )
+        )
+        cache.set(key, rows, CACHE_TIMEOUT)
+    return rows
+
+
+def get_facets(super_rubric_id, selected=None):
+    """
+    Посчитать фасеты панели фильтров.
+    selected - выбранные значения {'city': 1, 'experience': 2, ...};
+    счетчики каждого фасета учитывают все выбранные фильтры, кроме его собственного.
+    """
+    selected = {field: value for field, value in (selected or {}).items() if value is not None}
+    facets = {field: Counter() for field in FACET_FIELDS}
+    total = 0
+    for row in get_facet_rows(super_rubric_id):
+        values, count = dict(zip(FACET_FIELDS, row[:5])), row[5]
+        mismatched = [field for field, value in selected.items() if values[field] != value]
+        if not mismatched:
+            total += count
+        for field in FACET_FIELDS:
+            if not mismatched or mismatched == [field]:
+                facets[field][values[field]] += count
+    facets['total'] = total
+    return facets
@@ -3,9 +3,28 @@ from django.utils.translation import gettext_lazy as _
 from django.contrib.auth import get_user_model
 
 from ework_post.models import AbsPost
+from ework_post.utils_img import MAX_UPLOAD_BYTES, ImageTooLarge, check_image_limits
 from ework_rubric.models import SubRubric
 from ework_locations.models import City
 from ework_currency.models import Currency
+from ework_core.refdata import get_refdata, set_choices
+
+
+class PostImageField(forms.ImageField):
+    """Отклоняет слишком большие файлы до того, как Pillow начнет их разбирать"""
+
+    def to_python(self, data):
+        if data and data.size > MAX_UPLOAD_BYTES:
+            raise forms.ValidationError(
+                _('Файл слишком большой, максимум %(size)s МБ') % {'size': MAX_UPLOAD_BYTES // (1024 * 1024)}
+            )
+        f = super().to_python(data)
+        if f is not None:
+            try:
+                check_image_limits(pixels=f.image.width * f.image.height)
+            except ImageTooLarge:
+                raise forms.ValidationError(_('Слишком большое разрешение изображения'))
+        return f
 
 
 class BasePostForm(forms.ModelForm):
@@ -28,6 +47,7 @@ class BasePostForm(forms.ModelForm):
             'title', 'description', 'image', 'price', 'currency',
             'sub_rubric', 'city', 'user_phone', 'address'
         ]
+        field_classes = {'image': PostImageField}
         widgets = {
             'title': forms.TextInput(attrs={
                 'class': 'form-control',
@@ -65,14 +85,18 @@ class BasePostForm(forms.ModelForm):
     def __init__(self, *args, **kwargs):
         self.user = kwargs.pop('user', None)
         super().__init__(*args, **kwargs)
+        refdata = get_refdata()
         self.fields['currency'].queryset = Currency.objects.all()
         self.fields['city'].queryset = City.objects.order_by('order', 'name')
-        self.fields['sub_rubric'].queryset = SubRubric.objects.select_related('super_rubric').order_by('order')
+        self.fields['sub_rubric'].queryset = SubRubric.objects.all()
+        set_choices(self.fields['currency'], refdata.currencies)
+        set_choices(self.fields['city'], refdata.cities)
+        set_choices(self.fields['sub_rubric'], refdata.sub_rubrics)
         if self.user and hasattr(self.user, 'phone') and self.user.phone:
             self.fields['user_phone'].initial = self.user.phone
-        default_currency = Currency.objects.first()
+        default_currency = refdata.default_currency
         if default_currency:
-            self.fields['currency'].initial = default_currency.pk
+            self.fields['currency'].initial = default_currency.id
 
     def clean_price(self):
         price = self.cleaned_data.get('price')
@@ -0,0 +1,166 @@
+"""
+Массовое пережатие существующих изображений после смены IMAGE_MAX_SIZE,
+IMAGE_FORMAT или IMAGE_QUALITY.
+
+Кодирование идет в ProcessPoolExecutor (воркеры только читают файл и
+возвращают байты), сохранение по хэшу и запись в БД - в основном процессе:
+одним UPDATE ... CASE на пачку и только для строк, где изображение не
+поменялось за время обработки. После каждой пачки пишется контрольная точка,
+повторный запуск продолжает с нее, пока параметры кодирования те же.
+Старые файлы учитываются в refcount после dedupe_images, его стоит выполнить первым.
+"""
+import json
+import os
+import time
+import logging
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections, transaction
+from django.db.models import Case, F, Q, Value, When
+
+from .image_store import acquire, release, store_content
+from .models import AbsPost, BannerPost
+from .utils_img import DEFAULT_FORMAT, DEFAULT_MAX_SIZE, DEFAULT_QUALITY, process_image
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 200
+
+
+def encoding_signature():
+    return f'{tuple(DEFAULT_MAX_SIZE)}:{DEFAULT_FORMAT}:{DEFAULT_QUALITY}'
+
+
+def image_sources():
+    """(ключ, модель, queryset) для всех изображений, которые надо пережать"""
+    return [
+        ('post', AbsPost, AbsPost.objects.non_polymorphic().filter(is_deleted=False, image_pending=False)),
+        ('banner', BannerPost, BannerPost.objects.all()),
+    ]
+
+
+def _init_worker():
+    # При spawn дочерний процесс начинает с чистого интерпретатора
+    import django
+    django.setup()
+
+
+def encode(name):
+    """Выполняется в процессе пула: пережать файл, вернуть (name, размер исходника, байты)"""
+    try:
+        with default_storage.open(name) as original:
+            original.name = os.path.basename(name)
+            size = original.size
+            processed = process_image(original)
+        return name, size, processed.read() if processed else None
+    except Exception as e:
+        logger.error("Cannot reprocess image %s: %s", name, e)
+        return name, 0, None
+
+
+class Checkpoint:
+    """Последний обработанный pk по каждому источнику, в JSON файле"""
+
+    def __init__(self, path, restart=False):
+        self.path = path
+        self.data = {}
+        if not restart and os.path.exists(path):
+            with open(path) as f:
+                self.data = json.load(f)
+        if self.data.get('signature') != encoding_signature():
+            self.data = {'signature': encoding_signature()}
+
+    def last_pk(self, key):
+        return self.data.get(key, 0)
+
+    def save(self, key, pk):
+        self.data[key] = pk
+        tmp = f'{self.path}.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(self.data, f)
+        os.replace(tmp, self.path)
+
+
+def apply_batch(model, field, results, produced):
+    """
+    Сохранить результаты пачки и подменить имена одним UPDATE.
+    Новые имена добавляются в produced. Возвращает число обновленных строк.
+    """
+    storage = field.storage
+    changed = {}
+    for name, _, data in results:
+        if data is None:
+            continue
+        new_name = store_content(field, ContentFile(data), DEFAULT_FORMAT)
+        if new_name == name:
+            # Файл уже в текущем формате, ссылка от store_content лишняя
+            release(storage, new_name)
+        else:
+            changed[name] = new_name
+        produced.add(new_name)
+    if not changed:
+        return 0
+
+    # Строки блокируются до UPDATE: число ссылок на старые имена не изменится между
+    # подсчетом и подменой, а строки с уже другим изображением в UPDATE не попадут
+    with transaction.atomic():
+        locked = list(model._base_manager.select_for_update().filter(
+            image__in=changed
+        ).order_by('pk').values_list('pk', 'image'))
+        rows = Counter(image for _, image in locked)
+        updated = model._base_manager.filter(pk__in=[pk for pk, _ in locked]).update(image=Case(
+            *[When(image=old, then=Value(new)) for old, new in changed.items()],
+            default=F('image'),
+            output_field=field,
+        ))
+
+        # store_content уже взял одну ссылку на новый файл
+        for old, new in changed.items():
+            total = rows.get(old, 0)
+            if total:
+                acquire(new, total - 1)
+                release(storage, old, total)
+            else:
+                release(storage, new)
+    return updated
+
+
+def reprocess_images(checkpoint, workers=None, batch_size=BATCH_SIZE, sources=None, report=None):
+    """
+    Пережать все изображения. report(stats) вызывается после каждой пачки.
+    Возвращает итоговую статистику.
+    """
+    stats = {'processed': 0, 'updated': 0, 'failed': 0, 'bytes_in': 0, 'bytes_out': 0, 'started': time.monotonic()}
+    workers = workers or os.cpu_count()
+    # Уже пережатые в этом запуске файлы (общие у нескольких строк) повторно не кодируются
+    produced = set()
+    connections.close_all()  # соединения не должны наследоваться процессами пула
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        for key, model, queryset in image_sources():
+            if sources and key not in sources:
+                continue
+            field = model._meta.get_field('image')
+            queryset = queryset.exclude(Q(image='') | Q(image__isnull=True)).order_by('pk')
+            last_pk = checkpoint.last_pk(key)
+            while True:
+                rows = list(queryset.filter(pk__gt=last_pk).values_list('pk', 'image')[:batch_size])
+                if not rows:
+                    break
+                names = list(dict.fromkeys(name for _, name in rows if name not in produced))
+                results = list(pool.map(encode, names, chunksize=max(1, len(names) // (4 * workers))))
+
+                stats['processed'] += len(results)
+                stats['failed'] += sum(1 for _, _, data in results if data is None)
+                stats['bytes_in'] += sum(size for _, size, _ in results)
+                stats['bytes_out'] += sum(len(data) for _, _, data in results if data is not None)
+                stats['updated'] += apply_batch(model, field, results, produced)
+
+                last_pk = rows[-1][0]
+                checkpoint.save(key, last_pk)
+                if report:
+                    report(stats)
+    return stats
@@ -0,0 +1,158 @@
+"""
+Хранение обработанных изображений по хэшу содержимого.
+
+Файл лежит в <upload_to>/<xx>/<sha256>.<ext>: одно и то же фото, загруженное
+повторно, хранится один раз, а URL файла никогда не меняет содержимое и может
+кэшироваться браузером бессрочно. StoredImage.refcount считает строки,
+которые ссылаются на файл; release() удаляет файл, когда ссылок не осталось.
+Ссылки освобождаются при замене изображения, мягком и полном удалении.
+Архивные объявления файл не освобождают: их можно вернуть на модерацию.
+"""
+import hashlib
+import logging
+import posixpath
+
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.db.models import Count, F, Value
+from django.db.models.functions import Greatest
+
+from .models import StoredImage
+
+logger = logging.getLogger(__name__)
+
+
+def content_name(field, data, ext):
+    """Имя файла по хэшу содержимого в каталоге upload_to поля"""
+    digest = hashlib.sha256(data).hexdigest()
+    return field.generate_filename(None, posixpath.join(digest[:2], f'{digest}.{ext.lower()}'))
+
+
+def is_content_name(name):
+    base, ext = posixpath.splitext(posixpath.basename(name))
+    return len(base) == 64 and posixpath.basename(posixpath.dirname(name)) == base[:2]
+
+
+def acquire(name, count=1):
+    """Добавить ссылки на файл"""
+    StoredImage.objects.get_or_create(name=name)
+    StoredImage.objects.filter(name=name).update(refcount=F('refcount') + count)
+
+
+def release(storage, name, count=1):
+    """Убрать ссылки на файл; файл и его варианты удаляются вместе с последней ссылкой"""
+    from .image_variants import delete_variants
+
+    if not name or count <= 0:
+        return False
+    StoredImage.objects.filter(name=name).update(refcount=Greatest(F('refcount') - count, Value(0)))
+    deleted, _ = StoredImage.objects.filter(name=name, refcount=0).delete()
+    if not deleted:
+        return False
+    storage.delete(name)
+    delete_variants(storage, name)
+    return True
+
+
+def store_content(field, content, ext):
+    """
+    Сохранить содержимое под именем по хэшу (если такого файла еще нет)
+    и взять на него ссылку. Возвращает имя файла.
+    """
+    storage = field.storage
+    data = content.read()
+    name = content_name(field, data, ext)
+    if not storage.exists(name):
+        _save(storage, name, content)
+    acquire(name)
+    if not storage.exists(name):
+        # Файл удалили между проверкой и acquire (освобождена последняя ссылка)
+        _save(storage, name, content)
+    return name
+
+
+def _save(storage, name, content):
+    content.seek(0)
+    saved = storage.save(name, content)
+    if saved != name:
+        # Тот же файл параллельно сохранил другой воркер
+        storage.delete(saved)
+
+
+def _image_querysets():
+    from .models import AbsPost, BannerPost
+    return [
+        (AbsPost._meta.get_field('image'), AbsPost.objects.non_polymorphic().filter(is_deleted=False)),
+        (BannerPost._meta.get_field('image'), BannerPost.objects.all()),
+    ]
+
+
+def _walk(storage, path):
+    directories, files = storage.listdir(path)
+    for file_name in files:
+        yield posixpath.join(path, file_name)
+    for directory in directories:
+        yield from _walk(storage, posixpath.join(path, directory))
+
+
+def dedupe_media(dry_run=False, prune=False):
+    """
+    Перевести существующие файлы на имена по хэшу содержимого.
+    Изображения мягко удаленных объявлений освобождаются, одинаковые файлы
+    сливаются в один, refcount пересчитывается по строкам.
+    prune удаляет из каталогов загрузки файлы, на которые никто не ссылается.
+    Возвращает статистику {'files', 'merged', 'freed_bytes', 'pruned'}.
+    """
+    from .image_variants import delete_variants
+    from .models import AbsPost
+
+    stats = {'files': 0, 'merged': 0, 'freed_bytes': 0, 'pruned': 0}
+    if not dry_run:
+        AbsPost.objects.non_polymorphic().filter(is_deleted=True).exclude(image='').update(image='')
+
+    refcounts = {}
+    for field, queryset in _image_querysets():
+        storage = field.storage
+        rows = queryset.exclude(image='').exclude(image__isnull=True).order_by().values_list(
+            'image'
+        ).annotate(total=Count('pk'))
+        for name, total in rows:
+            stats['files'] += 1
+            target = name
+            if not is_content_name(name) and storage.exists(name):
+                with storage.open(name) as f:
+                    data = f.read()
+                ext = posixpath.splitext(name)[1].lstrip('.') or 'bin'
+                target = content_name(field, data, ext)
+                if target in refcounts or storage.exists(target):
+                    stats['merged'] += 1
+                    stats['freed_bytes'] += len(data)
+                if not dry_run:
+                    if not storage.exists(target):
+                        storage.save(target, ContentFile(data))
+                    queryset.filter(image=name).update(image=target)
+                    storage.delete(name)
+                    delete_variants(storage, name)
+            refcounts[target] = refcounts.get(target, 0) + total
+
+    if not dry_run:
+        with transaction.atomic():
+            StoredImage.objects.all().delete()
+            StoredImage.objects.bulk_create(
+                [StoredImage(name=name, refcount=total) for name, total in refcounts.items()],
+                batch_size=500,
+            )
+
+    if prune:
+        for field, _ in _image_querysets():
+            storage = field.storage
+            upload_dir = posixpath.dirname(field.generate_filename(None, 'x'))
+            if not storage.exists(upload_dir):
+                continue
+            for name in list(_walk(storage, upload_dir)):
+                if name not in refcounts:
+                    stats['pruned'] += 1
+                    stats['freed_bytes'] += storage.size(name)
+                    if not dry_run:
+                        storage.delete(name)
+    return stats
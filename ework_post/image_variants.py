@@ -0,0 +1,96 @@
+"""
+Размерные варианты изображений (карточка, детальная страница, превью).
+
+Вариант создается при первом запросе view image_variant и сохраняется в
+хранилище под детерминированным именем: хэш от имени оригинала, размера,
+качества и VARIANTS_VERSION. Следующие рендеры отдают файл напрямую.
+В шаблонах: {% load post_images %} {% image_variant post.image 'card' %},
+{% image_srcset post.image 'card card_2x' %}.
+"""
+import hashlib
+import logging
+
+from django.conf import settings
+from django.urls import reverse
+
+from .utils_img import process_image
+
+logger = logging.getLogger(__name__)
+
+# имя: (максимальная сторона, качество WEBP)
+VARIANTS = getattr(settings, 'IMAGE_VARIANTS', {
+    'thumb': (120, 60),
+    'card': (320, 55),
+    'card_2x': (640, 55),
+    'detail_sm': (480, 65),
+    'detail': (800, 65),
+})
+# Увеличить, чтобы пересоздать все варианты после смены параметров кодирования
+VARIANTS_VERSION = 1
+VARIANT_DIR = 'variants'
+SOURCE_PREFIXES = ('post_img/', 'banner/')
+
+_existing = set()
+_EXISTING_LIMIT = 10000
+
+
+def variant_name(name, variant):
+    size, quality = VARIANTS[variant]
+    digest = hashlib.sha1(f'{VARIANTS_VERSION}:{name}:{size}:{quality}'.encode()).hexdigest()
+    return f'{VARIANT_DIR}/{variant}/{digest[:2]}/{digest}.webp'
+
+
+def _exists(storage, name):
+    if name in _existing:
+        return True
+    if storage.exists(name):
+        if len(_existing) >= _EXISTING_LIMIT:
+            _existing.clear()
+        _existing.add(name)
+        return True
+    return False
+
+
+def variant_url(field_file, variant):
+    """URL готового варианта или view, которое его создаст"""
+    if not field_file:
+        return ''
+    target = variant_name(field_file.name, variant)
+    if _exists(field_file.storage, target):
+        return field_file.storage.url(target)
+    return reverse('core:image_variant', args=[variant, field_file.name])
+
+
+def is_variant_source(name):
+    return name.startswith(SOURCE_PREFIXES) and '..' not in name.split('/')
+
+
+def generate_variant(storage, name, variant):
+    """Создать вариант, если его еще нет. Возвращает имя файла варианта или None"""
+    target = variant_name(name, variant)
+    if _exists(storage, target):
+        return target
+
+    size, quality = VARIANTS[variant]
+    with storage.open(name) as original:
+        content = process_image(original, max_size=(size, size), img_format='WEBP', quality=quality)
+    if content is None:
+        return None
+
+    saved = storage.save(target, content)
+    if saved != target:
+        # Параллельный запрос успел сохранить тот же вариант
+        storage.delete(saved)
+    _existing.add(target)
+    return target
+
+
+def delete_variants(storage, name):
+    """Удалить варианты оригинала (при замене или удалении файла)"""
+    for variant in VARIANTS:
+        target = variant_name(name, variant)
+        _existing.discard(target)
+        try:
+            storage.delete(target)
+        except Exception as e:
+            logger.warning("Cannot delete image variant %s: %s", target, e)
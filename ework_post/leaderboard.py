@@ -0,0 +1,144 @@
+"""
+Рейтинги постов по просмотрам и избранному за день, неделю и месяц.
+
+Просмотры и добавления в избранное копятся в PostDailyActivity по дням:
+counters увеличивает строку за сегодня вместе со счетчиками поста. Рейтинг
+за период - один запрос с суммой по дням и JOIN на пост (название, рубрика,
+город), результат кэшируется на CACHE_TIMEOUT кортежем готовых записей.
+"""
+import datetime
+from collections import namedtuple
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from ework_stats.hll import HyperLogLog
+from ework_stats.uniques import POST_PRECISION
+from .models import AbsPost, Favorite, PostDailyActivity, PostView
+
+PUBLISHED_STATUS = 3
+PERIOD_DAYS = {'day': 1, 'week': 7, 'month': 30}
+REBUILD_DAYS = max(PERIOD_DAYS.values())
+METRICS = ('views', 'favorites')
+DEFAULT_LIMIT = 10
+CACHE_KEY = 'leaderboard:{}:{}:{}:{}:{}:{}'
+CACHE_TIMEOUT = 60
+
+LeaderboardEntry = namedtuple('LeaderboardEntry', 'post_id title views favorites')
+
+
+def add_activity(views=None, favorites=None, date=None):
+    """
+    Увеличить активность постов за день date (по умолчанию сегодня).
+    views, favorites - {post_id: прирост}
+    """
+    views = views or {}
+    favorites = favorites or {}
+    post_ids = {post_id for post_id in set(views) | set(favorites)
+                if views.get(post_id, 0) > 0 or favorites.get(post_id, 0) > 0}
+    if not post_ids:
+        return
+    today = date or timezone.localdate()
+    existing = set(PostDailyActivity.objects.filter(
+        date=today, post_id__in=post_ids
+    ).values_list('post_id', flat=True))
+    missing = post_ids - existing
+    if missing:
+        # Пост мог быть удален между просмотром и сбросом буфера
+        missing = AbsPost.objects.non_polymorphic().filter(pk__in=missing).values_list('pk', flat=True)
+        PostDailyActivity.objects.bulk_create(
+            [PostDailyActivity(post_id=post_id, date=today) for post_id in missing],
+            ignore_conflicts=True,
+        )
+    for post_id in post_ids:
+        PostDailyActivity.objects.filter(date=today, post_id=post_id).update(
+            views=F('views') + max(views.get(post_id, 0), 0),
+            favorites=F('favorites') + max(favorites.get(post_id, 0), 0),
+        )
+
+
+def top_posts(period='week', metric='views', super_rubric_id=None, sub_rubric_id=None, city_id=None,
+              limit=DEFAULT_LIMIT):
+    """
+    Топ опубликованных постов за период по metric ('views' или 'favorites'),
+    при необходимости внутри категории, рубрики или города.
+    Возвращает кортеж LeaderboardEntry.
+    """
+    days = PERIOD_DAYS.get(period, PERIOD_DAYS['week'])
+    if metric not in METRICS:
+        metric = METRICS[0]
+    key = CACHE_KEY.format(days, metric, super_rubric_id, sub_rubric_id, city_id, limit)
+    entries = cache.get(key)
+    if entries is not None:
+        return entries
+
+    since = timezone.localdate() - datetime.timedelta(days=days - 1)
+    queryset = PostDailyActivity.objects.filter(
+        date__gte=since,
+        post__status=PUBLISHED_STATUS,
+        post__is_deleted=False,
+    )
+    if super_rubric_id:
+        queryset = queryset.filter(post__sub_rubric__super_rubric_id=super_rubric_id)
+    if sub_rubric_id:
+        queryset = queryset.filter(post__sub_rubric_id=sub_rubric_id)
+    if city_id:
+        queryset = queryset.filter(post__city_id=city_id)
+
+    other = METRICS[1] if metric == METRICS[0] else METRICS[0]
+    rows = queryset.order_by().values('post_id', 'post__title').annotate(
+        total_views=Sum('views'),
+        total_favorites=Sum('favorites'),
+    ).order_by(f'-total_{metric}', f'-total_{other}', '-post_id')[:limit]
+
+    entries = tuple(
+        LeaderboardEntry(row['post_id'], row['post__title'], row['total_views'], row['total_favorites'])
+        for row in rows
+    )
+    cache.set(key, entries, CACHE_TIMEOUT)
+    return entries
+
+
+def rebuild_activity(days=REBUILD_DAYS):
+    """
+    Пересобрать дневную активность за последние days дней по PostView и Favorite.
+    PostView хранит только первый просмотр пользователя, поэтому повторные
+    просмотры после пересборки не учитываются; скетчи зрителей собираются
+    из тех же строк. Возвращает число строк.
+    """
+    since = timezone.localdate() - datetime.timedelta(days=days - 1)
+    activity = {}
+    viewers = {}
+    views = PostView.objects.filter(created_at__date__gte=since).annotate(
+        date=TruncDate('created_at')
+    ).order_by().values_list('object_id', 'date', 'user_id')
+    for post_id, date, user_id in views.iterator():
+        activity.setdefault((post_id, date), [0, 0])[0] += 1
+        sketch = viewers.get((post_id, date))
+        if sketch is None:
+            sketch = viewers[(post_id, date)] = HyperLogLog(POST_PRECISION)
+        sketch.add(user_id)
+    favorites = Favorite.objects.filter(created_at__date__gte=since).annotate(
+        date=TruncDate('created_at')
+    ).order_by().values_list('post_id', 'date').annotate(total=Count('pk'))
+    for post_id, date, total in favorites:
+        activity.setdefault((post_id, date), [0, 0])[1] = total
+
+    existing_posts = set(AbsPost.objects.non_polymorphic().filter(
+        pk__in={post_id for post_id, _ in activity}
+    ).values_list('pk', flat=True))
+    rows = [
+        PostDailyActivity(
+            post_id=post_id, date=date, views=views, favorites=favorites,
+            viewers=viewers[(post_id, date)].to_bytes() if (post_id, date) in viewers else None,
+        )
+        for (post_id, date), (views, favorites) in activity.items()
+        if post_id in existing_posts
+    ]
+    with transaction.atomic():
+        PostDailyActivity.objects.filter(date__gte=since).delete()
+        PostDailyActivity.objects.bulk_create(rows, batch_size=1000)
+    return len(rows)
@@ -0,0 +1,21 @@
+"""
+Django management команда для перевода изображений на хранение по хэшу содержимого.
+"""
+from django.core.management.base import BaseCommand
+
+from ework_post.image_store import dedupe_media
+
+
+class Command(BaseCommand):
+    help = 'Объединяет одинаковые файлы изображений и пересчитывает ссылки на них'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Только посчитать, ничего не менять')
+        parser.add_argument('--prune', action='store_true', help='Удалить файлы, на которые нет ссылок')
+
+    def handle(self, *args, **options):
+        stats = dedupe_media(dry_run=options['dry_run'], prune=options['prune'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Файлов: {stats['files']}, дубликатов: {stats['merged']}, "
+            f"удалено лишних: {stats['pruned']}, освобождено {stats['freed_bytes'] / 1024 / 1024:.1f} МБ"
+        ))
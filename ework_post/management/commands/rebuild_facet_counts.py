@@ -0,0 +1,14 @@
+"""
+Django management команда для пересчета счетчиков панели фильтров.
+"""
+from django.core.management.base import BaseCommand
+
+from ework_post.facets import rebuild_facet_counts
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счетчики опубликованных объявлений для фильтров'
+
+    def handle(self, *args, **options):
+        total = rebuild_facet_counts()
+        self.stdout.write(self.style.SUCCESS(f'Пересчитано комбинаций фильтров: {total}'))
@@ -0,0 +1,18 @@
+"""
+Django management команда для сверки счетчиков просмотров и избранного
+и дневной активности постов для рейтингов.
+"""
+from django.core.management.base import BaseCommand
+
+from ework_post.counters import rebuild_counters
+from ework_post.leaderboard import rebuild_activity
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счетчики просмотров и избранного объявлений'
+
+    def handle(self, *args, **options):
+        total = rebuild_counters()
+        self.stdout.write(self.style.SUCCESS(f'Обновлено объявлений: {total}'))
+        rows = rebuild_activity()
+        self.stdout.write(self.style.SUCCESS(f'Строк активности для рейтингов: {rows}'))
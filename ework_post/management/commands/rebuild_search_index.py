@@ -0,0 +1,19 @@
+"""
+Django management команда для перестроения поискового индекса объявлений.
+"""
+from django.core.management.base import BaseCommand
+
+from ework_post import search
+
+
+class Command(BaseCommand):
+    help = 'Перестраивает полнотекстовый индекс объявлений'
+
+    def handle(self, *args, **options):
+        if not search.fts_available():
+            self.stdout.write(self.style.WARNING(
+                'Поисковая таблица FTS5 недоступна для текущей БД, перестроение не требуется'
+            ))
+            return
+        total = search.rebuild_index()
+        self.stdout.write(self.style.SUCCESS(f'Проиндексировано объявлений: {total}'))
@@ -0,0 +1,44 @@
+"""
+Django management команда для пережатия всех изображений с текущими настройками.
+"""
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from ework_post.image_reprocess import BATCH_SIZE, Checkpoint, reprocess_images
+
+
+class Command(BaseCommand):
+    help = 'Пережимает изображения объявлений и баннеров параллельно на всех ядрах'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=None, help='Число процессов (по умолчанию все ядра)')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+        parser.add_argument('--only', choices=['post', 'banner'], action='append', help='Только указанные источники')
+        parser.add_argument('--checkpoint', default=os.path.join(settings.BASE_DIR, 'logs', 'reprocess_images.json'))
+        parser.add_argument('--restart', action='store_true', help='Начать заново, игнорируя контрольную точку')
+
+    def report(self, stats):
+        elapsed = max(time.monotonic() - stats['started'], 1e-6)
+        self.stdout.write(
+            f"{stats['processed']} файлов, {stats['processed'] / elapsed:.1f}/с, "
+            f"{stats['bytes_in'] / elapsed / 1024 / 1024:.1f} МБ/с, "
+            f"обновлено строк: {stats['updated']}, ошибок: {stats['failed']}"
+        )
+
+    def handle(self, *args, **options):
+        checkpoint = Checkpoint(options['checkpoint'], restart=options['restart'])
+        stats = reprocess_images(
+            checkpoint,
+            workers=options['workers'],
+            batch_size=options['batch_size'],
+            sources=options['only'],
+            report=self.report,
+        )
+        saved = stats['bytes_in'] - stats['bytes_out']
+        self.stdout.write(self.style.SUCCESS(
+            f"Готово: {stats['processed']} файлов, обновлено строк {stats['updated']}, "
+            f"ошибок {stats['failed']}, экономия {saved / 1024 / 1024:.1f} МБ"
+        ))
@@ -0,0 +1,51 @@
+from django.db import migrations, models
+
+# DDL задан здесь, а не импортируется из ework_post.search: миграция не должна
+# меняться вместе с кодом приложения
+FTS_TABLE = 'ework_post_abspost_fts'
+PG_INDEX = 'ework_post_abspost_search_gin'
+
+
+def create_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == 'sqlite':
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} "
+            f"USING fts5(title, description, tokenize='unicode61 remove_diacritics 2')"
+        )
+        # Исходный текст без стемминга: основы из запроса ищутся как префиксы слов и
+        # находят его. Стеммированный индекс строит команда rebuild_search_index
+        schema_editor.execute(
+            f"INSERT INTO {FTS_TABLE} (rowid, title, description) "
+            f"SELECT id, coalesce(title, ''), coalesce(description, '') "
+            f"FROM ework_post_abspost WHERE NOT is_deleted"
+        )
+    elif connection.vendor == 'postgresql':
+        schema_editor.execute(
+            f"CREATE INDEX IF NOT EXISTS {PG_INDEX} ON ework_post_abspost USING GIN "
+            f"(to_tsvector('russian', coalesce(title, '') || ' ' || coalesce(description, '')))"
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == 'sqlite':
+        schema_editor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+    elif connection.vendor == 'postgresql':
+        schema_editor.execute(f"DROP INDEX IF EXISTS {PG_INDEX}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ework_post', '0004_alter_abspost_city_alter_postjob_work_format'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='abspost',
+            name='description',
+            field=models.TextField(verbose_name='Описание'),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2 on 2026-10-18 08:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ework_post', '0005_abspost_search_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='postjob',
+            index=models.Index(fields=['experience', 'work_format', 'work_schedule'], name='ework_post__experie_b2dc12_idx'),
+        ),
+    ]
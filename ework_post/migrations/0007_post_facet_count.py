@@ -0,0 +1,64 @@
+# Generated by Django 5.2 on 2026-10-18 08:34
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def populate_facet_counts(apps, schema_editor):
+    AbsPost = apps.get_model('ework_post', 'AbsPost')
+    PostJob = apps.get_model('ework_post', 'PostJob')
+    PostFacetCount = apps.get_model('ework_post', 'PostFacetCount')
+
+    jobs = {
+        row['pk']: row
+        for row in PostJob.objects.values('pk', 'experience', 'work_format', 'work_schedule')
+    }
+    counts = {}
+    rows = AbsPost.objects.filter(status=3, is_deleted=False).values(
+        'pk', 'sub_rubric_id', 'city_id', 'sub_rubric__super_rubric_id'
+    )
+    for row in rows:
+        job = jobs.get(row['pk'], {})
+        key = (
+            row['sub_rubric__super_rubric_id'], row['sub_rubric_id'], row['city_id'],
+            job.get('experience', -1), job.get('work_format', -1), job.get('work_schedule', -1),
+        )
+        counts[key] = counts.get(key, 0) + 1
+
+    PostFacetCount.objects.bulk_create([
+        PostFacetCount(
+            super_rubric_id=key[0], sub_rubric_id=key[1], city_id=key[2],
+            experience=key[3], work_format=key[4], work_schedule=key[5], count=total,
+        )
+        for key, total in counts.items()
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ework_config', '0002_alter_siteconfig_site_name'),
+        ('ework_post', '0006_postjob_filter_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostFacetCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('experience', models.IntegerField(default=-1, verbose_name='Опыт работы')),
+                ('work_format', models.IntegerField(default=-1, verbose_name='Формат работы')),
+                ('work_schedule', models.IntegerField(default=-1, verbose_name='График работы')),
+                ('count', models.IntegerField(default=0, verbose_name='Количество')),
+                ('city', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='ework_config.city', verbose_name='Город')),
+                ('sub_rubric', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='ework_config.subrubric', verbose_name='Рубрика')),
+                ('super_rubric', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='ework_config.superrubric', verbose_name='Категория')),
+            ],
+            options={
+                'verbose_name': 'Счетчик фильтра',
+                'verbose_name_plural': 'Счетчики фильтров',
+                'constraints': [models.UniqueConstraint(fields=('sub_rubric', 'city', 'experience', 'work_format', 'work_schedule'), name='unique_post_facet')],
+            },
+        ),
+        migrations.RunPython(populate_facet_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+from django.db import migrations
+
+SCHEDULE_NAME = 'flush_post_views'
+SCHEDULE_FUNC = 'ework_post.tasks.flush_post_views'
+
+
+def create_schedule(apps, schema_editor):
+    Schedule = apps.get_model('django_q', 'Schedule')
+    Schedule.objects.update_or_create(
+        name=SCHEDULE_NAME,
+        defaults={'func': SCHEDULE_FUNC, 'schedule_type': 'I', 'minutes': 1, 'repeats': -1},
+    )
+
+
+def delete_schedule(apps, schema_editor):
+    Schedule = apps.get_model('django_q', 'Schedule')
+    Schedule.objects.filter(name=SCHEDULE_NAME).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_q', '0019_alter_task_options_alter_ormq_key_alter_ormq_lock_and_more'),
+        ('ework_post', '0007_post_facet_count'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_schedule, delete_schedule),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2 on 2026-10-18 08:39
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def populate_counters(apps, schema_editor):
+    AbsPost = apps.get_model('ework_post', 'AbsPost')
+    PostView = apps.get_model('ework_post', 'PostView')
+    Favorite = apps.get_model('ework_post', 'Favorite')
+
+    viewers = PostView.objects.filter(object_id=OuterRef('pk')).order_by().values(
+        'object_id'
+    ).annotate(total=Count('pk')).values('total')
+    favorites = Favorite.objects.filter(post=OuterRef('pk')).order_by().values(
+        'post'
+    ).annotate(total=Count('pk')).values('total')
+    AbsPost.objects.update(
+        view_count=Coalesce(Subquery(viewers), Value(0)),
+        unique_viewer_count=Coalesce(Subquery(viewers), Value(0)),
+        favorite_count=Coalesce(Subquery(favorites), Value(0)),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ework_post', '0008_flush_post_views_schedule'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='abspost',
+            name='favorite_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='В избранном'),
+        ),
+        migrations.AddField(
+            model_name='abspost',
+            name='unique_viewer_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Уникальные просмотры'),
+        ),
+        migrations.AddField(
+            model_name='abspost',
+            name='view_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Просмотры'),
+        ),
+        migrations.RunPython(populate_counters, migrations.RunPython.noop),
+    ]
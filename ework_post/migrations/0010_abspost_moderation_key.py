@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-18 08:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ework_post', '0009_abspost_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='abspost',
+            name='moderation_key',
+            field=models.CharField(blank=True, default='', editable=False, max_length=32, verbose_name='Ключ модерации'),
+        ),
+    ]
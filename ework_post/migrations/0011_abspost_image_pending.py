@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-18 08:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ework_post', '0010_abspost_moderation_key'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='abspost',
+            name='image_pending',
+            field=models.BooleanField(default=False, editable=False, verbose_name='Изображение обрабатывается'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2 on 2026-10-18 09:07
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ework_post', '0012_storedimage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostDailyActivity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Дата')),
+                ('views', models.PositiveIntegerField(default=0, verbose_name='Просмотры')),
+                ('favorites', models.PositiveIntegerField(default=0, verbose_name='Добавлено в избранное')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='ework_post.abspost', verbose_name='Пост')),
+            ],
+            options={
+                'verbose_name': 'Активность поста за день',
+                'verbose_name_plural': 'Активность постов по дням',
+                'indexes': [models.Index(fields=['date', 'post'], name='ework_post__date_89ac09_idx')],
+                'constraints': [models.UniqueConstraint(fields=('post', 'date'), name='unique_post_daily_activity')],
+            },
+        ),
+    ]
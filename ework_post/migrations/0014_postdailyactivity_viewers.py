@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-18 09:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ework_post', '0013_postdailyactivity'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='postdailyactivity',
+            name='viewers',
+            field=models.BinaryField(blank=True, null=True, verbose_name='Скетч уникальных зрителей'),
+        ),
+    ]
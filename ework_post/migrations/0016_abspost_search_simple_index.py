@@ -0,0 +1,28 @@
+from django.db import migrations
+
+PG_SIMPLE_INDEX = 'ework_post_abspost_search_simple_gin'
+
+
+def create_simple_index(apps, schema_editor):
+    # Вектор без стемминга для украинских и прочих слов, которых не знает словарь 'russian'
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(
+            f"CREATE INDEX IF NOT EXISTS {PG_SIMPLE_INDEX} ON ework_post_abspost USING GIN "
+            f"(to_tsvector('simple', coalesce(title, '') || ' ' || coalesce(description, '')))"
+        )
+
+
+def drop_simple_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(f"DROP INDEX IF EXISTS {PG_SIMPLE_INDEX}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ework_post', '0015_post_views_cache_table'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_simple_index, drop_simple_index),
+    ]
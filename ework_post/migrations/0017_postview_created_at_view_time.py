@@ -0,0 +1,19 @@
+# Generated by Django 5.2 on 2026-10-18 09:27
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ework_post', '0016_abspost_search_simple_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='postview',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False, verbose_name='Дата просмотра'),
+        ),
+    ]
@@ -11,10 +11,10 @@ from polymorphic.models import PolymorphicModel
 from polymorphic.managers import PolymorphicManager
 
 from .choices import STATUS_CHOICES
-from .utils_img import process_image
+from .utils_img import is_new_upload, schedule_image_processing
 from ework_locations.models import City
 from ework_currency.models import Currency
-from ework_rubric.models import SubRubric
+from ework_rubric.models import SuperRubric, SubRubric
 from ework_premium.models import Package
 
 
@@ -29,8 +29,9 @@ class AbsPost(PolymorphicModel):
     objects = PolymorphicManager()
     
     title = models.CharField(max_length=50, db_index=True, verbose_name=_('Название'))
-    description = models.TextField(db_index=True, verbose_name=_('Описание'))
+    description = models.TextField(verbose_name=_('Описание'))
     image = models.ImageField(upload_to='post_img/', verbose_name=_('Изображение'), null=True, blank=True) 
+    image_pending = models.BooleanField(default=False, editable=False, verbose_name=_('Изображение обрабатывается'))
     price = models.IntegerField(validators=[MinValueValidator(0), MaxValueValidator(99999999)], db_index=True, verbose_name=_('Сумма'))
     currency = models.ForeignKey(Currency, on_delete=models.PROTECT, verbose_name=_('Валюта'))
     sub_rubric = models.ForeignKey(SubRubric, on_delete=models.PROTECT, db_index=True, related_name='%(app_label)s_%(class)s_posts', verbose_name=_('Рубрика'))
@@ -54,6 +55,11 @@ class AbsPost(PolymorphicModel):
     auto_bump_expires_at = models.DateTimeField(null=True, blank=True, verbose_name=_("Автоподнятие до"))
     last_bump_at = models.DateTimeField(null=True, blank=True, verbose_name=_("Последнее поднятие"))
 
+    view_count = models.PositiveIntegerField(default=0, verbose_name=_("Просмотры"))
+    unique_viewer_count = models.PositiveIntegerField(default=0, verbose_name=_("Уникальные просмотры"))
+    favorite_count = models.PositiveIntegerField(default=0, verbose_name=_("В избранном"))
+    moderation_key = models.CharField(max_length=32, blank=True, default='', editable=False, verbose_name=_("Ключ модерации"))
+
     class Meta:
         verbose_name = _("Объявление")
         verbose_name_plural = _("Объявления")
@@ -76,19 +82,23 @@ class AbsPost(PolymorphicModel):
         return reverse("users:author_profile", kwargs={"author_id": self.user.pk})
 
     def save(self, *args, **kwargs):
+        # Оригинал сохраняется одной записью, пережатие идет на воркере,
+        # пока оно не закончилось карточка показывает заглушку
+        new_image = is_new_upload(self.image)
+        if new_image:
+            self.image_pending = True
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = {*kwargs['update_fields'], 'image_pending'}
         super().save(*args, **kwargs)
-        if self.image and not hasattr(self, '_image_processed'):
-            processed = process_image(self.image, self.pk)
-            if processed != self.image:
-                self.image = processed
-                self._image_processed = True
-                super().save(update_fields=['image'])
+        if new_image:
+            schedule_image_processing(AbsPost, self.pk, 'image', self.image.name)
     
     def soft_delete(self):
-        """Мягкое удаление поста"""
+        """Мягкое удаление поста, файл изображения освобождается"""
         self.is_deleted = True
         self.deleted_at = timezone.now()
-        self.save(update_fields=['is_deleted', 'deleted_at'])
+        self.image = None
+        self.save(update_fields=['is_deleted', 'deleted_at', 'image'])
     
     def set_addons(self, photo=False, highlight=False, auto_bump=False):
         """Установить аддоны для поста"""
@@ -155,7 +165,8 @@ class PostView(models.Model):
     content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE, verbose_name=_("Тип контента"))
     object_id = models.PositiveIntegerField(verbose_name=_("ID объекта"))
     post = GenericForeignKey('content_type', 'object_id')
-    created_at = models.DateTimeField(auto_now_add=True, verbose_name=_("Дата просмотра"))
+    # Время просмотра из буфера, а не время записи в БД (ework_post.view_buffer)
+    created_at = models.DateTimeField(default=timezone.now, editable=False, verbose_name=_("Дата просмотра"))
 
     class Meta:
         verbose_name = _("Просмотр")
@@ -201,6 +212,78 @@ class Favorite(models.Model):
         return f"{self.user.username} → {self.post.title}"
 
 
+class PostFacetCount(models.Model):
+    """
+    Предрасчитанное количество опубликованных постов для панели фильтров.
+    Для услуг поля вакансий хранят NOT_APPLICABLE (-1), чтобы ключ был уникальным без NULL.
+    """
+    NOT_APPLICABLE = -1
+
+    super_rubric = models.ForeignKey(SuperRubric, on_delete=models.CASCADE, related_name='+', verbose_name=_('Категория'))
+    sub_rubric = models.ForeignKey(SubRubric, on_delete=models.CASCADE, related_name='+', verbose_name=_('Рубрика'))
+    city = models.ForeignKey(City, on_delete=models.CASCADE, related_name='+', verbose_name=_('Город'))
+    experience = models.IntegerField(default=NOT_APPLICABLE, verbose_name=_('Опыт работы'))
+    work_format = models.IntegerField(default=NOT_APPLICABLE, verbose_name=_('Формат работы'))
+    work_schedule = models.IntegerField(default=NOT_APPLICABLE, verbose_name=_('График работы'))
+    count = models.IntegerField(default=0, verbose_name=_('Количество'))
+
+    class Meta:
+        verbose_name = _("Счетчик фильтра")
+        verbose_name_plural = _("Счетчики фильтров")
+        constraints = [
+            models.UniqueConstraint(
+                fields=['sub_rubric', 'city', 'experience', 'work_format', 'work_schedule'],
+                name='unique_post_facet'
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.sub_rubric_id}/{self.city_id}: {self.count}"
+
+
+class PostDailyActivity(models.Model):
+    """
+    Просмотры и добавления в избранное поста за день; из них строятся рейтинги постов.
+    viewers - HyperLogLog скетч зрителей за день (ework_stats.uniques).
+    """
+    post = models.ForeignKey(AbsPost, on_delete=models.CASCADE, related_name='+', verbose_name=_('Пост'))
+    date = models.DateField(verbose_name=_('Дата'))
+    views = models.PositiveIntegerField(default=0, verbose_name=_('Просмотры'))
+    favorites = models.PositiveIntegerField(default=0, verbose_name=_('Добавлено в избранное'))
+    viewers = models.BinaryField(null=True, blank=True, verbose_name=_('Скетч уникальных зрителей'))
+
+    class Meta:
+        verbose_name = _("Активность поста за день")
+        verbose_name_plural = _("Активность постов по дням")
+        constraints = [
+            models.UniqueConstraint(fields=['post', 'date'], name='unique_post_daily_activity'),
+        ]
+        indexes = [
+            models.Index(fields=['date', 'post']),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.post_id} {self.date}: {self.views}/{self.favorites}"
+
+
+class StoredImage(models.Model):
+    """
+    Файл изображения, сохраненный по хэшу содержимого.
+    refcount - сколько строк (объявлений, баннеров) на него ссылаются;
+    при обнулении файл удаляется.
+    """
+    name = models.CharField(max_length=255, unique=True, verbose_name=_("Файл"))
+    refcount = models.PositiveIntegerField(default=0, verbose_name=_("Ссылок"))
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name=_("Дата создания"))
+
+    class Meta:
+        verbose_name = _("Файл изображения")
+        verbose_name_plural = _("Файлы изображений")
+
+    def __str__(self) -> str:
+        return f"{self.name} ({self.refcount})"
+
+
 class BannerPost(models.Model):
     """Модель баннеров"""
     title = models.CharField(max_length=50, verbose_name=_("Заголовок"), db_index=True)
@@ -224,9 +307,7 @@ class BannerPost(models.Model):
         return self.title
 
     def save(self, *args, **kwargs):
+        new_image = is_new_upload(self.image)
         super().save(*args, **kwargs)
-        if self.image:
-            processed = process_image(self.image, self.pk)
-            if processed != self.image:
-                self.image = processed
-                super().save(update_fields=['image'])
\ No newline at end of file
+        if new_image:
+            schedule_image_processing(BannerPost, self.pk, 'image', self.image.name)
\ No newline at end of file
@@ -0,0 +1,149 @@
+"""
+Курсорная (keyset) пагинация для бесконечной прокрутки в Mini App.
+
+Вместо OFFSET и COUNT(*) следующая страница выбирается условием по значениям
+полей сортировки последнего элемента, поэтому глубокие страницы стоят столько же,
+сколько первая.
+"""
+import json
+import base64
+import datetime
+from decimal import Decimal
+
+from django.db.models import Q
+from django.http import Http404
+from django.utils.dateparse import parse_datetime
+
+
+def _encode_value(value):
+    if isinstance(value, datetime.datetime):
+        return ['d', value.isoformat()]
+    if isinstance(value, Decimal):
+        return ['n', str(value)]
+    if isinstance(value, float):
+        return ['f', repr(value)]
+    if isinstance(value, int):
+        return ['i', value]
+    return ['s', str(value)]
+
+
+def _decode_value(item):
+    kind, raw = item
+    if kind == 'd':
+        value = parse_datetime(raw)
+        if value is None:
+            raise ValueError(raw)
+        return value
+    if kind == 'n':
+        return Decimal(raw)
+    if kind == 'f':
+        return float(raw)
+    if kind == 'i':
+        return int(raw)
+    return str(raw)
+
+
+def encode_cursor(values):
+    """Упаковать значения ключа в непрозрачную строку"""
+    data = json.dumps([_encode_value(v) for v in values], separators=(',', ':'))
+    return base64.urlsafe_b64encode(data.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, size):
+    """Распаковать курсор; Http404 для поврежденного значения"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        items = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        values = [_decode_value(item) for item in items]
+    except (ValueError, TypeError, KeyError):
+        raise Http404('Некорректный курсор')
+    if len(values) != size:
+        raise Http404('Некорректный курсор')
+    return values
+
+
+def get_keyset_ordering(queryset):
+    """
+    Получить сортировку queryset в виде [(field, descending), ...]
+    с pk в качестве последнего уникального ключа
+    """
+    ordering = list(queryset.query.order_by) or list(queryset.model._meta.ordering)
+    keys = []
+    for field in ordering:
+        if not isinstance(field, str) or field == '?':
+            continue
+        descending = field.startswith('-')
+        name = field.lstrip('-')
+        if name == 'id':
+            name = 'pk'
+        keys.append((name, descending))
+        if name == 'pk':
+            break
+    if not keys or keys[-1][0] != 'pk':
+        keys.append(('pk', keys[-1][1] if keys else True))
+    return keys
+
+
+def keyset_filter(keys, values):
+    """Условие "строго после" для лексикографического ключа"""
+    condition = Q()
+    for index, (name, descending) in enumerate(keys):
+        lookup = 'lt' if descending else 'gt'
+        term = Q(**{f'{name}__{lookup}': values[index]})
+        for prev_index in range(index):
+            term &= Q(**{keys[prev_index][0]: values[prev_index]})
+        condition |= term
+    return condition
+
+
+class KeysetPaginationMixin:
+    """
+    Миксин для ListView: заменяет постраничную пагинацию на курсорную.
+    В контекст добавляются next_cursor, next_page_url и has_more.
+    Запросы с курсором отдают только фрагмент со следующей порцией карточек.
+    """
+    cursor_kwarg = 'cursor'
+    page_fragment_template = 'components/post_page.html'
+    next_cursor = None
+
+    def is_cursor_request(self):
+        return bool(self.request.GET.get(self.cursor_kwarg))
+
+    def paginate_queryset(self, queryset, page_size):
+        keys = get_keyset_ordering(queryset)
+        queryset = queryset.order_by(*[f"{'-' if desc else ''}{name}" for name, desc in keys])
+
+        cursor = self.request.GET.get(self.cursor_kwarg)
+        if cursor:
+            queryset = queryset.filter(keyset_filter(keys, decode_cursor(cursor, len(keys))))
+
+        items = list(queryset[:page_size + 1])
+        has_next = len(items) > page_size
+        items = items[:page_size]
+
+        self.next_cursor = None
+        if has_next:
+            last = items[-1]
+            self.next_cursor = encode_cursor([getattr(last, name) for name, _ in keys])
+        return None, None, items, has_next
+
+    def get_next_page_url(self):
+        if not self.next_cursor:
+            return ''
+        params = self.request.GET.copy()
+        params[self.cursor_kwarg] = self.next_cursor
+        return f'{self.request.path}?{params.urlencode()}'
+
+    def get_template_names(self):
+        if self.is_cursor_request():
+            return [self.page_fragment_template]
+        return super().get_template_names()
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context.update({
+            'next_cursor': self.next_cursor,
+            'next_page_url': self.get_next_page_url(),
+            'has_more': bool(self.next_cursor),
+        })
+        return context
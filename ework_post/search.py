@@ -0,0 +1,196 @@
+"""
+Полнотекстовый поиск по объявлениям.
+
+SQLite: виртуальная таблица FTS5 с предварительно стеммированным текстом.
+PostgreSQL: GIN индексы по to_tsvector('russian', ...) и to_tsvector('simple', ...);
+пост находится, если совпал любой из векторов. Словарь 'russian' не знает
+украинской морфологии, поэтому украинские слова ищутся по 'simple' - без
+стемминга, только точные формы слов.
+Для прочих бэкендов остается поиск через icontains.
+"""
+import re
+import logging
+
+from django.db import connection
+from django.db.models import BooleanField, FloatField, Q
+from django.db.models.expressions import RawSQL
+
+logger = logging.getLogger(__name__)
+
+# Имена таблицы и индексов продублированы в миграциях 0005 и 0016
+FTS_TABLE = 'ework_post_abspost_fts'
+PG_INDEX = 'ework_post_abspost_search_gin'
+PG_SIMPLE_INDEX = 'ework_post_abspost_search_simple_gin'
+PG_CONFIGS = ('russian', 'simple')
+PG_VECTOR = (
+    "to_tsvector('{}', coalesce(ework_post_abspost.title, '') || ' ' || "
+    "coalesce(ework_post_abspost.description, ''))"
+)
+
+# Веса полей для bm25: совпадение в названии важнее описания
+TITLE_WEIGHT = 3.0
+DESCRIPTION_WEIGHT = 1.0
+
+MIN_STEM_LENGTH = 3
+MAX_QUERY_TERMS = 8
+
+_WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+# Окончания русского и украинского языков, от длинных к коротким
+_ENDINGS = sorted({
+    # прилагательные и причастия
+    'ейшими', 'ейшего', 'ейшему', 'ейшая', 'ейшее', 'ейший', 'ейшей',
+    'ими', 'ыми', 'его', 'ого', 'ему', 'ому', 'ее', 'ие', 'ые', 'ое',
+    'ей', 'ий', 'ый', 'ой', 'ем', 'им', 'ым', 'ом', 'их', 'ых', 'ую',
+    'юю', 'ая', 'яя', 'ою', 'ею',
+    'ими', 'іми', 'ого', 'ому', 'ій', 'ий', 'ім', 'их', 'іх', 'ої', 'ій',
+    # глаголы
+    'ившись', 'ывшись', 'вшись', 'ешь', 'ете', 'ите', 'ить', 'ать', 'ять',
+    'еть', 'уть', 'ють', 'ют', 'ут', 'ят', 'ат', 'ла', 'ло', 'ли', 'ть',
+    'ти', 'ся', 'сь', 'ться', 'тися',
+    # существительные
+    'иями', 'ями', 'ами', 'ием', 'ией', 'ией', 'иях', 'ях', 'ах', 'ев',
+    'ов', 'ей', 'ия', 'ие', 'ию', 'ии', 'ья', 'ье', 'ью', 'ьи',
+    'ами', 'ями', 'ові', 'еві', 'єві', 'ів', 'їв', 'ам', 'ям', 'ою', 'ею',
+    'єю', 'ці', 'ні', 'ті',
+    'а', 'я', 'о', 'е', 'и', 'ы', 'у', 'ю', 'ь', 'й', 'і', 'ї', 'є',
+}, key=len, reverse=True)
+
+
+def stem_word(word):
+    """Облегченный стеммер для русского и украинского: отрезает окончание"""
+    word = word.lower().replace('ё', 'е')
+    if len(word) <= MIN_STEM_LENGTH or not word.isalpha():
+        return word
+    for ending in _ENDINGS:
+        if word.endswith(ending) and len(word) - len(ending) >= MIN_STEM_LENGTH:
+            return word[:-len(ending)]
+    return word
+
+
+def tokenize(text):
+    """Разбить текст на стеммированные токены"""
+    return [stem_word(word) for word in _WORD_RE.findall(text or '')]
+
+
+def build_match_query(query):
+    """Построить FTS5 MATCH выражение: все слова, каждое как префикс"""
+    terms = []
+    for token in tokenize(query)[:MAX_QUERY_TERMS]:
+        token = token.replace('"', '')
+        if token:
+            terms.append(f'"{token}"*')
+    return ' '.join(terms)
+
+
+_fts_table_exists = None
+
+
+def fts_available():
+    """
+    Проверить наличие поисковой таблицы в текущей БД.
+    Результат проверки, в том числе отрицательный, запоминается до перезапуска процесса
+    """
+    global _fts_table_exists
+    if connection.vendor != 'sqlite':
+        return False
+    if _fts_table_exists is None:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT 1 FROM sqlite_master WHERE type='table' AND name=%s", [FTS_TABLE]
+            )
+            _fts_table_exists = cursor.fetchone() is not None
+    return _fts_table_exists
+
+
+def index_post(post):
+    """Добавить или обновить пост в поисковом индексе"""
+    if not fts_available():
+        return
+    if post.is_deleted:
+        remove_post(post.pk)
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [post.pk])
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE} (rowid, title, description) VALUES (%s, %s, %s)",
+            [post.pk, ' '.join(tokenize(post.title)), ' '.join(tokenize(post.description))]
+        )
+
+
+def remove_post(post_id):
+    """Удалить пост из поискового индекса"""
+    if not fts_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [post_id])
+
+
+def rebuild_index(batch_size=500):
+    """Полностью перестроить поисковый индекс"""
+    from .models import AbsPost
+
+    if not fts_available():
+        return 0
+    rows = AbsPost.objects.non_polymorphic().filter(is_deleted=False).values_list(
+        'pk', 'title', 'description'
+    ).order_by('pk')
+    total = 0
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE}")
+        batch = []
+        for pk, title, description in rows.iterator(chunk_size=batch_size):
+            batch.append((pk, ' '.join(tokenize(title)), ' '.join(tokenize(description))))
+            if len(batch) >= batch_size:
+                cursor.executemany(
+                    f"INSERT INTO {FTS_TABLE} (rowid, title, description) VALUES (%s, %s, %s)", batch
+                )
+                total += len(batch)
+                batch = []
+        if batch:
+            cursor.executemany(
+                f"INSERT INTO {FTS_TABLE} (rowid, title, description) VALUES (%s, %s, %s)", batch
+            )
+            total += len(batch)
+    return total
+
+
+def apply_search(queryset, query):
+    """
+    Отфильтровать queryset по поисковому запросу и добавить аннотацию search_rank
+    (чем больше, тем релевантнее)
+    """
+    query = (query or '').strip()
+    if not query:
+        return queryset
+
+    if fts_available():
+        match = build_match_query(query)
+        if not match:
+            return queryset.none()
+        return queryset.filter(
+            RawSQL(
+                f"ework_post_abspost.id IN (SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s)",
+                [match], output_field=BooleanField()
+            )
+        ).annotate(search_rank=RawSQL(
+            f"(SELECT -bm25({FTS_TABLE}, %s, %s) FROM {FTS_TABLE} "
+            f"WHERE {FTS_TABLE} MATCH %s AND rowid = ework_post_abspost.id)",
+            [TITLE_WEIGHT, DESCRIPTION_WEIGHT, match], output_field=FloatField()
+        ))
+
+    if connection.vendor == 'postgresql':
+        matches = ' OR '.join(
+            f"{PG_VECTOR.format(config)} @@ websearch_to_tsquery('{config}', %s)" for config in PG_CONFIGS
+        )
+        ranks = ', '.join(
+            f"ts_rank({PG_VECTOR.format(config)}, websearch_to_tsquery('{config}', %s))" for config in PG_CONFIGS
+        )
+        params = [query] * len(PG_CONFIGS)
+        return queryset.filter(
+            RawSQL(f"({matches})", params, output_field=BooleanField())
+        ).annotate(search_rank=RawSQL(
+            f"GREATEST({ranks})", params, output_field=FloatField()
+        ))
+
+    return queryset.filter(Q(title__icontains=query) | Q(description__icontains=query))
@@ -0,0 +1,113 @@
+from django.db import transaction
+from django.db.models.signals import post_init, pre_save, post_save, pre_delete, post_delete
+from django.dispatch import receiver
+
+from .models import AbsPost, BannerPost
+from . import facets, search
+from .image_store import release
+
+SEARCH_FIELDS = {'title', 'description', 'is_deleted'}
+
+
+@receiver(post_init)
+def remember_facet_state(sender, instance, **kwargs):
+    """Запомнить исходное состояние поста для счетчиков фильтров"""
+    if isinstance(instance, AbsPost):
+        instance._facet_state = facets.get_state(instance)
+
+
+@receiver(post_save)
+def sync_search_index_on_save(sender, instance, update_fields=None, **kwargs):
+    """Синхронизация поискового индекса при сохранении поста"""
+    if not isinstance(instance, AbsPost):
+        return
+    if update_fields is not None and not SEARCH_FIELDS.intersection(update_fields):
+        return
+    search.index_post(instance)
+
+
+@receiver(pre_save)
+def load_facet_state_before_save(sender, instance, **kwargs):
+    """Дочитать из БД исходное состояние, если его не удалось снять при загрузке"""
+    if isinstance(instance, AbsPost) and instance._facet_state is None and not instance._state.adding:
+        instance._facet_state = facets.load_state(instance.pk)
+
+
+@receiver(post_save)
+def sync_facet_counts_on_save(sender, instance, created, **kwargs):
+    """Инкрементальное обновление счетчиков фильтров при смене статуса поста"""
+    if not isinstance(instance, AbsPost):
+        return
+    old_state = None if created else instance._facet_state
+    # Отложенные поля и поля вакансии у non_polymorphic экземпляра берутся из БД
+    new_state = facets.get_state(instance) or facets.load_state(instance.pk)
+    facets.track_transition(old_state, new_state)
+    instance._facet_state = new_state
+
+
+@receiver(post_delete)
+def sync_search_index_on_delete(sender, instance, **kwargs):
+    """Удаление поста из поискового индекса"""
+    if isinstance(instance, AbsPost):
+        search.remove_post(instance.pk)
+
+
+@receiver(pre_delete)
+def load_facet_state_before_delete(sender, instance, **kwargs):
+    """Дочитать состояние удаляемого поста, если его не удалось снять при загрузке"""
+    if (isinstance(instance, AbsPost) and instance._facet_state is None
+            and instance.get_real_instance_class() is type(instance)):
+        instance._facet_state = facets.load_state(instance.pk)
+
+
+@receiver(post_delete)
+def sync_facet_counts_on_delete(sender, instance, **kwargs):
+    """Уменьшение счетчиков фильтров при удалении поста"""
+    # При удалении подкласса сигнал приходит и для родительской строки AbsPost - ее пропускаем
+    if isinstance(instance, AbsPost) and instance.get_real_instance_class() is type(instance):
+        facets.track_transition(instance._facet_state, None)
+
+
+IMAGE_MODELS = (AbsPost, BannerPost)
+
+
+def _image_name(instance):
+    """Имя файла из состояния экземпляра; None, если поле не загружено (defer)"""
+    if 'image' not in instance.__dict__:
+        return None
+    value = instance.__dict__['image']
+    return getattr(value, 'name', value) or ''
+
+
+def _release_later(instance, name):
+    if name:
+        storage = instance._meta.get_field('image').storage
+        transaction.on_commit(lambda: release(storage, name))
+
+
+@receiver(post_init)
+def remember_image(sender, instance, **kwargs):
+    """Запомнить файл изображения, чтобы освободить его при замене"""
+    if isinstance(instance, IMAGE_MODELS):
+        instance._stored_image = _image_name(instance)
+
+
+@receiver(post_save)
+def release_replaced_image(sender, instance, **kwargs):
+    """Изображение заменено или убрано - освобождаем ссылку на старый файл"""
+    if not isinstance(instance, IMAGE_MODELS):
+        return
+    old, new = instance._stored_image, _image_name(instance)
+    if old is not None and new is not None and old != new:
+        _release_later(instance, old)
+    if new is not None:
+        instance._stored_image = new
+
+
+@receiver(post_delete)
+def release_deleted_image(sender, instance, **kwargs):
+    """Освобождение файла изображения при удалении строки"""
+    if isinstance(instance, BannerPost) or (
+        isinstance(instance, AbsPost) and instance.get_real_instance_class() is type(instance)
+    ):
+        _release_later(instance, _image_name(instance) or instance._stored_image)
@@ -0,0 +1,23 @@
+import logging
+
+from django.apps import apps
+
+from .utils_img import process_stored_image
+
+logger = logging.getLogger(__name__)
+
+
+def process_image_task(model_label, pk, field_name, name):
+    """
+    Пережатие загруженного изображения (resize + WEBP) на воркере django_q
+    Ставится из save() модели после сохранения оригинала
+    """
+    model = apps.get_model(model_label)
+    pending_field = 'image_pending' if any(f.name == 'image_pending' for f in model._meta.get_fields()) else None
+    try:
+        return process_stored_image(model, pk, field_name, name, pending_field)
+    except Exception as e:
+        logger.error(f"Ошибка обработки изображения {name}: {e}")
+        if pending_field:
+            model._base_manager.filter(pk=pk).update(**{pending_field: False})
+        raise
@@ -0,0 +1,22 @@
+from django import template
+
+from ework_post.image_variants import VARIANTS, variant_url
+
+register = template.Library()
+
+
+@register.simple_tag
+def image_variant(field_file, variant):
+    """URL размерного варианта изображения: {% image_variant post.image 'card' %}"""
+    return variant_url(field_file, variant)
+
+
+@register.simple_tag
+def image_srcset(field_file, variants):
+    """Значение srcset: {% image_srcset post.image 'card card_2x' %}"""
+    if not field_file:
+        return ''
+    return ', '.join(
+        f'{variant_url(field_file, variant)} {VARIANTS[variant][0]}w'
+        for variant in variants.split()
+    )
@@ -1,40 +1,56 @@
+import os
 import uuid
 import logging
 from io import BytesIO
 
 from django.conf import settings
 from django.core.files.base import ContentFile
-from PIL import Image, ExifTags
+from PIL import Image, ImageOps
 
 logger = logging.getLogger(__name__)
 
 DEFAULT_MAX_SIZE = getattr(settings, 'IMAGE_MAX_SIZE', (800, 800))
 DEFAULT_FORMAT = getattr(settings, 'IMAGE_FORMAT', 'WEBP')
 DEFAULT_QUALITY = getattr(settings, 'IMAGE_QUALITY', 65)
+# Лимиты загрузки: размер файла проверяется до декодирования,
+# число пикселей - по заголовку, до выделения памяти под растр
+MAX_UPLOAD_BYTES = getattr(settings, 'IMAGE_MAX_UPLOAD_BYTES', 15 * 1024 * 1024)
+MAX_IMAGE_PIXELS = getattr(settings, 'IMAGE_MAX_PIXELS', 50_000_000)
 
-_ORIENTATION_TAG = next(
-    (k for k, v in ExifTags.TAGS.items() if v == 'Orientation'),
-    None
-)
+# Защита Pillow от decompression bomb при любом открытии, в том числе в валидации форм
+Image.MAX_IMAGE_PIXELS = MAX_IMAGE_PIXELS
 
 
-def apply_exif_orientation(image: Image.Image) -> Image.Image:
-    """Поворот изображения согласно EXIF ориентации"""
-    try:
-        exif = image._getexif()
-        if not exif or _ORIENTATION_TAG not in exif:
-            return image
-
-        orientation = exif[_ORIENTATION_TAG]
-        if orientation == 3:
-            image = image.rotate(180, expand=True)
-        elif orientation == 6:
-            image = image.rotate(270, expand=True)
-        elif orientation == 8:
-            image = image.rotate(90, expand=True)
-    except Exception as e:
-        logger.warning("Failed to apply EXIF orientation: %s", e)
-    return image
+class ImageTooLarge(ValueError):
+    """Файл или растр больше допустимых лимитов"""
+
+
+def check_image_limits(size=None, pixels=None):
+    if size is not None and size > MAX_UPLOAD_BYTES:
+        raise ImageTooLarge(f"файл {size} байт, лимит {MAX_UPLOAD_BYTES}")
+    if pixels is not None and pixels > MAX_IMAGE_PIXELS:
+        raise ImageTooLarge(f"{pixels} пикселей, лимит {MAX_IMAGE_PIXELS}")
+
+
+def open_reduced(fp, max_size):
+    """
+    Открыть изображение сразу уменьшенным до max_size.
+    JPEG декодируется через draft в масштабе 1/2..1/8, так что полный растр
+    48 Мп фото не создается; поворот по EXIF делается уже на уменьшенной копии.
+    """
+    img = Image.open(fp)
+    check_image_limits(pixels=img.width * img.height)
+
+    # После поворота стороны могут поменяться местами, поэтому квадрат по большей стороне
+    bound = max(max_size)
+    if img.format == 'JPEG':
+        img.draft('RGB', (bound, bound))
+    img.thumbnail((bound, bound), Image.Resampling.LANCZOS)
+
+    img = ImageOps.exif_transpose(img)
+    if img.width > max_size[0] or img.height > max_size[1]:
+        img.thumbnail(max_size, Image.Resampling.LANCZOS)
+    return img
 
 
 def process_image(image_field, instance_id=None, max_size=None, img_format=None, quality=None):
@@ -49,18 +65,12 @@ def process_image(image_field, instance_id=None, max_size=None, img_format=None,
     quality = quality or DEFAULT_QUALITY
 
     try:
-        img = Image.open(image_field)
+        check_image_limits(size=getattr(image_field, 'size', None))
+        img = open_reduced(image_field, max_size)
     except Exception as e:
         logger.error("Cannot open image %s: %s", image_field.name, e)
         return None
 
-    # Применяем EXIF ориентацию
-    img = apply_exif_orientation(img)
-
-    # Изменяем размер если необходимо
-    if img.width > max_size[0] or img.height > max_size[1]:
-        img.thumbnail(max_size, Image.Resampling.LANCZOS)
-
     # Определяем формат и режим
     supports_alpha = img_format in ('WEBP', 'PNG')
     mode = 'RGBA' if supports_alpha and img.mode in ('RGBA', 'LA') else 'RGB'
@@ -87,10 +97,65 @@ def process_image(image_field, instance_id=None, max_size=None, img_format=None,
 
     buffer.seek(0)
 
-    # Генерируем новое имя файла
+    # Имя только для справки: в хранилище файл сохраняется по хэшу содержимого
     base, _ = image_field.name.rsplit('.', 1) if '.' in image_field.name else (image_field.name, '')
     prefix = f"{instance_id}_" if instance_id else ''
-    unique_id = uuid.uuid4().hex[:8]
-    new_name = f"{prefix}{base}_{unique_id}.{img_format.lower()}"
+    new_name = f"{prefix}{base}.{img_format.lower()}"
+
+    return ContentFile(buffer.read(), name=new_name)
+
+
+IMAGE_TASK = 'ework_post.tasks.process_image_task'
+
+
+def is_new_upload(field_file):
+    """Файл только что загружен и еще не сохранен в хранилище"""
+    return bool(field_file) and not field_file._committed
+
+
+def schedule_image_processing(model, pk, field_name, name):
+    """Поставить пережатие загруженного файла в очередь после коммита"""
+    from django.db import transaction
+    from django_q.tasks import async_task
+
+    transaction.on_commit(lambda: async_task(
+        IMAGE_TASK, model._meta.label, pk, field_name, name,
+        task_name=f'image-{model._meta.model_name}-{pk}-{uuid.uuid4().hex[:8]}',
+    ))
+
+
+def process_stored_image(model, pk, field_name, name, pending_field=None):
+    """
+    Пережать сохраненный оригинал, сохранить результат по хэшу содержимого
+    (см. image_store) и подменить его в строке одним UPDATE.
+    Замена выполняется только если в поле все еще этот файл: если пока задача
+    ждала очереди загрузили новое изображение, результат удаляется.
+    Возвращает новое имя файла или None.
+    """
+    from .image_store import acquire, release, store_content
+    from .image_variants import delete_variants
+
+    field = model._meta.get_field(field_name)
+    storage = field.storage
+    queryset = model._base_manager.filter(pk=pk, **{field_name: name})
+    done = {pending_field: False} if pending_field else {}
+
+    processed = None
+    if storage.exists(name):
+        with storage.open(name) as original:
+            original.name = os.path.basename(name)
+            processed = process_image(original, pk)
+    if processed is None:
+        # Оставляем оригинал, чтобы объявление не осталось без фото
+        still_current = queryset.update(**done) if done else queryset.exists()
+        if still_current:
+            acquire(name)
+        return None
 
-    return ContentFile(buffer.read(), name=new_name)
\ No newline at end of file
+    new_name = store_content(field, processed, DEFAULT_FORMAT)
+    if queryset.update(**{field_name: new_name}, **done):
+        storage.delete(name)
+        delete_variants(storage, name)
+        return new_name
+    release(storage, new_name)
+    return None
@@ -0,0 +1,125 @@
+"""
+Отложенная запись просмотров постов (write-behind).
+
+Детальная страница не пишет в БД: событие просмотра
+(user_id, content_type_id, object_id, время просмотра) добавляется в список
+в памяти процесса - без общего счетчика, обращений к БД и общему кэшу.
+Фоновый поток процесса раз в FLUSH_INTERVAL секунд, при заполнении
+FLUSH_BATCH_SIZE событий и при завершении процесса забирает накопленное и
+сохраняет одним bulk_create через counters.record_views.
+
+Повторный просмотр тем же пользователем отсекается локальным кэшем процесса
+на SEEN_TIMEOUT. Между процессами повтор отсекает уникальность PostView,
+но в view_count такой просмотр попадет. При аварийном завершении процесса
+теряются просмотры, накопленные после последнего сброса.
+"""
+import os
+import atexit
+import logging
+import threading
+
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.db import close_old_connections
+from django.utils import timezone
+
+from .counters import record_views
+
+logger = logging.getLogger(__name__)
+
+SEEN_KEY = 'post_views:seen:{}:{}:{}'
+
+# Повторный просмотр тем же пользователем в течение суток в буфер не попадает
+SEEN_TIMEOUT = 60 * 60 * 24
+FLUSH_INTERVAL = 30  # секунд
+FLUSH_BATCH_SIZE = 500
+# Если БД недоступна, буфер не растет бесконечно: старые события отбрасываются
+MAX_BUFFER_SIZE = 20000
+
+
+class ViewBuffer:
+    """Буфер просмотров процесса с фоновым потоком сброса"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._events = []
+        self._wake = threading.Event()
+        self._thread = None
+
+    def _ensure_thread(self):
+        if self._pid != os.getpid():
+            # Процесс был форкнут: поток и события родителя здесь не нужны
+            self._reset()
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='post-views-flush', daemon=True)
+            self._thread.start()
+
+    def add(self, event):
+        with self._lock:
+            self._ensure_thread()
+            self._events.append(event)
+            size = len(self._events)
+        if size >= FLUSH_BATCH_SIZE:
+            self._wake.set()
+
+    def _run(self):
+        while True:
+            self._wake.wait(FLUSH_INTERVAL)
+            self._wake.clear()
+            close_old_connections()
+            try:
+                self.flush()
+            finally:
+                close_old_connections()
+
+    def flush(self):
+        """Сохранить накопленные просмотры в БД. Возвращает число обработанных событий"""
+        with self._lock:
+            if self._pid != os.getpid():
+                self._reset()
+            events, self._events = self._events, []
+        total = 0
+        for start in range(0, len(events), FLUSH_BATCH_SIZE):
+            batch = events[start:start + FLUSH_BATCH_SIZE]
+            try:
+                record_views(batch)
+            except Exception as e:
+                logger.error(f"Не удалось записать просмотры из буфера: {e}")
+                self._requeue(events[start:])
+                break
+            total += len(batch)
+        if total:
+            logger.info(f"Записано просмотров из буфера: {total}")
+        return total
+
+    def _requeue(self, events):
+        """Вернуть несохраненные события в начало буфера до следующего сброса"""
+        with self._lock:
+            self._events[:0] = events
+            overflow = len(self._events) - MAX_BUFFER_SIZE
+            if overflow > 0:
+                del self._events[:overflow]
+                logger.error(f"Буфер просмотров переполнен, отброшено событий: {overflow}")
+
+
+buffer = ViewBuffer()
+atexit.register(buffer.flush)
+
+
+def record_view(user, post):
+    """Поставить просмотр поста в очередь на запись"""
+    if not user.is_authenticated or post.user_id == user.pk:
+        return
+    content_type_id = ContentType.objects.get_for_model(post).pk
+    if not cache.add(SEEN_KEY.format(user.pk, content_type_id, post.pk), 1, SEEN_TIMEOUT):
+        return
+    buffer.add((user.pk, content_type_id, post.pk, timezone.now()))
+
+
+def flush_post_views():
+    """Сохранить просмотры, накопленные в текущем процессе"""
+    return buffer.flush()
@@ -1,18 +1,21 @@
-from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from django.urls import reverse, reverse_lazy
 from django.views.generic import ListView, CreateView, UpdateView, DetailView, View
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.contrib import messages
-from django.db.models import Q, Count
-from django.http import HttpResponse, JsonResponse
+from django.http import Http404, HttpResponse, JsonResponse
 from django.shortcuts import redirect
-from django.contrib.contenttypes.models import ContentType
 from django.core.exceptions import ValidationError
+from django.core.files.storage import default_storage
+from django.utils.cache import patch_cache_control
 
-from ework_post.models import AbsPost, Favorite, PostView
+from ework_post.models import AbsPost, Favorite
+from ework_post.search import apply_search
+from ework_post.view_buffer import record_view
+from ework_post.image_variants import VARIANTS, generate_variant, is_variant_source
 from ework_premium.models import Package, FreePostRecord
 from ework_premium.utils import create_payment_for_post
+from ework_stats.uniques import post_unique_viewers
 
 
 class BasePostListView(ListView):
@@ -22,22 +25,23 @@ class BasePostListView(ListView):
     context_object_name = 'posts'
     paginate_by = 20
     
+    def get_post_model(self):
+        """Модель, по таблице которой строится выборка"""
+        return self.model
+
     def get_queryset(self):
         """Получить отфильтрованный queryset с оптимизированными запросами"""
-        queryset = self.model.objects.filter(
+        queryset = self.get_post_model().objects.filter(
             status=3,  # Опубликовано
             is_deleted=False
         ).select_related(
             'user', 'city', 'currency', 'sub_rubric', 'sub_rubric__super_rubric'
         ).prefetch_related('favorited_by')
         
-        # Поиск
+        # Полнотекстовый поиск
         search_query = self.request.GET.get('q', '').strip()
         if search_query:
-            queryset = queryset.filter(
-                Q(title__icontains=search_query) | 
-                Q(description__icontains=search_query)
-            )
+            queryset = apply_search(queryset, search_query)
         
         # Фильтрация по рубрике
         rubric_pk = self.kwargs.get('rubric_pk')
@@ -62,8 +66,11 @@ class BasePostListView(ListView):
         if city and city.isdigit():
             queryset = queryset.filter(city_id=int(city))
         
-        # Сортировка
+        # Сортировка: при поиске без явной сортировки - по релевантности
         sort_type = self.request.GET.get('sort', 'newest')
+        if search_query and 'sort' not in self.request.GET and 'search_rank' in queryset.query.annotations:
+            return queryset.order_by('-search_rank', '-created_at')
+
         sort_options = {
             'newest': '-created_at',
             'oldest': 'created_at',
@@ -115,33 +122,15 @@ class BasePostDetailView(DetailView):
     def get_object(self, queryset=None):
         """Получить объект и записать просмотр"""
         obj = super().get_object(queryset)
-        
-        if (self.request.user.is_authenticated and 
-            obj.user_id != self.request.user.id):
-            ct = ContentType.objects.get_for_model(obj)
-            PostView.objects.get_or_create(
-                user=self.request.user,
-                content_type=ct,
-                object_id=obj.pk,
-                defaults={'created_at': timezone.now()}
-            )
-        
+        record_view(self.request.user, obj)
         return obj
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         
-        stats = PostView.objects.filter(
-            content_type=ContentType.objects.get_for_model(self.object),
-            object_id=self.object.pk
-        ).aggregate(
-            total_views=Count('id'),
-            unique_viewers=Count('user', distinct=True)
-        )
-        
         context.update({
-            'view_count': stats['total_views'],
-            'unique_viewers': stats['unique_viewers'],
+            'view_count': self.object.view_count,
+            'unique_viewers': self.object.unique_viewer_count,
             'is_favorite': False,
             'favorite_post_ids': []
         })
@@ -153,6 +142,9 @@ class BasePostDetailView(DetailView):
             ).exists()
             context['is_favorite'] = is_favorite
             context['favorite_post_ids'] = [self.object.pk] if is_favorite else []
+            if self.request.user.pk == self.object.user_id:
+                # Автору - уникальные зрители за 30 дней по скетчам (счетчик поста - за все время)
+                context['recent_unique_viewers'] = post_unique_viewers(self.object.pk)
         
         return context
 
@@ -354,11 +346,15 @@ class PostPaymentSuccessView(LoginRequiredMixin, View):
     """View для обработки публикации после успешной оплаты"""
     
     def post(self, request, payment_id, *args, **kwargs):
-        """Опубликовать пост после успешной оплаты"""
+        """
+        Состояние поста после успешной оплаты. Статус не меняется: аддоны и
+        отправку на модерацию выполняет задача process_paid_payment, Mini App
+        часто вызывает этот endpoint раньше нее.
+        """
         from ework_premium.models import Payment
         
         try:
-            payment = Payment.objects.get(
+            payment = Payment.objects.select_related('post').get(
                 id=payment_id,
                 user=request.user,
                 status='paid'
@@ -373,21 +369,35 @@ class PostPaymentSuccessView(LoginRequiredMixin, View):
                 'error': 'Пост не найден'
             }, status=400)
         
-        try:
-            # Переводим пост из черновика на модерацию
-            post = payment.post
-            post.status = 0  # На модерацию
-            post.save(update_fields=['status'])
-            
+        post = payment.post
+        processed = payment.addons_applied_at is not None
+        if processed:
             messages.success(request, _('Объявление успешно опубликовано!'))
-            
-            return JsonResponse({
-                'success': True,
-                'post_id': post.id,
-                'redirect_url': post.get_absolute_url()
-            })
-            
-        except Exception as e:
-            return JsonResponse({
-                'error': f'Ошибка при создании объявления: {str(e)}'
-            }, status=500)
\ No newline at end of file
+        
+        return JsonResponse({
+            'success': True,
+            'post_id': post.id,
+            'status': post.status,
+            'processed': processed,
+            'redirect_url': post.get_absolute_url()
+        })
+
+
+VARIANT_REDIRECT_MAX_AGE = 60 * 60 * 24 * 30
+
+
+def image_variant(request, variant, name):
+    """
+    Создать размерный вариант изображения при первом запросе и перенаправить на файл.
+    Дальше шаблоны ссылаются на файл варианта напрямую.
+    """
+    if variant not in VARIANTS or not is_variant_source(name) or not default_storage.exists(name):
+        raise Http404
+    target = generate_variant(default_storage, name, variant)
+    response = redirect(default_storage.url(target or name))
+    if target:
+        patch_cache_control(response, public=True, max_age=VARIANT_REDIRECT_MAX_AGE)
+    else:
+        # Переадресация на оригинал при ошибке не кэшируется: вариант создастся при следующем запросе
+        patch_cache_control(response, no_cache=True)
+    return response
@@ -26,7 +26,7 @@ class PackageAdmin(admin.ModelAdmin):
 class PaymentAdmin(admin.ModelAdmin):
     list_display = ['order_id', 'user', 'package', 'amount', 'status', 'created_at', 'paid_at']
     list_filter = ['status', 'package', 'created_at']
-    readonly_fields = ['order_id', 'created_at', 'paid_at', 'telegram_payment_charge_id', 'telegram_provider_payment_charge_id']
+    readonly_fields = ['order_id', 'created_at', 'paid_at', 'refunded_at', 'telegram_payment_charge_id', 'telegram_provider_payment_charge_id']
     search_fields = ['order_id', 'user__username', 'user__email']
     
     def get_queryset(self, request):
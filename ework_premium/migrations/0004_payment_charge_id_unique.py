@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-18 08:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ework_premium', '0003_alter_package_auto_bump_addon_price_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='payment',
+            name='telegram_payment_charge_id',
+            field=models.CharField(blank=True, max_length=255, null=True, unique=True, verbose_name='ID платежа Telegram'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2 on 2026-10-18 09:15
+
+from django.db import migrations, models
+
+
+def mark_existing_paid(apps, schema_editor):
+    # Оплаченные до появления поля платежи уже обработаны синхронно
+    Payment = apps.get_model('ework_premium', 'Payment')
+    Payment.objects.filter(status__in=['paid', 'refunded'], addons_applied_at__isnull=True).update(
+        addons_applied_at=models.F('paid_at')
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ework_premium', '0004_payment_charge_id_unique'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='payment',
+            name='addons_applied_at',
+            field=models.DateTimeField(blank=True, editable=False, help_text='Когда задача оплаты применила аддоны к посту', null=True, verbose_name='Аддоны применены'),
+        ),
+        migrations.RunPython(mark_existing_paid, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2 on 2026-10-18 09:26
+
+from django.db import migrations, models
+
+
+def fill_refunded_at(apps, schema_editor):
+    # Время прежних возвратов неизвестно: считаем их возвращенными в час оплаты
+    Payment = apps.get_model('ework_premium', 'Payment')
+    Payment.objects.filter(status='refunded', refunded_at__isnull=True).update(refunded_at=models.F('paid_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ework_premium', '0005_payment_addons_applied_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='payment',
+            name='refunded_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Дата возврата'),
+        ),
+        migrations.RunPython(fill_refunded_at, migrations.RunPython.noop),
+    ]
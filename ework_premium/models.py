@@ -66,10 +66,13 @@ class Payment(models.Model):
     status = models.CharField(max_length=10, choices=PAYMENT_STATUS_CHOICES, default="pending", verbose_name=_("Статус"))
     created_at = models.DateTimeField(auto_now_add=True, verbose_name=_("Дата создания"))
     paid_at = models.DateTimeField(null=True, blank=True, verbose_name=_("Дата оплаты"))
-    telegram_payment_charge_id = models.CharField(max_length=255, blank=True, null=True, verbose_name=_("ID платежа Telegram"))
+    refunded_at = models.DateTimeField(null=True, blank=True, verbose_name=_("Дата возврата"))
+    telegram_payment_charge_id = models.CharField(max_length=255, blank=True, null=True, unique=True, verbose_name=_("ID платежа Telegram"))
     telegram_provider_payment_charge_id = models.CharField(max_length=255, blank=True, null=True, verbose_name=_("ID платежа провайдера"))
     addons_data = models.JSONField(default=dict, blank=True, verbose_name=_("Данные аддонов"), 
                                   help_text=_("JSON с информацией о выбранных аддонах"))
+    addons_applied_at = models.DateTimeField(null=True, blank=True, editable=False, verbose_name=_("Аддоны применены"),
+                                             help_text=_("Когда задача оплаты применила аддоны к посту"))
 
     post = models.ForeignKey('ework_post.AbsPost', on_delete=models.CASCADE, null=True, blank=True, 
                             verbose_name=_("Пост"), help_text=_("Пост-черновик для публикации после оплаты"))
@@ -92,19 +95,20 @@ class Payment(models.Model):
         return f"{user_id}_{int(timezone.now().timestamp())}_{uuid.uuid4().hex[:8]}"
 # Этап 9: Обновление статуса платежа
     def mark_as_paid(self, telegram_charge_id=None, provider_charge_id=None):
-        """Отметить платеж как оплаченный"""
-        self.status = 'paid'
-        self.paid_at = timezone.now()
-        if telegram_charge_id:
-            self.telegram_payment_charge_id = telegram_charge_id
-        if provider_charge_id:
-            self.telegram_provider_payment_charge_id = provider_charge_id
-        self.save(update_fields=['status', 'paid_at', 'telegram_payment_charge_id', 'telegram_provider_payment_charge_id'])
+        """Отметить платеж как оплаченный (через PaymentService, побочные эффекты один раз)"""
+        from ework_payment.services import PaymentService
+        if PaymentService.complete_payment(self.pk, telegram_charge_id, provider_charge_id):
+            self.refresh_from_db(fields=['status', 'paid_at', 'telegram_payment_charge_id', 'telegram_provider_payment_charge_id'])
+            return True
+        return False
 
     def mark_as_failed(self):
         """Отметить платеж как неудачный"""
-        self.status = 'failed'
-        self.save(update_fields=['status'])
+        from ework_payment.services import PaymentService
+        if PaymentService.transition(self.pk, 'pending', 'failed'):
+            self.status = 'failed'
+            return True
+        return False
 
     def get_payload(self):
         """Получить payload для Telegram"""
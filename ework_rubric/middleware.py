@@ -1,13 +1,5 @@
-from django.core.cache import cache
-from .models import SubRubric
+from ework_core.refdata import get_refdata
 
 def post_rubric_context_processor(request):
-    # Кэшируем рубрики на 1 час
-    rubrics = cache.get('rubrics_list')
-    if rubrics is None:
-        rubrics = SubRubric.objects.select_related('super_rubric').order_by(
-            'super_rubric__order', 'order'
-        )
-        cache.set('rubrics_list', rubrics, 3600)
-    
-    return {'rubrics': rubrics}
\ No newline at end of file
+    # Рубрики из справочников процесса, без запросов к БД
+    return {'rubrics': get_refdata().sub_rubrics}
@@ -7,10 +7,12 @@ from .models import DailyStats
 
 @admin.register(DailyStats)
 class DailyStatsAdmin(admin.ModelAdmin):
-    list_display = ('date', 'new_users', 'new_posts', 'post_views', 'favorites_added')
+    list_display = ('date', 'new_users', 'new_posts', 'post_views', 'favorites_added', 'payments', 'revenue',
+                    'moderation_cache_hits', 'moderation_cache_misses')
     list_filter = ('date',)
     ordering = ('-date',)
-    readonly_fields = ('date', 'new_users', 'new_posts', 'post_views', 'favorites_added')
+    readonly_fields = ('date', 'new_users', 'new_posts', 'post_views', 'favorites_added', 'payments', 'revenue',
+                       'moderation_cache_hits', 'moderation_cache_misses')
     
     def has_add_permission(self, request):
         return False
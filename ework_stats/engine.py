@@ -0,0 +1,119 @@
+"""
+Временные ряды для API панели статистики.
+
+Ряды строятся по агрегатам, а не по исходным таблицам: часовые корзины - одним
+запросом к HourlyStats, дневные и месячные - одним запросом к DailyStats, сразу
+по всем метрикам. Агрегаты пополняет задача collect_stats_rollups. Пропуски
+заполняются по индексу корзины в заранее выделенном списке, без обхода
+календаря в цикле, поэтому стоимость ответа зависит от числа корзин, а не от
+размера таблиц.
+"""
+import datetime
+from collections import namedtuple
+
+from django.db.models import Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from .models import DailyStats, HourlyStats
+
+Period = namedtuple('Period', 'granularity buckets label_format')
+
+PERIODS = {
+    'day': Period('hour', 24, '%H:%M'),
+    'week': Period('day', 7, '%d.%m'),
+    'month': Period('day', 30, '%d.%m'),
+    'year': Period('month', 12, '%b %Y'),
+}
+DEFAULT_PERIOD = 'month'
+
+
+def get_period(name):
+    return PERIODS.get(name, PERIODS[DEFAULT_PERIOD])
+
+
+def _month_index(value):
+    return value.year * 12 + value.month - 1
+
+
+def bucket_starts(period, now=None):
+    """Начала корзин периода, последняя корзина - текущая"""
+    now = timezone.localtime(now)
+    if period.granularity == 'hour':
+        last = now.replace(minute=0, second=0, microsecond=0)
+        return [last - datetime.timedelta(hours=period.buckets - 1 - i) for i in range(period.buckets)]
+    if period.granularity == 'day':
+        last = now.date()
+        return [last - datetime.timedelta(days=period.buckets - 1 - i) for i in range(period.buckets)]
+    last = _month_index(now)
+    return [
+        datetime.date(index // 12, index % 12 + 1, 1)
+        for index in range(last - period.buckets + 1, last + 1)
+    ]
+
+
+def _bucket_index(period, start, key):
+    """Номер корзины для ключа группировки (или None вне периода)"""
+    if period.granularity == 'hour':
+        index = int((key - start).total_seconds() // 3600)
+    elif period.granularity == 'day':
+        index = (key - start).days
+    else:
+        index = _month_index(key) - _month_index(start)
+    return index if 0 <= index < period.buckets else None
+
+
+def _fill(period, starts, series, rows, fields):
+    """Разложить строки (ключ, значения...) по корзинам"""
+    for key, *values in rows:
+        if key is None:
+            continue
+        if period.granularity == 'hour':
+            key = timezone.localtime(key)
+        elif isinstance(key, datetime.datetime):
+            key = key.date()
+        index = _bucket_index(period, starts[0], key)
+        if index is None:
+            continue
+        for field, value in zip(fields, values):
+            series[field][index] += value or 0
+
+
+def _daily_rows(period, starts, fields):
+    queryset = DailyStats.objects.filter(date__gte=starts[0]).order_by()
+    if period.granularity == 'month':
+        queryset = queryset.annotate(bucket=TruncMonth('date')).values('bucket')
+        return queryset.annotate(**{field: Sum(field) for field in fields}).values_list('bucket', *fields)
+    return queryset.values_list('date', *fields)
+
+
+def _hourly_rows(starts, fields):
+    return HourlyStats.objects.filter(hour__gte=starts[0]).values_list('hour', *fields)
+
+
+def series(period_name, fields, now=None):
+    """
+    Ряды метрик за период: (подписи корзин, {метрика: список значений}).
+    fields - колонки HourlyStats/DailyStats (new_users, new_posts, post_views, favorites_added,
+    payments, revenue).
+    """
+    period = get_period(period_name)
+    starts = bucket_starts(period, now)
+    values = {field: [0] * period.buckets for field in fields}
+
+    if period.granularity == 'hour':
+        rows = _hourly_rows(starts, fields)
+    else:
+        rows = _daily_rows(period, starts, fields)
+    _fill(period, starts, values, rows, fields)
+
+    labels = [start.strftime(period.label_format) for start in starts]
+    return labels, values
+
+
+def period_start(period_name, now=None):
+    """Начало первой корзины периода как datetime"""
+    start = bucket_starts(get_period(period_name), now)[0]
+    if isinstance(start, datetime.datetime):
+        return start
+    return timezone.make_aware(datetime.datetime.combine(start, datetime.time.min))
@@ -0,0 +1,87 @@
+"""
+HyperLogLog: приближенное число уникальных значений в скетче фиксированного размера.
+
+Скетч - 2**precision регистров по байту. Скетчи одной точности объединяются
+поэлементным максимумом, поэтому уникальные за любой диапазон дней считаются
+слиянием дневных скетчей без обращения к исходным событиям. Стандартная
+ошибка оценки - 1.04 / sqrt(2**precision): около 3% при precision=10 и 1.6%
+при precision=12.
+"""
+import hashlib
+import math
+
+DEFAULT_PRECISION = 12
+HASH_BITS = 64
+
+# 2 ** -rank для всех возможных значений регистра
+_INVERSE_POWERS = [2.0 ** -rank for rank in range(HASH_BITS + 1)]
+
+
+def _hash(value):
+    digest = hashlib.blake2b(str(value).encode(), digest_size=HASH_BITS // 8).digest()
+    return int.from_bytes(digest, 'big')
+
+
+class HyperLogLog:
+    __slots__ = ('precision', 'registers')
+
+    def __init__(self, precision=DEFAULT_PRECISION, registers=None):
+        if not 4 <= precision <= 16:
+            raise ValueError(f'Недопустимая точность HyperLogLog: {precision}')
+        size = 1 << precision
+        if registers is not None and len(registers) != size:
+            raise ValueError('Размер скетча не соответствует точности')
+        self.precision = precision
+        self.registers = bytearray(registers) if registers is not None else bytearray(size)
+
+    @classmethod
+    def from_bytes(cls, data, precision=DEFAULT_PRECISION):
+        """Скетч из сохраненных байтов; пустое значение - пустой скетч"""
+        if not data:
+            return cls(precision)
+        data = bytes(data)
+        return cls(len(data).bit_length() - 1, data)
+
+    def to_bytes(self):
+        return bytes(self.registers)
+
+    def add(self, value):
+        x = _hash(value)
+        width = HASH_BITS - self.precision
+        index = x >> width
+        rank = width - (x & ((1 << width) - 1)).bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def update(self, other):
+        """Объединить с другим скетчем той же точности"""
+        if other.precision != self.precision:
+            raise ValueError('Нельзя объединить скетчи разной точности')
+        self.registers = bytearray(map(max, self.registers, other.registers))
+
+    def count(self):
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / sum(_INVERSE_POWERS[rank] for rank in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            # Малые значения точнее оценивает linear counting
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
+
+    def __len__(self):
+        return self.count()
+
+
+def merge(sketches, precision=DEFAULT_PRECISION):
+    """Объединить сохраненные скетчи (bytes) в один HyperLogLog"""
+    result = None
+    for data in sketches:
+        if not data:
+            continue
+        sketch = HyperLogLog.from_bytes(data)
+        if result is None:
+            result = sketch
+        else:
+            result.update(sketch)
+    return result or HyperLogLog(precision)
@@ -0,0 +1,23 @@
+# Generated by Django 5.2 on 2026-10-18 08:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ework_stats', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dailystats',
+            name='moderation_cache_hits',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='dailystats',
+            name='moderation_cache_misses',
+            field=models.IntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2 on 2026-10-18 09:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ework_stats', '0002_dailystats_moderation_cache_hits_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dailystats',
+            name='payments',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='dailystats',
+            name='revenue',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=12),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2 on 2026-10-18 09:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ework_stats', '0003_dailystats_payments_revenue'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HourlyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hour', models.DateTimeField(unique=True)),
+                ('new_users', models.IntegerField(default=0)),
+                ('new_posts', models.IntegerField(default=0)),
+                ('post_views', models.IntegerField(default=0)),
+                ('favorites_added', models.IntegerField(default=0)),
+                ('payments', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+            ],
+            options={
+                'verbose_name': 'Статистика по часам',
+                'verbose_name_plural': 'Статистика по часам',
+                'ordering': ['-hour'],
+            },
+        ),
+        migrations.CreateModel(
+            name='StatsWatermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('position', models.DateTimeField()),
+            ],
+            options={
+                'verbose_name': 'Отметка сбора статистики',
+                'verbose_name_plural': 'Отметки сбора статистики',
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+from django.db import migrations
+
+SCHEDULE_NAME = 'collect_stats_rollups'
+SCHEDULE_FUNC = 'ework_stats.tasks.collect_stats_rollups'
+OLD_FUNC = 'ework_stats.tasks.collect_daily_stats'
+
+
+def create_schedule(apps, schema_editor):
+    Schedule = apps.get_model('django_q', 'Schedule')
+    Schedule.objects.filter(func=OLD_FUNC).delete()
+    Schedule.objects.update_or_create(
+        name=SCHEDULE_NAME,
+        defaults={'func': SCHEDULE_FUNC, 'schedule_type': 'I', 'minutes': 5, 'repeats': -1},
+    )
+
+
+def delete_schedule(apps, schema_editor):
+    Schedule = apps.get_model('django_q', 'Schedule')
+    Schedule.objects.filter(name=SCHEDULE_NAME).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_q', '0019_alter_task_options_alter_ormq_key_alter_ormq_lock_and_more'),
+        ('ework_stats', '0004_hourlystats_statswatermark'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_schedule, delete_schedule),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-18 09:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ework_stats', '0005_collect_stats_rollups_schedule'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dailystats',
+            name='active_users',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+    ]
@@ -1,4 +1,6 @@
 from django.db import models
+from django.db.models import F
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
 class DailyStats(models.Model):
@@ -7,6 +9,12 @@ class DailyStats(models.Model):
     new_posts = models.IntegerField(default=0)
     post_views = models.IntegerField(default=0)
     favorites_added = models.IntegerField(default=0)
+    payments = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    moderation_cache_hits = models.IntegerField(default=0)
+    moderation_cache_misses = models.IntegerField(default=0)
+    # HyperLogLog скетч пользователей, проявивших активность за день
+    active_users = models.BinaryField(null=True, blank=True)
     
     class Meta:
         verbose_name = _("Статистика")
@@ -15,3 +23,47 @@ class DailyStats(models.Model):
     
     def __str__(self):
         return f"Статистика за {self.date}"
+
+    @classmethod
+    def add_moderation_cache_stats(cls, hits, misses):
+        """Учесть попадания и промахи кэша вердиктов модерации за сегодня"""
+        if not hits and not misses:
+            return
+        date = timezone.localdate()
+        cls.objects.get_or_create(date=date)
+        cls.objects.filter(date=date).update(
+            moderation_cache_hits=F('moderation_cache_hits') + hits,
+            moderation_cache_misses=F('moderation_cache_misses') + misses,
+        )
+
+
+class HourlyStats(models.Model):
+    """Почасовые агрегаты; пополняются задачей collect_stats_rollups"""
+    hour = models.DateTimeField(unique=True)
+    new_users = models.IntegerField(default=0)
+    new_posts = models.IntegerField(default=0)
+    post_views = models.IntegerField(default=0)
+    favorites_added = models.IntegerField(default=0)
+    payments = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        verbose_name = _("Статистика по часам")
+        verbose_name_plural = _("Статистика по часам")
+        ordering = ['-hour']
+
+    def __str__(self):
+        return f"Статистика за {self.hour:%Y-%m-%d %H:00}"
+
+
+class StatsWatermark(models.Model):
+    """Момент, до которого исходные таблицы уже учтены в агрегатах"""
+    name = models.CharField(max_length=50, unique=True)
+    position = models.DateTimeField()
+
+    class Meta:
+        verbose_name = _("Отметка сбора статистики")
+        verbose_name_plural = _("Отметки сбора статистики")
+
+    def __str__(self):
+        return f"{self.name}: {self.position}"
@@ -1,64 +1,136 @@
-from django.utils import timezone
-from django.db.models import Count
+"""
+Сбор агрегатов статистики.
+
+collect_stats_rollups запускается по расписанию django_q и учитывает только
+строки исходных таблиц, появившиеся после отметки StatsWatermark: группирует
+их по часам, прибавляет к HourlyStats и пересчитывает DailyStats для
+затронутых дней из часовых строк. Отметка отстает от текущего времени на
+ROLLUP_LAG, чтобы не пропустить записи, вставленные с опозданием.
+
+Просмотры идут по своей отметке с отставанием VIEWS_ROLLUP_LAG: PostView
+хранит время просмотра, а в БД строка попадает только при сбросе буфера.
+Возвраты вычитаются из выручки в час возврата (refunded_at), поэтому
+уже учтенные часы оплаты не пересчитываются.
+"""
+from collections import defaultdict
 from datetime import timedelta
-from .models import DailyStats
+
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate, TruncHour
+from django.utils import timezone
+
+from .models import DailyStats, HourlyStats, StatsWatermark
 from ework_user_tg.models import TelegramUser
 from ework_post.models import AbsPost, PostView, Favorite
+from ework_premium.models import Payment
+
+ROLLUP_WATERMARK = 'rollups'
+ROLLUP_LAG = timedelta(minutes=2)
+VIEWS_WATERMARK = 'rollups:views'
+# Просмотр, сброшенный из буфера позже этого срока, в агрегаты не попадет
+VIEWS_ROLLUP_LAG = timedelta(minutes=15)
+BACKFILL_DAYS = 366
+# Окно одной транзакции: первый запуск догоняет историю по частям
+MAX_WINDOW = timedelta(days=31)
 
-def collect_daily_stats():
-    """Собирает статистику за вчерашний день и сегодня."""
-    today = timezone.now().date()
-    yesterday = today - timedelta(days=1)
-    
-    # Собираем статистику за вчера
-    yesterday_stats = collect_stats_for_date(yesterday)
-    
-    # Собираем статистику за сегодня
-    today_stats = collect_stats_for_date(today)
-    
-    return {
-        'yesterday': yesterday_stats,
-        'today': today_stats
-    }
-
-def collect_stats_for_date(date):
-    """Собирает статистику за указанную дату."""
-    # Считаем новых пользователей за указанную дату
-    new_users = TelegramUser.objects.filter(
-        date_joined__date=date
-    ).count()
-    
-    # Считаем новые объявления за указанную дату
-    new_posts = AbsPost.objects.filter(
-        created_at__date=date
-    ).count()
-    
-    # Считаем просмотры за указанную дату
-    post_views = PostView.objects.filter(
-        created_at__date=date
-    ).count()
-    
-    # Считаем добавления в избранное за указанную дату
-    favorites_added = Favorite.objects.filter(
-        created_at__date=date
-    ).count()
-    
-    # Сохраняем или обновляем статистику
-    stats, created = DailyStats.objects.update_or_create(
-        date=date,
-        defaults={
-            'new_users': new_users,
-            'new_posts': new_posts,
-            'post_views': post_views,
-            'favorites_added': favorites_added,
-        }
+ROLLUP_FIELDS = ('new_users', 'new_posts', 'post_views', 'favorites_added', 'payments', 'revenue')
+
+
+def rollup_sources():
+    """(queryset, поле даты, {метрика: агрегат}) для каждой исходной таблицы"""
+    return (
+        (TelegramUser.objects.all(), 'created_at', {'new_users': Count('id')}),
+        (AbsPost.objects.non_polymorphic(), 'created_at', {'new_posts': Count('id')}),
+        (Favorite.objects.all(), 'created_at', {'favorites_added': Count('id')}),
+        # Возвращенный платеж остается в часе оплаты и вычитается в часе возврата
+        (Payment.objects.filter(status__in=('paid', 'refunded')), 'paid_at',
+         {'payments': Count('id'), 'revenue': Sum('amount')}),
+        (Payment.objects.filter(status='refunded'), 'refunded_at', {'revenue': -Sum('amount')}),
+    )
+
+
+def view_rollup_sources():
+    return (
+        (PostView.objects.all(), 'created_at', {'post_views': Count('id')}),
     )
-    
-    return {
-        'date': date,
-        'new_users': new_users,
-        'new_posts': new_posts,
-        'post_views': post_views,
-        'favorites_added': favorites_added,
-        'created': created
-    }
+
+
+# Отметка: (отставание, источники). Отметка просмотров идет первой: на новой
+# установке она создается раньше основной и тоже догоняет историю
+ROLLUPS = {
+    VIEWS_WATERMARK: (VIEWS_ROLLUP_LAG, view_rollup_sources),
+    ROLLUP_WATERMARK: (ROLLUP_LAG, rollup_sources),
+}
+
+
+def _get_watermark(name, until):
+    watermark = StatsWatermark.objects.select_for_update().filter(name=name).first()
+    if watermark is None:
+        # Новая отметка продолжает основную, чтобы не учесть уже собранное повторно
+        main = StatsWatermark.objects.filter(name=ROLLUP_WATERMARK).exclude(name=name).first()
+        if main is not None:
+            position = main.position
+        else:
+            position = (until - timedelta(days=BACKFILL_DAYS)).replace(minute=0, second=0, microsecond=0)
+        watermark = StatsWatermark.objects.create(name=name, position=position)
+    return watermark
+
+
+def _refresh_daily(dates):
+    """Пересчитать DailyStats за дни из часовых агрегатов (поля кэша модерации не трогаются)"""
+    if not dates:
+        return
+    rows = HourlyStats.objects.filter(hour__date__in=dates).annotate(
+        date=TruncDate('hour')
+    ).order_by().values('date').annotate(**{field: Sum(field) for field in ROLLUP_FIELDS})
+    for row in rows:
+        date = row.pop('date')
+        DailyStats.objects.update_or_create(date=date, defaults=row)
+
+
+def collect_window(name=ROLLUP_WATERMARK, now=None):
+    """
+    Учесть одно окно после отметки name. Возвращает True, если после него
+    остались неучтенные данные.
+    """
+    lag, sources = ROLLUPS[name]
+    until = (now or timezone.now()) - lag
+    with transaction.atomic():
+        watermark = _get_watermark(name, until)
+        start = watermark.position
+        end = min(until, start + MAX_WINDOW)
+        if end <= start:
+            return False
+
+        hours = defaultdict(lambda: defaultdict(int))
+        for queryset, date_field, aggregates in sources():
+            rows = queryset.filter(**{
+                f'{date_field}__gte': start,
+                f'{date_field}__lt': end,
+            }).annotate(bucket=TruncHour(date_field)).order_by().values('bucket').annotate(**aggregates)
+            for row in rows:
+                values = hours[row.pop('bucket')]
+                for field, value in row.items():
+                    values[field] += value or 0
+
+        for hour, values in hours.items():
+            HourlyStats.objects.get_or_create(hour=hour)
+            HourlyStats.objects.filter(hour=hour).update(**{
+                field: F(field) + value for field, value in values.items() if value
+            })
+        _refresh_daily({timezone.localtime(hour).date() for hour in hours})
+
+        watermark.position = end
+        watermark.save(update_fields=['position'])
+    return end < until
+
+
+def collect_stats_rollups():
+    """Задача django_q: догнать агрегаты до текущего момента"""
+    windows = 0
+    for name in ROLLUPS:
+        windows += 1
+        while collect_window(name):
+            windows += 1
+    return windows
@@ -0,0 +1,92 @@
+"""
+Уникальные зрители постов и активные пользователи платформы по HyperLogLog скетчам.
+
+При сбросе буфера просмотров пользователи добавляются в дневной скетч поста
+(PostDailyActivity.viewers) и в дневной скетч платформы (DailyStats.active_users).
+Уникальные за любой диапазон дней - слияние дневных скетчей, без
+COUNT(DISTINCT) по PostView и TelegramUser: ими отвечает API активных
+пользователей (DAU/WAU/MAU). Скетчи пишет сброс буфера просмотров в каждом
+веб-процессе, строки блокируются select_for_update на время слияния.
+"""
+import datetime
+from collections import defaultdict
+
+from django.db import transaction
+from django.utils import timezone
+
+from ework_post.models import PostDailyActivity
+from .hll import HyperLogLog, merge
+from .models import DailyStats
+
+POST_PRECISION = 10
+PLATFORM_PRECISION = 12
+
+
+def add_viewers(events, date=None):
+    """
+    Учесть события просмотра (user_id, content_type_id, object_id, ...) в скетчах за день.
+    Строки PostDailyActivity за день должны уже существовать (leaderboard.add_activity).
+    """
+    if not events:
+        return
+    date = date or timezone.localdate()
+    viewers = defaultdict(set)
+    for user_id, _, post_id, *_ in events:
+        viewers[post_id].add(user_id)
+
+    with transaction.atomic():
+        rows = PostDailyActivity.objects.select_for_update().filter(
+            date=date, post_id__in=viewers
+        ).only('pk', 'post_id', 'viewers')
+        for row in rows:
+            sketch = HyperLogLog.from_bytes(row.viewers, POST_PRECISION)
+            for user_id in viewers[row.post_id]:
+                sketch.add(user_id)
+            PostDailyActivity.objects.filter(pk=row.pk).update(viewers=sketch.to_bytes())
+
+        DailyStats.objects.get_or_create(date=date)
+        stats = DailyStats.objects.select_for_update().only('pk', 'active_users').get(date=date)
+        sketch = HyperLogLog.from_bytes(stats.active_users, PLATFORM_PRECISION)
+        for users in viewers.values():
+            for user_id in users:
+                sketch.add(user_id)
+        DailyStats.objects.filter(pk=stats.pk).update(active_users=sketch.to_bytes())
+
+
+def _since(days, today=None):
+    return (today or timezone.localdate()) - datetime.timedelta(days=days - 1)
+
+
+def post_unique_viewers(post_id, days=30):
+    """Приблизительное число уникальных зрителей поста за последние days дней"""
+    sketches = PostDailyActivity.objects.filter(
+        post_id=post_id, date__gte=_since(days)
+    ).values_list('viewers', flat=True)
+    return merge(sketches, POST_PRECISION).count()
+
+
+def active_users(days=1):
+    """Приблизительное число активных пользователей платформы за последние days дней"""
+    sketches = DailyStats.objects.filter(date__gte=_since(days)).values_list('active_users', flat=True)
+    return merge(sketches, PLATFORM_PRECISION).count()
+
+
+def active_users_windows(windows=(1, 7, 30)):
+    """
+    Активные пользователи сразу за несколько окон: {дней: оценка}.
+    Скетчи читаются одним запросом и сливаются накопительно от сегодняшнего дня.
+    """
+    today = timezone.localdate()
+    by_date = dict(DailyStats.objects.filter(
+        date__gte=_since(max(windows), today)
+    ).values_list('date', 'active_users'))
+
+    result = {}
+    sketch = HyperLogLog(PLATFORM_PRECISION)
+    for day in range(max(windows)):
+        data = by_date.get(today - datetime.timedelta(days=day))
+        if data:
+            sketch.update(HyperLogLog.from_bytes(data))
+        if day + 1 in windows:
+            result[day + 1] = sketch.count()
+    return result
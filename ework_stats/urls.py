@@ -14,6 +14,8 @@ urlpatterns = [
     path('api/users/', views.api_users_stats, name='api_users_stats'),
     path('api/posts/', views.api_posts_stats, name='api_posts_stats'),
     path('api/views/', views.api_views_stats, name='api_views_stats'),
+    path('api/posts/<int:post_id>/viewers/', views.api_post_viewers, name='api_post_viewers'),
+    path('api/leaderboard/', views.api_leaderboard, name='api_leaderboard'),
     path('api/revenue/', views.api_revenue_stats, name='api_revenue_stats'),
     path('api/finance/', views.api_revenue_stats, name='api_finance_stats'),  # Alias
 ]
@@ -2,12 +2,12 @@ from django.shortcuts import render
 from django.http import JsonResponse
 from django.contrib.admin.views.decorators import staff_member_required
 from django.db.models import Count, Sum, F, Q, Avg
-from django.db.models.functions import TruncDay, TruncWeek, TruncMonth, TruncYear
 from django.utils import timezone
 from ework_post.models import AbsPost, PostView, Favorite
+from ework_post import leaderboard
 from ework_user_tg.models import TelegramUser
 from ework_premium.models import Payment
-from .tasks import collect_daily_stats
+from . import engine, uniques
 from .models import DailyStats
 import datetime
 
@@ -15,9 +15,6 @@ import datetime
 @staff_member_required
 def dashboard_stats(request):
     """Отображает общую панель статистики."""
-    # Собираем статистику перед отображением страницы
-    collect_stats_if_needed()
-    
     # Подготовка данных для шаблона
     context = {
         'period_choices': [
@@ -51,7 +48,8 @@ def dashboard_stats(request):
                 'metrics': [
                     {'id': 'new-posts', 'label': 'Новых объявлений'},
                     {'id': 'posts-moderation', 'label': 'На модерации'},
-                    {'id': 'posts-growth', 'label': 'Активных объявлений'}
+                    {'id': 'posts-growth', 'label': 'Активных объявлений'},
+                    {'id': 'moderation-cache', 'label': 'Попаданий в кэш модерации, %'}
                 ]
             },
             {
@@ -91,66 +89,6 @@ def finance_stats(request):
     """Отображает финансовую статистику."""
     return render(request, 'admin_stats/finance_stats.html')
 
-def collect_stats_if_needed():
-    """Проверяет, нужно ли собирать статистику, и собирает её при необходимости."""
-    today = timezone.now().date()
-    yesterday = today - datetime.timedelta(days=1)
-    
-    # Проверяем, есть ли статистика за вчерашний день
-    if not DailyStats.objects.filter(date=yesterday).exists():
-        # Если нет, собираем статистику
-        collect_daily_stats()
-    
-    # Также можно проверить наличие статистики за предыдущие дни
-    # и собрать её, если она отсутствует
-    for days_ago in range(2, 31):  # Проверяем последние 30 дней
-        check_date = today - datetime.timedelta(days=days_ago)
-        if not DailyStats.objects.filter(date=check_date).exists():
-            # Собираем статистику за этот день
-            collect_stats_for_date(check_date)
-
-def collect_stats_for_date(date):
-    """Собирает статистику за указанную дату."""
-    # Считаем новых пользователей за указанную дату
-    new_users = TelegramUser.objects.filter(
-        date_joined__date=date
-    ).count()
-    
-    # Считаем новые объявления за указанную дату
-    new_posts = AbsPost.objects.filter(
-        created_at__date=date
-    ).count()
-    
-    # Считаем просмотры за указанную дату
-    post_views = PostView.objects.filter(
-        created_at__date=date
-    ).count()
-    
-    # Считаем добавления в избранное за указанную дату
-    favorites_added = Favorite.objects.filter(
-        created_at__date=date
-    ).count()
-    
-    # Сохраняем статистику
-    stats, created = DailyStats.objects.update_or_create(
-        date=date,
-        defaults={
-            'new_users': new_users,
-            'new_posts': new_posts,
-            'post_views': post_views,
-            'favorites_added': favorites_added,
-        }
-    )
-    
-    return {
-        'date': date,
-        'new_users': new_users,
-        'new_posts': new_posts,
-        'post_views': post_views,
-        'favorites_added': favorites_added,
-        'created': created
-    }
-
 @staff_member_required
 def api_users_stats(request):
     """API для получения статистики пользователей."""
@@ -159,82 +97,25 @@ def api_users_stats(request):
     # Получаем общее количество пользователей
     total_users = TelegramUser.objects.count()
     
-    # Получаем количество активных пользователей (активность за последние 30 дней)
-    # Используем created_at вместо last_login, так как last_login может не быть
-    active_users = TelegramUser.objects.filter(
-        created_at__gte=timezone.now() - datetime.timedelta(days=30)
-    ).count()
-    
-    # Определяем функцию усечения даты в зависимости от периода
-    if period == 'day':
-        trunc_func = TruncDay
-        days_ago = 1
-        date_format = '%H:%M'
-    elif period == 'week':
-        trunc_func = TruncDay
-        days_ago = 7
-        date_format = '%d.%m'
-    elif period == 'year':
-        trunc_func = TruncMonth
-        days_ago = 365
-        date_format = '%b %Y'
-    else:  # month
-        trunc_func = TruncDay
-        days_ago = 30
-        date_format = '%d.%m'
-    
-    # Получаем статистику регистраций за выбранный период
-    start_date = timezone.now() - datetime.timedelta(days=days_ago)
+    # Активные пользователи (просматривали объявления) за 1/7/30/90/365 дней
+    # по дневным HyperLogLog скетчам, без сканирования пользователей
+    active = uniques.active_users_windows((1, 7, 30, 90, 365))
+    active_users = active[30]
     
-    registrations = TelegramUser.objects.filter(
-        created_at__gte=start_date
-    ).annotate(
-        date=trunc_func('created_at')
-    ).values('date').annotate(
-        count=Count('id')
-    ).order_by('date')
+    # Регистрации за 1/7/30 дней из дневных агрегатов
+    today = timezone.localdate()
+    registrations = DailyStats.objects.aggregate(**{
+        name: Sum('new_users', filter=Q(date__gt=today - datetime.timedelta(days=days)))
+        for name, days in (('day', 1), ('week', 7), ('month', 30))
+    })
     
-    # Формируем данные для графика
-    dates = []
-    counts = []
-    
-    current = start_date
-    end_date = timezone.now()
-    
-    # Создаем словарь с данными регистраций
-    reg_dict = {reg['date'].date(): reg['count'] for reg in registrations}
-    
-    # Заполняем данные для всех дат в периоде
-    while current <= end_date:
-        if period == 'day':
-            date_key = current.replace(minute=0).time()
-            date_str = current.strftime(date_format)
-            current += datetime.timedelta(hours=1)
-        elif period == 'year':
-            date_key = current.replace(day=1).date()
-            date_str = current.strftime(date_format)
-            # Переходим к следующему месяцу
-            if current.month == 12:
-                current = current.replace(year=current.year + 1, month=1)
-            else:
-                current = current.replace(month=current.month + 1)
-        else:
-            date_key = current.date()
-            date_str = current.strftime(date_format)
-            current += datetime.timedelta(days=1)
-        
-        dates.append(date_str)
-        counts.append(reg_dict.get(date_key, 0) if isinstance(date_key, datetime.date) else 0)
+    # Ряд регистраций за выбранный период по агрегатам
+    dates, values = engine.series(period, ['new_users'])
+    counts = values['new_users']
     
     # Вычисляем активность пользователей
-    daily_active_users = TelegramUser.objects.filter(
-        created_at__gte=timezone.now() - datetime.timedelta(days=1)
-    ).count()
-    
-    weekly_active_users = TelegramUser.objects.filter(
-        created_at__gte=timezone.now() - datetime.timedelta(days=7)
-    ).count()
-    
+    daily_active_users = active[1]
+    weekly_active_users = active[7]
     monthly_active_users = active_users
     
     # Формируем данные для ответа
@@ -252,7 +133,12 @@ def api_users_stats(request):
         ],
         'daily_active_users': daily_active_users,
         'weekly_active_users': weekly_active_users,
-        'monthly_active_users': monthly_active_users
+        'monthly_active_users': monthly_active_users,
+        'quarterly_active_users': active[90],
+        'yearly_active_users': active[365],
+        'daily_new_users': registrations['day'] or 0,
+        'weekly_new_users': registrations['week'] or 0,
+        'monthly_new_users': registrations['month'] or 0,
     }
     
     return JsonResponse(response_data)
@@ -262,81 +148,24 @@ def api_posts_stats(request):
     """API для получения статистики объявлений."""
     period = request.GET.get('period', 'month')
     
-    # Получаем общее количество объявлений
-    total_posts = AbsPost.objects.count()
-    
-    # Получаем количество активных объявлений (статус = 3 - опубликовано)
-    active_posts = AbsPost.objects.filter(status=3).count()
-    
-    # Определяем функцию усечения даты в зависимости от периода
-    if period == 'day':
-        trunc_func = TruncDay
-        days_ago = 1
-        date_format = '%H:%M'
-    elif period == 'week':
-        trunc_func = TruncDay
-        days_ago = 7
-        date_format = '%d.%m'
-    elif period == 'year':
-        trunc_func = TruncMonth
-        days_ago = 365
-        date_format = '%b %Y'
-    else:  # month
-        trunc_func = TruncDay
-        days_ago = 30
-        date_format = '%d.%m'
-    
-    # Получаем статистику создания объявлений за выбранный период
-    start_date = timezone.now() - datetime.timedelta(days=days_ago)
-    
-    post_creations = AbsPost.objects.filter(
-        created_at__gte=start_date
-    ).annotate(
-        date=trunc_func('created_at')
-    ).values('date').annotate(
-        count=Count('id')
-    ).order_by('date')
-    
-    # Формируем данные для графика
-    dates = []
-    counts = []
-    
-    current = start_date
-    end_date = timezone.now()
-    
-    # Создаем словарь с данными создания объявлений
-    post_dict = {post['date'].date(): post['count'] for post in post_creations}
-    
-    # Заполняем данные для всех дат в периоде
-    while current <= end_date:
-        if period == 'day':
-            date_key = current.replace(minute=0).time()
-            date_str = current.strftime(date_format)
-            current += datetime.timedelta(hours=1)
-        elif period == 'year':
-            date_key = current.replace(day=1).date()
-            date_str = current.strftime(date_format)
-            # Переходим к следующему месяцу
-            if current.month == 12:
-                current = current.replace(year=current.year + 1, month=1)
-            else:
-                current = current.replace(month=current.month + 1)
-        else:
-            date_key = current.date()
-            date_str = current.strftime(date_format)
-            current += datetime.timedelta(days=1)
-        
-        dates.append(date_str)
-        counts.append(post_dict.get(date_key, 0) if isinstance(date_key, datetime.date) else 0)
+    # Ряд новых объявлений за выбранный период по агрегатам
+    dates, values = engine.series(period, ['new_posts'])
+    counts = values['new_posts']
+    start_date = engine.period_start(period)
     
-    # Получаем статистику по статусам объявлений
-    status_counts = AbsPost.objects.values('status').annotate(count=Count('id'))
+    # Получаем статистику по статусам объявлений, из нее же общее число и активные
+    status_counts = AbsPost.objects.non_polymorphic().order_by().values('status').annotate(count=Count('id'))
     status_data = [0, 0, 0, 0, 0]  # Инициализируем нулями для всех статусов
+    total_posts = 0
     
     for status in status_counts:
+        total_posts += status['count']
         if 0 <= status['status'] <= 4:
             status_data[status['status']] = status['count']
     
+    # Количество активных объявлений (статус = 3 - опубликовано)
+    active_posts = status_data[3]
+    
     # Получаем статистику по категориям
     from ework_rubric.models import SubRubric
     categories = SubRubric.objects.annotate(post_count=Count('ework_post_abspost_posts')).order_by('-post_count')[:6]
@@ -350,10 +179,21 @@ def api_posts_stats(request):
             category_labels.append('Другое')
             category_data.append(other_count)
     
+    # Эффективность кэша вердиктов автомодерации за период
+    moderation_cache = DailyStats.objects.filter(date__gte=start_date.date()).aggregate(
+        hits=Sum('moderation_cache_hits'),
+        misses=Sum('moderation_cache_misses')
+    )
+    cache_hits = moderation_cache['hits'] or 0
+    cache_total = cache_hits + (moderation_cache['misses'] or 0)
+    
     # Формируем данные для ответа
     response_data = {
         'total_posts': total_posts,
         'active_posts': active_posts,
+        'moderation_cache_hits': cache_hits,
+        'moderation_cache_checks': cache_total,
+        'moderation_cache_hit_ratio': round(cache_hits / cache_total * 100, 1) if cache_total else 0,
         'labels': dates,
         'datasets': [
             {
@@ -371,6 +211,10 @@ def api_posts_stats(request):
     
     return JsonResponse(response_data)
 
+def _int_param(request, name):
+    value = request.GET.get(name, '')
+    return int(value) if value.isdigit() else None
+
 @staff_member_required
 def api_views_stats(request):
     """API для получения статистики просмотров и избранного."""
@@ -381,101 +225,27 @@ def api_views_stats(request):
     total_favorites = Favorite.objects.count()
     total_posts = AbsPost.objects.count()
     
-    # Определяем функцию усечения даты в зависимости от периода
-    if period == 'day':
-        trunc_func = TruncDay
-        days_ago = 1
-        date_format = '%H:%M'
-    elif period == 'week':
-        trunc_func = TruncDay
-        days_ago = 7
-        date_format = '%d.%m'
-    elif period == 'year':
-        trunc_func = TruncMonth
-        days_ago = 365
-        date_format = '%b %Y'
-    else:  # month
-        trunc_func = TruncDay
-        days_ago = 30
-        date_format = '%d.%m'
-    
-    # Получаем статистику просмотров за выбранный период
-    start_date = timezone.now() - datetime.timedelta(days=days_ago)
-    
-    views_stats = PostView.objects.filter(
-        created_at__gte=start_date
-    ).annotate(
-        date=trunc_func('created_at')
-    ).values('date').annotate(
-        count=Count('id')
-    ).order_by('date')
-    
-    # Получаем статистику избранного за выбранный период
-    favorites_stats = Favorite.objects.filter(
-        created_at__gte=start_date
-    ).annotate(
-        date=trunc_func('created_at')
-    ).values('date').annotate(
-        count=Count('id')
-    ).order_by('date')
-    
-    # Формируем данные для графика
-    dates = []
-    views_counts = []
-    favorites_counts = []
-    
-    current = start_date
-    end_date = timezone.now()
-    
-    # Создаем словари с данными просмотров и избранного
-    views_dict = {view['date'].date(): view['count'] for view in views_stats}
-    favorites_dict = {fav['date'].date(): fav['count'] for fav in favorites_stats}
-    
-    # Заполняем данные для всех дат в периоде
-    while current <= end_date:
-        if period == 'day':
-            date_key = current.replace(minute=0).time()
-            date_str = current.strftime(date_format)
-            current += datetime.timedelta(hours=1)
-        elif period == 'year':
-            date_key = current.replace(day=1).date()
-            date_str = current.strftime(date_format)
-            # Переходим к следующему месяцу
-            if current.month == 12:
-                current = current.replace(year=current.year + 1, month=1)
-            else:
-                current = current.replace(month=current.month + 1)
-        else:
-            date_key = current.date()
-            date_str = current.strftime(date_format)
-            current += datetime.timedelta(days=1)
-        
-        dates.append(date_str)
-        views_counts.append(views_dict.get(date_key, 0) if isinstance(date_key, datetime.date) else 0)
-        favorites_counts.append(favorites_dict.get(date_key, 0) if isinstance(date_key, datetime.date) else 0)
-    
-    # Получаем топ просматриваемых объявлений
-    from django.contrib.contenttypes.models import ContentType
-    abs_post_ct = ContentType.objects.get_for_model(AbsPost)
-    
-    # Подсчитываем просмотры для каждого поста
-    post_views_counts = PostView.objects.filter(
-        content_type=abs_post_ct
-    ).values('object_id').annotate(
-        views_count=Count('id')
-    ).order_by('-views_count')[:10]
-    
-    top_posts_data = []
-    for item in post_views_counts:
-        try:
-            post = AbsPost.objects.get(id=item['object_id'])
-            top_posts_data.append({
-                'title': post.title[:50] + '...' if len(post.title) > 50 else post.title,
-                'views': item['views_count'],
-                'favorites': Favorite.objects.filter(post=post).count()
-            })
-        except AbsPost.DoesNotExist:
-            continue
+    # Ряды просмотров и избранного за выбранный период по агрегатам
+    dates, values = engine.series(period, ['post_views', 'favorites_added'])
+    views_counts = values['post_views']
+    favorites_counts = values['favorites_added']
+    
+    # Рейтинг постов за период: одна выборка из кэша или один запрос к дневной активности
+    leaderboard_period = period if period in leaderboard.PERIOD_DAYS else 'month'
+    top_posts = leaderboard.top_posts(
+        period=leaderboard_period,
+        metric=request.GET.get('metric', 'views'),
+        super_rubric_id=_int_param(request, 'rubric'),
+        city_id=_int_param(request, 'city'),
+    )
+    top_posts_data = [
+        {
+            'title': entry.title[:50] + '...' if len(entry.title) > 50 else entry.title,
+            'views': entry.views,
+            'favorites': entry.favorites,
+        }
+        for entry in top_posts
+    ]
     
     # Средние показатели
     avg_views_per_post = total_views / total_posts if total_posts > 0 else 0
@@ -507,80 +277,46 @@ def api_views_stats(request):
     
     return JsonResponse(response_data)
 
+@staff_member_required
+def api_leaderboard(request):
+    """API рейтинга постов: ?period=day|week|month&metric=views|favorites&rubric=&sub_rubric=&city="""
+    limit = min(_int_param(request, 'limit') or leaderboard.DEFAULT_LIMIT, 50)
+    entries = leaderboard.top_posts(
+        period=request.GET.get('period', 'week'),
+        metric=request.GET.get('metric', 'views'),
+        super_rubric_id=_int_param(request, 'rubric'),
+        sub_rubric_id=_int_param(request, 'sub_rubric'),
+        city_id=_int_param(request, 'city'),
+        limit=limit,
+    )
+    return JsonResponse({'results': [entry._asdict() for entry in entries]})
+
+@staff_member_required
+def api_post_viewers(request, post_id):
+    """API уникальных зрителей поста за последние ?days= дней (по скетчам)"""
+    days = min(_int_param(request, 'days') or 30, 365)
+    return JsonResponse({
+        'post_id': post_id,
+        'days': days,
+        'unique_viewers': uniques.post_unique_viewers(post_id, days),
+    })
+
 @staff_member_required
 def api_revenue_stats(request):
     """API для получения статистики доходов."""
     period = request.GET.get('period', 'month')
     
-    # Получаем общий доход
-    total_revenue = Payment.objects.filter(status='paid').aggregate(
-        total=Sum('amount')
-    )['total'] or 0
-    
-    # Получаем количество платежей
-    total_payments = Payment.objects.filter(status='paid').count()
-    
-    # Определяем функцию усечения даты в зависимости от периода
-    if period == 'day':
-        trunc_func = TruncDay
-        days_ago = 1
-        date_format = '%H:%M'
-    elif period == 'week':
-        trunc_func = TruncDay
-        days_ago = 7
-        date_format = '%d.%m'
-    elif period == 'year':
-        trunc_func = TruncMonth
-        days_ago = 365
-        date_format = '%b %Y'
-    else:  # month
-        trunc_func = TruncDay
-        days_ago = 30
-        date_format = '%d.%m'
-    
-    # Получаем статистику доходов за выбранный период
-    start_date = timezone.now() - datetime.timedelta(days=days_ago)
-    
-    revenue_stats = Payment.objects.filter(
-        status='paid',
-        paid_at__gte=start_date
-    ).annotate(
-        date=trunc_func('paid_at')
-    ).values('date').annotate(
-        total=Sum('amount')
-    ).order_by('date')
-    
-    # Формируем данные для графика
-    dates = []
-    revenue_counts = []
-    
-    current = start_date
-    end_date = timezone.now()
-    
-    # Создаем словарь с данными доходов
-    revenue_dict = {rev['date'].date(): float(rev['total']) for rev in revenue_stats}
+    # Общий доход и количество платежей одним запросом
+    paid = Payment.objects.filter(status='paid').aggregate(
+        total=Sum('amount'),
+        count=Count('id'),
+    )
+    total_revenue = paid['total'] or 0
+    total_payments = paid['count']
     
-    # Заполняем данные для всех дат в периоде
-    while current <= end_date:
-        if period == 'day':
-            date_key = current.replace(minute=0).time()
-            date_str = current.strftime(date_format)
-            current += datetime.timedelta(hours=1)
-        elif period == 'year':
-            date_key = current.replace(day=1).date()
-            date_str = current.strftime(date_format)
-            # Переходим к следующему месяцу
-            if current.month == 12:
-                current = current.replace(year=current.year + 1, month=1)
-            else:
-                current = current.replace(month=current.month + 1)
-        else:
-            date_key = current.date()
-            date_str = current.strftime(date_format)
-            current += datetime.timedelta(days=1)
-        
-        dates.append(date_str)
-        revenue_counts.append(revenue_dict.get(date_key, 0) if isinstance(date_key, datetime.date) else 0)
+    # Ряд доходов за выбранный период по агрегатам
+    dates, values = engine.series(period, ['revenue'])
+    revenue_counts = [float(value) for value in values['revenue']]
     
     # Средний чек
     avg_payment = total_revenue / total_payments if total_payments > 0 else 0
@@ -37,7 +37,9 @@ class UserProfileForm(forms.ModelForm):
 
         if 'city' in self.fields:
             from ework_locations.models import City
+            from ework_core.refdata import get_refdata, set_choices
             self.fields['city'].queryset = City.objects.all()
+            set_choices(self.fields['city'], get_refdata().cities)
             self.fields['city'].widget.attrs.update({'class': 'form-control'})
 
 
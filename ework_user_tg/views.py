@@ -6,24 +6,25 @@ from django.contrib.auth.decorators import login_required
 from django.utils.decorators import method_decorator
 from django.urls import reverse
 import logging
-from django.http import HttpResponse, JsonResponse
+from django.http import Http404, HttpResponse, JsonResponse
+from django.db.models import Avg, Count, Q, Sum
 from django.views.decorators.http import require_POST
 from django.contrib.auth import login
 from django.utils import timezone
 from .verify_telegram_init_data import verify_init_data
 import json
 from ework_post.models import AbsPost, Favorite
+from ework_post.pagination import KeysetPaginationMixin
 from .forms import UserProfileForm, UserRatingForm
 from django.views.decorators.csrf import csrf_exempt
 from django.utils import translation
-from django.contrib.contenttypes.models import ContentType
 
 logger = logging.getLogger(__name__)
 User = get_user_model()
 
 
 @method_decorator(login_required(login_url='users:telegram_auth'), name='dispatch')
-class AuthorProfileView(ListView):
+class AuthorProfileView(KeysetPaginationMixin, ListView):
     """представление профиля автора"""
     model = AbsPost
     template_name = 'user_ework/author_profile.html'
@@ -42,6 +43,8 @@ class AuthorProfileView(ListView):
         return self._author
     
     def get_template_names(self):
+        if self.is_cursor_request():
+            return [self.page_fragment_template]
         if self.request.headers.get('HX-Request') == 'true':
             return ['user_ework/author_profile.html']
         else:
@@ -60,88 +63,88 @@ class AuthorProfileView(ListView):
                 self._is_own_profile = False
         return self._is_own_profile
 
-    def get_posts_by_status(self):
-        """Получить посты автора, сгруппированные по статусам с оптимизацией"""
-        author = self.get_author()
-        is_own = self.is_own_profile()
-        base_queryset = AbsPost.objects.filter(
-            user=author,
+    def get_base_queryset(self):
+        return AbsPost.objects.filter(
+            user=self.get_author(),
             is_deleted=False
         ).select_related(
             'user', 'city', 'currency', 'sub_rubric', 'sub_rubric__super_rubric'
-        ).prefetch_related('favorited_by').order_by('-created_at')
-        
-        if is_own:
-            posts = list(base_queryset)
-            posts_by_status = {
-                'published': [p for p in posts if p.status == 3],
-                'pending': [p for p in posts if p.status == 0],
-                'approved': [p for p in posts if p.status == 1],
-                'rejected': [p for p in posts if p.status == 2],
-                'archived': [p for p in posts if p.status == 4],
-            }
-        else:
-            # Для чужого профиля показываем только опубликованные
-            published_posts = list(base_queryset.filter(status=3))
-            posts_by_status = {
-                'published': published_posts,
-                'pending': [],
-                'approved': [],
-                'rejected': [],
-                'archived': [],
-            }
-        
+        ).order_by('-created_at')
+
+    def get_posts_by_status(self):
+        """Получить неопубликованные посты автора, сгруппированные по статусам"""
+        posts_by_status = {
+            'pending': [],
+            'approved': [],
+            'rejected': [],
+            'archived': [],
+        }
+        if self.is_own_profile():
+            status_keys = {0: 'pending', 1: 'approved', 2: 'rejected', 4: 'archived'}
+            for post in self.get_base_queryset().filter(status__in=status_keys):
+                posts_by_status[status_keys[post.status]].append(post)
         return posts_by_status
 
+    def get_status_counts(self):
+        """Количество постов автора по статусам одним запросом"""
+        rows = AbsPost.objects.non_polymorphic().filter(
+            user=self.get_author(),
+            is_deleted=False
+        ).values('status').annotate(count=Count('id')).order_by()
+        return {row['status']: row['count'] for row in rows}
+
     def get_queryset(self):
-        """Получить объявления для основного списка (опубликованные)"""
-        posts_by_status = self.get_posts_by_status()
-        return posts_by_status['published']
+        """Опубликованные объявления для основного списка (курсорная пагинация)"""
+        return self.get_base_queryset().filter(status=3)
     
     def get_context_data(self, **kwargs):
         try:
             context = super().get_context_data(**kwargs)
-            author = self.get_author()
             is_own_profile = self.is_own_profile()
+            context.update({
+                'card_col_class': 'col-6',
+                'card_show_controls': is_own_profile,
+                'card_status': 'published' if is_own_profile else 'public',
+            })
+            page_posts = list(context['posts'])
+            if self.is_cursor_request():
+                context['favorite_post_ids'] = self.get_favorite_post_ids(page_posts)
+                return context
+
+            author = self.get_author()
             posts_by_status = self.get_posts_by_status()
+            status_counts = self.get_status_counts()
+            if not is_own_profile:
+                status_counts = {3: status_counts.get(3, 0)}
             context.update({
                 'author': author,
                 'is_own_profile': is_own_profile,
             })
             context.update({
-                'published_products': posts_by_status['published'],
+                'published_products': page_posts,
                 'pending_products': posts_by_status['pending'],
                 'approved_products': posts_by_status['approved'],
                 'rejected_products': posts_by_status['rejected'],
                 'archived_products': posts_by_status['archived'],
             })
             context.update({
-                'published_count': len(posts_by_status['published']),
-                'pending_count': len(posts_by_status['pending']) + len(posts_by_status['approved']),
-                'rejected_count': len(posts_by_status['rejected']),
-                'archived_count': len(posts_by_status['archived']),
-                'total_posts_count': sum(len(posts) for posts in posts_by_status.values()),
+                'published_count': status_counts.get(3, 0),
+                'pending_count': status_counts.get(0, 0) + status_counts.get(1, 0),
+                'rejected_count': status_counts.get(2, 0),
+                'archived_count': status_counts.get(4, 0),
+                'total_posts_count': sum(status_counts.values()),
             })
-            if self.request.user.is_authenticated:
-                all_posts = []
-                for posts_list in posts_by_status.values():
-                    all_posts.extend(posts_list)
-                
-                if all_posts:
-                    favorite_post_ids = Favorite.objects.filter(
-                        user=self.request.user,
-                        post__in=all_posts
-                    ).values_list('post_id', flat=True)
-                    context['favorite_post_ids'] = list(favorite_post_ids)
-                else:
-                    context['favorite_post_ids'] = []
-            else:
-                context['favorite_post_ids'] = []
+            all_posts = page_posts[:]
+            for posts_list in posts_by_status.values():
+                all_posts.extend(posts_list)
+            context['favorite_post_ids'] = self.get_favorite_post_ids(all_posts)
             if is_own_profile:
-                context['profile_stats'] = self.get_profile_stats(author, posts_by_status)
+                context['profile_stats'] = self.get_profile_stats(author, status_counts)
             
             return context
             
+        except Http404:
+            raise
         except Exception as e:
             logger.error(f"Error in get_context_data: {e}")
             return {
@@ -160,43 +163,39 @@ class AuthorProfileView(ListView):
                 'favorite_post_ids': [],
                 'profile_stats': {},
             }
+
+    def get_favorite_post_ids(self, posts):
+        """ID избранных постов текущего пользователя среди переданных"""
+        if not self.request.user.is_authenticated or not posts:
+            return []
+        return list(Favorite.objects.filter(
+            user=self.request.user,
+            post__in=posts
+        ).values_list('post_id', flat=True))
     
-    def get_profile_stats(self, author, posts_by_status):
-        """Получить статистику профиля с оптимизацией"""
+    def get_profile_stats(self, author, status_counts):
+        """Получить статистику профиля агрегатами по всем постам автора"""
         try:
-            from ework_post.models import PostView
-            all_posts = []
-            for posts_list in posts_by_status.values():
-                all_posts.extend(posts_list)
+            author_posts = AbsPost.objects.non_polymorphic().filter(user=author, is_deleted=False)
             
             stats = {
-                'total_posts': len(all_posts),
+                'total_posts': sum(status_counts.values()),
                 'total_views': 0,
                 'total_favorites': 0,
                 'avg_price': 0,
             }
             
-            if all_posts:
-                post_ids = [post.pk for post in all_posts]
-                content_types = ContentType.objects.get_for_models(
-                    *[type(post) for post in all_posts]
-                ).values()
-                
-                total_views = PostView.objects.filter(
-                    content_type__in=content_types,
-                    object_id__in=post_ids
-                ).count()
-                total_favorites = Favorite.objects.filter(post__in=all_posts).count()
-                published_posts = posts_by_status['published']
-                if published_posts:
-                    prices = [post.price for post in published_posts if post.price]
-                    avg_price = sum(prices) / len(prices) if prices else 0
-                else:
-                    avg_price = 0
+            if stats['total_posts']:
+                totals = author_posts.aggregate(
+                    total_views=Sum('view_count'),
+                    total_favorites=Sum('favorite_count'),
+                    avg_price=Avg('price', filter=Q(status=3, price__gt=0)),
+                )
+                avg_price = totals['avg_price'] or 0
                 
                 stats.update({
-                    'total_views': total_views,
-                    'total_favorites': total_favorites,
+                    'total_views': totals['total_views'] or 0,
+                    'total_favorites': totals['total_favorites'] or 0,
                     'avg_price': round(avg_price, 2),
                 })
             